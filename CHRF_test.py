@@ -12,19 +12,20 @@
 }
 '''
 # https://blog.csdn.net/rainy_universe/article/details/128493300
-from nltk.translate.chrf_score import chrf_precision_recall_fscore_support
+from chrf_batch import chrfPrecisionRecallFscoreSupport
 # precision准确率 , recall 召回率, fscore, tp(true positive)
 def get_chrf_precision_recall_fscore_support(reference_sentence,generated_sentence,n_gram_ls=[1]):
+    # 所有 n_gram 一次算出，结果与 nltk 的 chrf_precision_recall_fscore_support 相同
+    precision, recall, fscore, tp = chrfPrecisionRecallFscoreSupport(
+        [reference_sentence], [generated_sentence], n_grams=n_gram_ls, epsilon=0., beta=2.0
+    )
     result = []
-    for n_gram in n_gram_ls:
-        precision, recall, fscore, tp = chrf_precision_recall_fscore_support(
-            reference_sentence, generated_sentence,n=n_gram,epsilon=0.,beta=2.0
-        )
+    for i, n_gram in enumerate(n_gram_ls):
         result.append({
-            'precision':precision,
-            'recall':recall,
-            'fscore':fscore,
-            'tp':tp,
+            'precision':precision[0, i].item(),
+            'recall':recall[0, i].item(),
+            'fscore':fscore[0, i].item(),
+            'tp':tp[0, i].item(),
             'n_gram':n_gram
         })
     return result
@@ -0,0 +1,207 @@
+'''
+批量计算句子级 BLEU
+
+nltk 的 sentence_bleu 每次只算一对句子，每阶 n-gram 都要重新生成元组、建 Counter、构造 Fraction。
+这里把整批句子的词映射为整数编号拼成一个数组，n 阶 n-gram 由 n-1 阶 n-gram 的编号和下一个词递推得到，所有阶只需一轮递推；
+每阶的 n-gram 编号与所属句子组合后用 np.unique 一次统计出整批的截断匹配数（clipped count）。
+精度、平滑和长度惩罚按整批用 numpy 计算，与 nltk 的浮点运算顺序相同；
+最后的 log / fsum / exp 仍用 math 逐对计算，因为 numpy 的 SIMD 版 log、exp 不保证与 math 逐位一致。
+结果与 nltk 逐对调用 sentence_bleu 完全一致（不会发出 nltk method0 的零匹配警告）。
+
+支持的平滑方法：None（即 method0）、SmoothingFunction 的 method1 ~ method4；其他平滑方法回退到 nltk 逐对计算。
+
+:demo
+    from bleu_batch import sentenceBleuScores
+    scores = sentenceBleuScores([[('This', 'is', 'a', 'easy', 'test')]], [('This', 'is', 'a', 'test')], weights=(1,))
+    # numpy 数组，每对句子一个分数；weights 为多组权重时形状为 (句子对数, 权重组数)
+'''
+import math
+import sys
+
+import numpy as np
+from nltk.translate.bleu_score import SmoothingFunction, sentence_bleu
+
+_MAX_ID = 2 ** 62
+
+SMOOTHING_METHODS = ['method0', 'method1', 'method2', 'method3', 'method4']
+
+
+def _smoothingMethod(smoothing_function):
+    '''
+    返回平滑方法名和所属的 SmoothingFunction 实例，不支持的平滑方法返回 (None, None)
+    '''
+    if smoothing_function is None:
+        return 'method0', SmoothingFunction()
+    smoothing = getattr(smoothing_function, '__self__', None)
+    if isinstance(smoothing, SmoothingFunction):
+        for name in SMOOTHING_METHODS:
+            if smoothing_function.__func__ is getattr(SmoothingFunction, name):
+                return name, smoothing
+    return None, None
+
+
+def _encode(texts):
+    '''
+    把所有文本的词映射为整数编号并拼接，返回编号、每个词所属文本的下标、所在文本的结束位置和每个文本的长度
+    '''
+    vocab = {}
+    token_ids = np.fromiter((vocab.setdefault(token, len(vocab)) for text in texts for token in text), dtype=np.int64)
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+    text_index = np.repeat(np.arange(len(texts)), lengths)
+    ends = np.repeat(np.cumsum(lengths), lengths)
+    return token_ids, text_index, ends, lengths, max(len(vocab), 1)
+
+
+def _clippedCounts(token_ids, text_index, ends, vocab_size, text_pair, num_hypotheses, max_order):
+    '''
+    统计每对句子在 1 ~ max_order 阶上的截断匹配数，即 nltk modified_precision 的分子
+    :param text_pair: 每个文本所属的句子对，前 num_hypotheses 个文本是 hypotheses，其余是 references
+    :return: 形状为 (句子对数, max_order) 的数组
+    '''
+    numerators = np.zeros((num_hypotheses, max_order), dtype=np.int64)
+    num_texts = len(text_pair)
+    grams = token_ids
+    bound = vocab_size    # grams 中编号的上界（不含）
+    positions = np.arange(len(token_ids))
+    for n in range(1, max_order + 1):
+        if n > 1:
+            # n 阶 n-gram = (n-1 阶 n-gram, 第 n 个词)；编号可能溢出时先压缩为稠密编号
+            if bound > _MAX_ID // vocab_size:
+                unique_grams, grams = np.unique(grams, return_inverse=True)
+                bound = len(unique_grams)
+            grams = grams[:-1] * vocab_size + token_ids[n - 1:]
+            bound *= vocab_size
+        valid = positions[:len(grams)] + n <= ends[:len(grams)]    # 不跨越文本边界
+        if not valid.any():
+            break
+        order_grams = grams[valid]
+        if bound > _MAX_ID // num_texts:
+            unique_grams, order_grams = np.unique(order_grams, return_inverse=True)
+            order_bound = len(unique_grams)
+        else:
+            order_bound = bound
+        # 每个文本中每个 n-gram 的出现次数
+        keys, counts = np.unique(text_index[:len(grams)][valid] * order_bound + order_grams, return_counts=True)
+        key_text = keys // order_bound
+        pair_keys = text_pair[key_text] * order_bound + keys % order_bound
+        is_hypothesis = key_text < num_hypotheses
+        # 同一句子对的各个 reference 中出现次数的最大值
+        reference_keys, reference_counts = pair_keys[~is_hypothesis], counts[~is_hypothesis]
+        if len(reference_keys) == 0:
+            break
+        order = np.argsort(reference_keys, kind='stable')
+        reference_keys, reference_counts = reference_keys[order], reference_counts[order]
+        starts = np.flatnonzero(np.r_[True, reference_keys[1:] != reference_keys[:-1]])
+        max_keys = reference_keys[starts]
+        max_counts = np.maximum.reduceat(reference_counts, starts)
+        # hypothesis 中的 n-gram 在 references 中的最大次数，截断后按句子对求和
+        hypothesis_keys, hypothesis_counts = pair_keys[is_hypothesis], counts[is_hypothesis]
+        found = np.minimum(np.searchsorted(max_keys, hypothesis_keys), len(max_keys) - 1)
+        clipped = np.where(max_keys[found] == hypothesis_keys, np.minimum(hypothesis_counts, max_counts[found]), 0)
+        numerators[:, n - 1] = np.bincount(key_text[is_hypothesis], weights=clipped, minlength=num_hypotheses)
+    return numerators
+
+
+def _closestReferenceLengths(reference_lengths, reference_pair, hypothesis_lengths):
+    '''
+    每对句子中与 hypothesis 长度最接近的 reference 长度，距离相同时取较短的，与 nltk closest_ref_length 相同
+    '''
+    scale = int(reference_lengths.max()) + 1
+    distance = np.abs(reference_lengths - hypothesis_lengths[reference_pair]) * scale + reference_lengths
+    starts = np.flatnonzero(np.r_[True, reference_pair[1:] != reference_pair[:-1]])
+    return np.minimum.reduceat(distance, starts) % scale
+
+
+def _smoothedPrecisions(numerators, denominators, hypothesis_lengths, method, smoothing):
+    '''
+    按 nltk SmoothingFunction 相应方法的运算顺序计算平滑后的各阶精度，形状为 (句子对数, 阶数)
+    '''
+    numerators = numerators.astype(np.float64)
+    denominators = denominators.astype(np.float64)
+    precision = numerators / denominators
+    zero = numerators == 0
+    if method == 'method0':
+        # nltk 用 sys.float_info.min 代替 0，使 log 后的精度趋于 0
+        return np.where(zero, sys.float_info.min, precision)
+    if method == 'method1':
+        return np.where(zero, (numerators + smoothing.epsilon) / denominators, precision)
+    if method == 'method2':
+        smoothed = (numerators + 1) / (denominators + 1)
+        smoothed[:, 0] = precision[:, 0]
+        return smoothed
+    if method == 'method3':
+        incvnt = np.cumsum(zero, axis=1)    # 第几个零匹配的阶
+        return np.where(zero, 1 / (2.0 ** incvnt * denominators), precision)
+    # method4：仅对长度大于 1 的 hypothesis 平滑，log(长度) 用 math.log 计算以保证与 nltk 一致
+    zero &= (hypothesis_lengths > 1)[:, None]
+    incvnt = np.cumsum(zero, axis=1)
+    log_lengths = np.array([math.log(length) if length > 1 else 1.0 for length in hypothesis_lengths.tolist()])
+    numerator = 1 / (2.0 ** incvnt * smoothing.k / log_lengths[:, None])
+    return np.where(zero, numerator / denominators, precision)
+
+
+def sentenceBleuScores(list_of_references, hypotheses, weights=(0.25, 0.25, 0.25, 0.25), smoothing_function=None,
+                       auto_reweigh=False):
+    '''
+    批量计算句子级 BLEU，等价于对每对句子调用
+    nltk.translate.bleu_score.sentence_bleu(references, hypothesis, weights, smoothing_function, auto_reweigh)
+
+    :param list_of_references: 每对句子的参考译文列表，每个参考译文是分好词的序列
+    :param hypotheses: 候选译文列表，每个候选译文是分好词的序列，数量与 list_of_references 相同
+    :param weights: n-gram 所占权重，如 (0.5, 0.5)；也可以是多组权重的列表
+    :param smoothing_function: None 或 SmoothingFunction 的 method1 ~ method4，其他平滑方法逐对交给 nltk 计算
+    :param auto_reweigh: 与 nltk 相同，hypothesis 长度小于 4 且权重为默认值时按长度均分权重
+    :return: 每对句子的 BLEU 分数数组；weights 为多组权重时形状为 (句子对数, 权重组数)
+    '''
+    if len(list_of_references) != len(hypotheses):
+        raise Exception('the number of references and hypotheses should be the same')
+    try:
+        weights[0][0]
+        weights_list = [tuple(weight) for weight in weights]
+    except (TypeError, IndexError):
+        weights_list = [weights]
+    single_weight = len(weights_list) == 1
+    num_pairs = len(hypotheses)
+    scores = np.zeros((num_pairs, len(weights_list)))
+
+    method, smoothing = _smoothingMethod(smoothing_function)
+    if method is None:
+        for i, (references, hypothesis) in enumerate(zip(list_of_references, hypotheses)):
+            scores[i] = sentence_bleu(references, hypothesis, weights_list, smoothing_function, auto_reweigh)
+        return scores[:, 0] if single_weight else scores
+    if num_pairs == 0:
+        return scores[:, 0] if single_weight else scores
+
+    list_of_references = [list(references) for references in list_of_references]
+    if any(len(references) == 0 for references in list_of_references):
+        raise Exception('each hypothesis should have at least one reference')
+    reference_pair = np.repeat(np.arange(num_pairs), [len(references) for references in list_of_references])
+    texts = list(hypotheses) + [reference for references in list_of_references for reference in references]
+    token_ids, text_index, ends, lengths, vocab_size = _encode(texts)
+    text_pair = np.concatenate([np.arange(num_pairs), reference_pair])
+
+    max_order = max(len(weight) for weight in weights_list)
+    hypothesis_lengths = lengths[:num_pairs]
+    numerators = _clippedCounts(token_ids, text_index, ends, vocab_size, text_pair, num_pairs, max_order)
+    denominators = np.maximum(1, hypothesis_lengths[:, None] - np.arange(max_order)[None, :])
+    precisions = _smoothedPrecisions(numerators, denominators, hypothesis_lengths, method, smoothing)
+
+    # 长度惩罚：hypothesis 更长时为 1，为空时为 0，否则为 exp(1 - r / c)
+    closest_lengths = _closestReferenceLengths(lengths[num_pairs:], reference_pair, hypothesis_lengths)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        penalty_exponents = 1 - closest_lengths / hypothesis_lengths
+    no_penalty = hypothesis_lengths > closest_lengths
+
+    default_weight = (0.25, 0.25, 0.25, 0.25)
+    rows = zip(precisions.tolist(), penalty_exponents.tolist(), no_penalty.tolist(), hypothesis_lengths.tolist(),
+               numerators[:, 0].tolist())
+    for i, (p_n, penalty_exponent, longer, hyp_len, unigram_matches) in enumerate(rows):
+        if unigram_matches == 0:    # 没有匹配的 unigram 时 nltk 直接返回 0
+            continue
+        bp = 1 if longer else math.exp(penalty_exponent)
+        for j, weight in enumerate(weights_list):
+            if auto_reweigh and hyp_len < 4 and weight == default_weight:
+                weight = (1 / hyp_len,) * hyp_len
+            s = (w_i * math.log(p_i) for w_i, p_i in zip(weight, p_n) if p_i > 0)
+            scores[i, j] = bp * math.exp(math.fsum(s))
+    return scores[:, 0] if single_weight else scores
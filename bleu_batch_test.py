@@ -0,0 +1,82 @@
+'''
+bleu_batch 与 nltk 的一致性检查
+
+sentenceBleuScores 的每个分数都必须与 nltk 逐对调用 sentence_bleu 的结果逐位相同（用 == 比较，不允许误差）。
+覆盖 method0 ~ method4、回退到 nltk 逐对计算的平滑方法、多组权重、auto_reweigh 和空的 hypothesis。
+
+:demo
+    python bleu_batch_test.py
+    pytest bleu_batch_test.py
+'''
+import random
+import warnings
+
+from nltk.translate.bleu_score import SmoothingFunction, sentence_bleu
+
+from bleu_batch import sentenceBleuScores
+
+SMOOTHING = SmoothingFunction()
+SMOOTHING_FUNCTIONS = [None, SMOOTHING.method1, SMOOTHING.method2, SMOOTHING.method3, SMOOTHING.method4,
+                       SMOOTHING.method5, SMOOTHING.method7]
+WEIGHTS = [(0.25, 0.25, 0.25, 0.25), (0.5, 0.5), (1,), (0.2, 0.2, 0.2, 0.2, 0.2), (0.1, 0.2, 0.3, 0.4)]
+
+
+def randomPairs(num_pairs=150, seed=0):
+    '''
+    随机生成 (references, hypothesis)，词表很小以保证有足够多的 n-gram 匹配；约十分之一的 hypothesis 为空
+    '''
+    rng = random.Random(seed)
+    vocab = ['the', 'a', 'cat', 'dog', 'sat', 'on', 'mat', 'is', 'here', 'there', '.', ',']
+
+    def sentence(min_length):
+        return [rng.choice(vocab) for _ in range(rng.randint(min_length, 14))]
+
+    list_of_references, hypotheses = [], []
+    for _ in range(num_pairs):
+        list_of_references.append([sentence(1) for _ in range(rng.randint(1, 3))])
+        hypotheses.append([] if rng.random() < 0.1 else sentence(1))
+    return list_of_references, hypotheses
+
+
+def nltkScores(list_of_references, hypotheses, weights, smoothing_function, auto_reweigh):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')    # nltk method0 的零匹配警告
+        return [sentence_bleu(references, hypothesis, weights, smoothing_function, auto_reweigh)
+                for references, hypothesis in zip(list_of_references, hypotheses)]
+
+
+def test_single_weights():
+    list_of_references, hypotheses = randomPairs()
+    for smoothing_function in SMOOTHING_FUNCTIONS:
+        for weights in WEIGHTS:
+            for auto_reweigh in (False, True):
+                expected = nltkScores(list_of_references, hypotheses, weights, smoothing_function, auto_reweigh)
+                scores = sentenceBleuScores(list_of_references, hypotheses, weights, smoothing_function, auto_reweigh)
+                assert scores.tolist() == expected, (smoothing_function, weights, auto_reweigh)
+
+
+def test_multiple_weights():
+    list_of_references, hypotheses = randomPairs(seed=1)
+    for smoothing_function in SMOOTHING_FUNCTIONS:
+        for auto_reweigh in (False, True):
+            expected = nltkScores(list_of_references, hypotheses, WEIGHTS, smoothing_function, auto_reweigh)
+            scores = sentenceBleuScores(list_of_references, hypotheses, WEIGHTS, smoothing_function, auto_reweigh)
+            assert scores.shape == (len(hypotheses), len(WEIGHTS))
+            assert scores.tolist() == [list(row) for row in expected], (smoothing_function, auto_reweigh)
+
+
+def test_empty_hypotheses():
+    list_of_references = [[['the', 'cat', 'sat']], [['a', 'dog'], ['the', 'dog']]]
+    hypotheses = [[], []]
+    for smoothing_function in SMOOTHING_FUNCTIONS:
+        expected = nltkScores(list_of_references, hypotheses, WEIGHTS[0], smoothing_function, False)
+        assert sentenceBleuScores(list_of_references, hypotheses, smoothing_function=smoothing_function).tolist() \
+            == expected
+    assert sentenceBleuScores([], []).tolist() == []
+
+
+if __name__ == '__main__':
+    test_single_weights()
+    test_multiple_weights()
+    test_empty_hypotheses()
+    print('sentenceBleuScores 与 nltk sentence_bleu 完全一致')
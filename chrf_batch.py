@@ -0,0 +1,98 @@
+'''
+批量计算字符级 chrF
+
+nltk 的 chrf_precision_recall_fscore_support 每次只算一对句子、一个 n，内部用 Counter 统计 n-gram。
+这里把一批句子拼成一个字符编码数组，n 阶 n-gram 由 n-1 阶 n-gram 的编号和下一个字符递推得到，所有阶只需一轮递推；
+每阶的 n-gram 编号与所属句子对组合后用 np.unique / np.bincount 一次统计出整批的匹配数。
+结果与 nltk 逐对计算的 precision、recall、fscore、tp 完全一致（同样的浮点运算顺序，同样的除零处理）。
+
+:demo
+    from chrf_batch import chrfPrecisionRecallFscoreSupport
+    precision, recall, fscore, tp = chrfPrecisionRecallFscoreSupport(['你是小猫'], ['你是小狗'], n_grams=[1, 2, 3], beta=2)
+    # 每个返回值的形状都是 (句子对数, len(n_grams))
+'''
+import numpy as np
+
+_MAX_ID = 2 ** 62
+
+
+def _encode(sentences):
+    '''
+    把句子列表拼接成 unicode 码位数组，返回码位、每个字符所属句子的下标和所在句子的结束位置
+    '''
+    lengths = np.fromiter((len(sentence) for sentence in sentences), dtype=np.int64, count=len(sentences))
+    codes = np.frombuffer(''.join(sentences).encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+    sentence_index = np.repeat(np.arange(len(sentences)), lengths)
+    ends = np.repeat(np.cumsum(lengths), lengths)
+    return codes, sentence_index, ends
+
+
+def chrfPrecisionRecallFscoreSupport(references, hypotheses, n_grams=(3,), beta=3.0, epsilon=1e-16):
+    '''
+    批量计算每对句子在各阶字符 n-gram 上的 precision、recall、fscore 和 tp，等价于对每对句子、每个 n 调用
+    nltk.translate.chrf_score.chrf_precision_recall_fscore_support(reference, hypothesis, n, beta, epsilon)
+
+    :param references: 参考译文，字符串列表
+    :param hypotheses: 候选译文，字符串列表，数量与 references 相同
+    :param n_grams: 需要计算的 n 列表，如 [1, 2, 3]
+    :param beta: 用于调节 recall 和 precision 作用于分数的权重
+    :param epsilon: 分母为 0 时 precision、recall、fscore 的取值
+    :return: precision, recall, fscore, tp 四个数组，形状均为 (len(references), len(n_grams))
+    '''
+    if len(references) != len(hypotheses):
+        raise Exception('the number of references and hypotheses should be the same')
+    n_grams = list(n_grams)
+    if any(n < 1 for n in n_grams):
+        raise Exception('n_gram should be a positive integer')
+    num_pairs = len(references)
+    shape = (num_pairs, len(n_grams))
+    tp = np.zeros(shape, dtype=np.int64)
+    tpfp = np.zeros(shape, dtype=np.int64)
+    tpfn = np.zeros(shape, dtype=np.int64)
+
+    codes, sentence_index, ends = _encode(list(references) + list(hypotheses))
+    if len(codes) and n_grams:
+        pair = sentence_index % num_pairs
+        is_hypothesis = sentence_index >= num_pairs
+        chars, char_ids = np.unique(codes, return_inverse=True)
+        vocab_size = len(chars)
+        char_ids = char_ids.astype(np.int64)
+        grams = char_ids
+        bound = vocab_size    # grams 中编号的上界（不含）
+        positions = np.arange(len(codes))
+        for n in range(1, max(n_grams) + 1):
+            if n > 1:
+                # n 阶 n-gram = (n-1 阶 n-gram, 第 n 个字符)；编号可能溢出时先压缩为稠密编号
+                if bound > _MAX_ID // vocab_size:
+                    unique_grams, grams = np.unique(grams, return_inverse=True)
+                    bound = len(unique_grams)
+                grams = grams[:-1] * vocab_size + char_ids[n - 1:]
+                bound *= vocab_size
+            if n not in n_grams or len(grams) == 0:
+                continue
+            if bound > _MAX_ID // num_pairs:
+                unique_grams, grams = np.unique(grams, return_inverse=True)
+                bound = len(unique_grams)
+            valid = positions[:len(grams)] + n <= ends[:len(grams)]    # 不跨越句子边界
+            gram_pair = pair[:len(grams)][valid]
+            gram_is_hypothesis = is_hypothesis[:len(grams)][valid]
+            num_grams = bound
+            keys, inverse = np.unique(gram_pair * num_grams + grams[valid], return_inverse=True)
+            reference_counts = np.bincount(inverse[~gram_is_hypothesis], minlength=len(keys))
+            hypothesis_counts = np.bincount(inverse[gram_is_hypothesis], minlength=len(keys))
+            overlap = np.minimum(reference_counts, hypothesis_counts)
+            for column in [i for i, order in enumerate(n_grams) if order == n]:
+                tp[:, column] = np.bincount(keys // num_grams, weights=overlap, minlength=num_pairs).astype(np.int64)
+                tpfp[:, column] = np.bincount(gram_pair[gram_is_hypothesis], minlength=num_pairs)
+                tpfn[:, column] = np.bincount(gram_pair[~gram_is_hypothesis], minlength=num_pairs)
+
+    # 与 nltk 相同的运算顺序，保证浮点结果逐位一致
+    factor = beta ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = tp / tpfp
+        recall = tp / tpfn
+        denominator = factor * precision + recall
+        fscore = (1 + factor) * (precision * recall) / denominator
+    zero_division = (tpfp == 0) | (tpfn == 0) | (denominator == 0)
+    precision[zero_division] = recall[zero_division] = fscore[zero_division] = epsilon
+    return precision, recall, fscore, tp
@@ -1,9 +1,10 @@
-from nltk.translate.meteor_score import meteor_score
-from nltk.translate.bleu_score import sentence_bleu
+from meteor_batch import meteorScores
+from bleu_batch import sentenceBleuScores
 from bleurt import score
 from rouge import Rouge
 from nltk.translate.chrf_score import chrf_precision_recall_fscore_support
 from evaluate import load
+from tokenization import tokenize
 
 
 def getRougeScore(reference_sentence, generated_sentence,
@@ -95,12 +96,11 @@ def deal_data(reference, candidate, language):    # 分词
     '''
     # 生成reference与candidate
     if language == 'English':  # 英文直接分词
-        reference = [reference.split()]
-        candidate = candidate.split()
+        reference = [tokenize(reference, 'whitespace')]
+        candidate = tokenize(candidate, 'whitespace')
     elif language == 'Chinese':  # 中文通过jieba库分词
-        import jieba
-        reference = [' '.join(jieba.cut(reference)).split()]
-        candidate = ' '.join(jieba.cut(candidate)).split()
+        reference = [tokenize(reference, 'jieba')]
+        candidate = tokenize(candidate, 'jieba')
     else:
         print('Only English or Chinese supported.')
         exit()
@@ -135,8 +135,8 @@ def get_bleu(reference: str, candidate: str, weights=(0.25, 0.25, 0.25, 0.25), l
     reference, candidate = deal_data(reference, candidate, language)    # 调用deal_data分词
     # 计算准确率、召回率
     p, r = get_pr(reference[0], candidate)
-    # 计算BLEU分数
-    score = sentence_bleu(reference, candidate, weights=weights)
+    # 计算BLEU分数，结果与 nltk 的 sentence_bleu 相同
+    score = sentenceBleuScores([reference], [candidate], weights=weights)[0].tolist()
     return score, p, r
 
 
@@ -154,8 +154,8 @@ def get_meteor(reference: str, candidate: str, language='English', alpha=0.9, be
     reference, candidate = deal_data(reference, candidate, language)    # 调用deal_data分词
     # 计算准确率，召回率
     p, r = get_pr(reference[0], candidate)
-    # 计算METEOR分数
-    score = meteor_score(reference, candidate, alpha=alpha, beta=beta, gamma=gamma)
+    # 计算METEOR分数，结果与 nltk 的 meteor_score 相同
+    score = meteorScores([reference], [candidate], alpha=alpha, beta=beta, gamma=gamma)[0]
     return score, p, r
 
 
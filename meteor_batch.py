@@ -0,0 +1,51 @@
+'''
+批量计算 METEOR
+
+nltk 的 meteor_score 对每对句子逐词调用 Porter 词干提取，对每个未匹配的候选词查询一次 WordNet。
+计算逻辑在 metrics/meteor/meteor_engine.py（evaluate 的 meteor 指标也使用它）：整批句子的词干和 WordNet 同义词先建成索引，
+对齐时只做字典和集合查找，结果与 nltk 逐对调用 meteor_score 完全相同。
+这里加载该文件，并维护一个进程内共享的索引，多次调用之间同一个词只提取一次词干、只查询一次 WordNet。
+
+:demo
+    from meteor_batch import meteorScores, indexStats
+    scores = meteorScores([[('this', 'is', 'a', 'easy', 'test')]], [('this', 'is', 'a', 'test')])
+    indexStats()    # 本次统计以来的查找次数、未命中次数和命中率
+'''
+import importlib.util
+import os
+import sys
+
+
+def _loadEngine():
+    if 'meteor_engine' in sys.modules:
+        return sys.modules['meteor_engine']
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metrics', 'meteor', 'meteor_engine.py')
+    spec = importlib.util.spec_from_file_location('meteor_engine', path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['meteor_engine'] = module    # 进程池按模块名反序列化索引
+    spec.loader.exec_module(module)
+    return module
+
+
+meteor_engine = _loadEngine()
+index = meteor_engine.MeteorIndex()
+
+
+def meteorScores(list_of_references, hypotheses, alpha=0.9, beta=3.0, gamma=0.5, n_jobs=1):
+    '''
+    批量计算 METEOR，等价于对每对句子调用 nltk.translate.meteor_score.meteor_score(references, hypothesis, alpha, beta, gamma)
+    :param list_of_references: 每个候选译文的参考译文列表，每个参考译文是分好词的序列
+    :param hypotheses: 候选译文列表，每个候选译文是分好词的序列
+    :param n_jobs: 进程数，None 表示使用全部 CPU；索引在主进程建好后发给每个进程一次
+    :return: 分数列表
+    '''
+    return meteor_engine.meteor_scores(list_of_references, hypotheses, alpha=alpha, beta=beta, gamma=gamma,
+                                       index=index, num_workers=n_jobs)
+
+
+def indexStats():
+    return index.stats()
+
+
+def resetIndexStats():
+    index.reset_stats()
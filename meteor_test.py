@@ -0,0 +1,85 @@
+'''
+METEOR 引擎与 nltk 的一致性检查
+
+metrics/meteor/meteor_engine.py 的分数必须与 nltk 逐对调用 meteor_score 的结果逐位相同。
+WordNet 用一个固定的小词典代替（不需要下载 WordNet 数据），同义词组里混有带下划线的多词词条，词干用 nltk 的 PorterStemmer。
+
+:demo
+    python meteor_test.py
+    pytest meteor_test.py
+'''
+import random
+
+from nltk.translate.meteor_score import meteor_score
+
+from meteor_batch import meteor_engine
+
+VOCAB = ['the', 'a', 'cat', 'cats', 'dog', 'dogs', 'run', 'running', 'runs', 'ran', 'quick', 'quickly', 'fast',
+         'sat', 'sitting', 'on', 'mat', 'mats', 'rug', 'big', 'large', 'house', 'home', 'is', 'was', 'The', 'Cat']
+SYNONYM_GROUPS = [['cat', 'kitty', 'true_cat'], ['dog', 'hound', 'domestic_dog'], ['quick', 'fast', 'speedy'],
+                  ['mat', 'rug'], ['big', 'large', 'great'], ['house', 'home', 'dwelling'], ['run', 'ran'],
+                  ['sit', 'sat', 'sitting']]
+
+
+class StubLemma:
+    def __init__(self, name):
+        self._name = name
+
+    def name(self):
+        return self._name
+
+
+class StubSynset:
+    def __init__(self, names):
+        self.names = names
+
+    def lemmas(self):
+        return [StubLemma(name) for name in self.names]
+
+
+class StubWordNet:
+    '''
+    只提供 meteor 用到的 synsets(word)：返回包含该词的同义词组
+    '''
+
+    def synsets(self, word):
+        return [StubSynset(group) for group in SYNONYM_GROUPS if word in group]
+
+
+def randomPairs(num_pairs=200, seed=0):
+    rng = random.Random(seed)
+
+    def sentence():
+        return [rng.choice(VOCAB) for _ in range(rng.randint(1, 12))]
+
+    list_of_references = [[sentence() for _ in range(rng.randint(1, 3))] for _ in range(num_pairs)]
+    hypotheses = [sentence() for _ in range(num_pairs)]
+    return list_of_references, hypotheses
+
+
+def nltkScores(list_of_references, hypotheses, **kwargs):
+    return [meteor_score(references, hypothesis, wordnet=StubWordNet(), **kwargs)
+            for references, hypothesis in zip(list_of_references, hypotheses)]
+
+
+def test_meteor_scores():
+    list_of_references, hypotheses = randomPairs()
+    for kwargs in ({}, {'alpha': 0.85, 'beta': 0.2, 'gamma': 0.6}):
+        expected = nltkScores(list_of_references, hypotheses, **kwargs)
+        index = meteor_engine.MeteorIndex(wordnet=StubWordNet())
+        assert meteor_engine.meteor_scores(list_of_references, hypotheses, index=index, **kwargs) == expected
+        # 同一个索引再算一次（全部命中），结果不变
+        assert meteor_engine.meteor_scores(list_of_references, hypotheses, index=index, **kwargs) == expected
+
+
+def test_meteor_scores_parallel():
+    list_of_references, hypotheses = randomPairs(seed=1)
+    index = meteor_engine.MeteorIndex(wordnet=StubWordNet())
+    scores = meteor_engine.meteor_scores(list_of_references, hypotheses, index=index, num_workers=2, chunk_size=32)
+    assert scores == nltkScores(list_of_references, hypotheses)
+
+
+if __name__ == '__main__':
+    test_meteor_scores()
+    test_meteor_scores_parallel()
+    print('meteor_engine 与 nltk meteor_score 完全一致')
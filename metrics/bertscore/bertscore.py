@@ -14,14 +14,21 @@
 """ BERTScore metric. """
 
 import functools
+import time
+from collections import defaultdict
 from contextlib import contextmanager
 
 import bert_score
 import datasets
+import torch
 from packaging import version
+from torch.nn.utils.rnn import pad_sequence
+from tqdm.auto import tqdm
 
 import evaluate
 
+from .embedding_cache import EmbeddingCache
+
 
 @contextmanager
 def filter_logging_context():
@@ -36,6 +43,187 @@ def filter_logging_context():
         logger.removeFilter(filter_log)
 
 
+def length_batches(lengths, batch_size=64, max_tokens=None):
+    """Splits the indices of `lengths` into batches, longest first.
+
+    Without `max_tokens` the batches hold `batch_size` items each. With `max_tokens` a batch grows while
+    `number of items x longest item` (the size of the padded batch) stays within the budget, so short
+    sentences are batched together in large numbers and long ones are not padded to each other's length.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    if max_tokens is None:
+        return [order[start : start + batch_size] for start in range(0, len(order), batch_size)]
+    batches = []
+    for i in order:
+        # items come longest first, so the first item of a batch sets its padded length
+        if batches and (len(batches[-1]) + 1) * max(lengths[batches[-1][0]], 1) <= max_tokens:
+            batches[-1].append(i)
+        else:
+            batches.append([i])
+    return batches
+
+
+def embed_sentences(
+    sentences,
+    model,
+    tokenizer,
+    idf_dict,
+    batch_size=64,
+    device="cuda:0",
+    all_layers=False,
+    cache=None,
+    max_tokens=None,
+    verbose=False,
+):
+    """Returns `{sentence: (embedding, idf)}` for the unique `sentences`, encoding only those missing from `cache`.
+
+    Mirrors the embedding stage of `bert_score.utils.bert_cos_score_idf`: sentences to encode are sorted by
+    decreasing word count and embedded `batch_size` at a time, or, with `max_tokens`, sorted by token length and
+    batched under that token budget.
+    """
+    encoded = {sen: bert_score.utils.sent_encode(tokenizer, sen) for sen in set(sentences)}
+    stats_dict = {}
+    missing = []
+    for sen in encoded:
+        emb = cache.get(sen) if cache is not None else None
+        if emb is None:
+            missing.append(sen)
+        else:
+            stats_dict[sen] = emb
+    if max_tokens is None:
+        lengths = [len(sen.split(" ")) for sen in missing]
+    else:
+        lengths = [len(encoded[sen]) for sen in missing]
+    batches = length_batches(lengths, batch_size, max_tokens)
+    if verbose:
+        print(f"computing bert embedding ({len(stats_dict)} of {len(encoded)} sentences cached).")
+    for batch in tqdm(batches) if verbose else batches:
+        sen_batch = [missing[i] for i in batch]
+        padded, lens, mask = bert_score.utils.padding([encoded[sen] for sen in sen_batch], tokenizer.pad_token_id)
+        embs = bert_score.utils.bert_encode(
+            model, padded.to(device=device), attention_mask=mask.to(device=device), all_layers=all_layers
+        ).cpu()
+        for i, sen in enumerate(sen_batch):
+            emb = embs[i, : lens[i]].clone()
+            if cache is not None:
+                cache.put(sen, emb)
+            stats_dict[sen] = emb
+    # idf weights depend on the idf dict of this call, so they are never cached
+    return {
+        sen: (emb, torch.tensor([idf_dict[i] for i in encoded[sen]], dtype=torch.float))
+        for sen, emb in stats_dict.items()
+    }
+
+
+def cached_cos_score_idf(
+    model,
+    refs,
+    hyps,
+    tokenizer,
+    idf_dict,
+    batch_size=64,
+    device="cuda:0",
+    all_layers=False,
+    cache=None,
+    max_tokens=None,
+    verbose=False,
+):
+    """Same as `bert_score.utils.bert_cos_score_idf`, but sentence embeddings are looked up in `cache` first.
+
+    With `max_tokens`, sentences and sentence pairs are grouped by length under that token budget instead of
+    `batch_size`, and the scores are put back in the input order.
+    """
+    stats_dict = embed_sentences(
+        refs + hyps, model, tokenizer, idf_dict, batch_size, device, all_layers, cache, max_tokens, verbose
+    )
+
+    def pad_batch_stats(sen_batch, device):
+        emb, idf = zip(*[stats_dict[s] for s in sen_batch])
+        emb = [e.to(device) for e in emb]
+        idf = [i.to(device) for i in idf]
+        lens = torch.tensor([e.size(0) for e in emb], dtype=torch.long)
+        emb_pad = pad_sequence(emb, batch_first=True, padding_value=2.0)
+        idf_pad = pad_sequence(idf, batch_first=True)
+        base = torch.arange(lens.max(), dtype=torch.long).expand(len(lens), lens.max())
+        return emb_pad, (base < lens.unsqueeze(1)).to(device), idf_pad
+
+    if max_tokens is None:
+        batches = [list(range(start, min(start + batch_size, len(refs)))) for start in range(0, len(refs), batch_size)]
+    else:
+        lengths = [max(stats_dict[ref][0].size(0), stats_dict[hyp][0].size(0)) for ref, hyp in zip(refs, hyps)]
+        batches = length_batches(lengths, batch_size, max_tokens)
+
+    device = next(model.parameters()).device
+    preds = []
+    if verbose:
+        print("computing greedy matching.")
+    with torch.no_grad():
+        for batch in tqdm(batches) if verbose else batches:
+            ref_stats = pad_batch_stats([refs[i] for i in batch], device)
+            hyp_stats = pad_batch_stats([hyps[i] for i in batch], device)
+            P, R, F1 = bert_score.utils.greedy_cos_idf(*ref_stats, *hyp_stats, all_layers)
+            preds.append(torch.stack((P, R, F1), dim=-1).cpu())
+    dim = 1 if all_layers else 0
+    preds = torch.cat(preds, dim=dim)
+    if max_tokens is not None:
+        # restore the input order
+        order = torch.tensor([i for batch in batches for i in batch], dtype=torch.long)
+        preds = preds.index_select(dim, torch.argsort(order))
+    return preds
+
+
+def cached_score(scorer, cands, refs, batch_size=64, cache=None, max_tokens=None, verbose=False):
+    """Same as `bert_score.BERTScorer.score`, computing the embeddings through `cached_cos_score_idf`."""
+    ref_group_boundaries = None
+    if not isinstance(refs[0], str):
+        ref_group_boundaries = []
+        ori_cands, ori_refs = cands, refs
+        cands, refs = [], []
+        count = 0
+        for cand, ref_group in zip(ori_cands, ori_refs):
+            cands += [cand] * len(ref_group)
+            refs += ref_group
+            ref_group_boundaries.append((count, count + len(ref_group)))
+            count += len(ref_group)
+
+    if verbose:
+        print("calculating scores...")
+        start = time.perf_counter()
+
+    if scorer.idf:
+        idf_dict = scorer._idf_dict
+    else:
+        idf_dict = defaultdict(lambda: 1.0)
+        idf_dict[scorer._tokenizer.sep_token_id] = 0
+        idf_dict[scorer._tokenizer.cls_token_id] = 0
+
+    all_preds = cached_cos_score_idf(
+        scorer._model,
+        refs,
+        cands,
+        scorer._tokenizer,
+        idf_dict,
+        batch_size=batch_size,
+        device=scorer.device,
+        all_layers=scorer.all_layers,
+        cache=cache,
+        max_tokens=max_tokens,
+        verbose=verbose,
+    ).cpu()
+
+    if ref_group_boundaries is not None:
+        all_preds = torch.stack([all_preds[start:end].max(dim=0)[0] for start, end in ref_group_boundaries], dim=0)
+
+    if scorer.rescale_with_baseline:
+        all_preds = (all_preds - scorer.baseline_vals) / (1 - scorer.baseline_vals)
+
+    if verbose:
+        time_diff = time.perf_counter() - start
+        print(f"done in {time_diff:.2f} seconds, {len(refs) / time_diff:.2f} sentences/sec")
+
+    return all_preds[..., 0], all_preds[..., 1], all_preds[..., 2]
+
+
 _CITATION = """\
 @inproceedings{bert-score,
   title={BERTScore: Evaluating Text Generation with BERT},
@@ -79,6 +267,15 @@ Args:
     rescale_with_baseline (bool): Rescale bertscore with pre-computed baseline.
     baseline_path (str): Customized baseline file.
     use_fast_tokenizer (bool): `use_fast` parameter passed to HF tokenizer. New in version 0.3.10.
+    embedding_cache (bool): Reuse the token embeddings of sentences already encoded by this module, so scoring
+        several systems against the same references only encodes the new candidates.
+    embedding_cache_dir (str): Also keep the cached embeddings on disk in this directory, shared across processes.
+        Setting it turns on `embedding_cache`.
+    embedding_cache_memory (int): Byte budget of the in-memory embedding cache.
+    embedding_cache_disk (int): Byte budget of the on-disk embedding cache.
+    max_tokens (int): Token budget of a batch. When set, sentences are sorted by token length and batched so that
+        `batch length x longest sentence` stays within the budget, instead of `batch_size` sentences per batch;
+        the scores are returned in the input order.
 
 Returns:
     precision: Precision.
@@ -142,6 +339,11 @@ class BERTScore(evaluate.Metric):
         rescale_with_baseline=False,
         baseline_path=None,
         use_fast_tokenizer=False,
+        embedding_cache=False,
+        embedding_cache_dir=None,
+        embedding_cache_memory=2**28,
+        embedding_cache_disk=2**32,
+        max_tokens=None,
     ):
 
         if isinstance(references[0], str):
@@ -200,12 +402,43 @@ class BERTScore(evaluate.Metric):
                     baseline_path=baseline_path,
                 )
 
-        (P, R, F) = self.cached_bertscorer.score(
-            cands=predictions,
-            refs=references,
-            verbose=verbose,
-            batch_size=batch_size,
-        )
+        cache = None
+        if embedding_cache or embedding_cache_dir is not None:
+            # embeddings only depend on the model, the layer(s) and the tokenizer, not on idf or rescaling
+            namespace = "{}_all-layers={}".format(
+                get_hash(
+                    model=model_type,
+                    num_layers=num_layers,
+                    idf=False,
+                    rescale_with_baseline=False,
+                    use_custom_baseline=False,
+                ),
+                all_layers,
+            )
+            cache = getattr(self, "cached_embeddings", None)
+            if cache is None or cache.namespace != namespace or cache.cache_dir != embedding_cache_dir:
+                cache = EmbeddingCache(namespace, embedding_cache_dir, embedding_cache_memory, embedding_cache_disk)
+                self.cached_embeddings = cache
+            cache.max_memory_bytes = embedding_cache_memory
+            cache.max_disk_bytes = embedding_cache_disk
+
+        if cache is not None or max_tokens is not None:
+            (P, R, F) = cached_score(
+                self.cached_bertscorer,
+                predictions,
+                references,
+                batch_size=batch_size,
+                cache=cache,
+                max_tokens=max_tokens,
+                verbose=verbose,
+            )
+        else:
+            (P, R, F) = self.cached_bertscorer.score(
+                cands=predictions,
+                refs=references,
+                verbose=verbose,
+                batch_size=batch_size,
+            )
         output_dict = {
             "precision": P.tolist(),
             "recall": R.tolist(),
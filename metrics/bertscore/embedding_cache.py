@@ -0,0 +1,164 @@
+# Copyright 2020 The HuggingFace Evaluate Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" Size-bounded in-memory and on-disk cache of BERTScore token embeddings. """
+
+import hashlib
+import os
+import tempfile
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+import torch
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+# once over its budget, the on-disk store is evicted down to this fraction of it
+_DISK_LOW_WATER = 0.9
+
+
+def _mapped_tensor(path):
+    """Wraps the read-only memory map of a `.npy` file in a tensor, without copying it."""
+    with warnings.catch_warnings():
+        # torch warns that the tensor is not writable; the cache never writes to it
+        warnings.simplefilter("ignore", UserWarning)
+        return torch.from_numpy(np.load(path, mmap_mode="r"))
+
+
+class EmbeddingCache:
+    """Caches the token embeddings of sentences for one embedding model.
+
+    Entries are keyed by `namespace` (which must identify the model, the layer(s) used and the tokenizer) and the
+    sentence text. Recently used embeddings are kept in memory; if `cache_dir` is given they are also written to one
+    `.npy` file per sentence and read back memory-mapped, so later processes only encode sentences they have not seen.
+    Both stores evict least recently used entries once they grow past their byte budget; the on-disk store keeps an
+    index of its files, read once when the cache is created, and is evicted down to 90% of its budget.
+
+    Args:
+        namespace (str): identifies the embedding model, e.g. the BERTScore hashcode plus the layer setting.
+        cache_dir (str): directory of the on-disk store. `None` keeps the cache in memory only.
+        max_memory_bytes (int): byte budget of the in-memory store.
+        max_disk_bytes (int): byte budget of the on-disk store.
+    """
+
+    def __init__(self, namespace, cache_dir=None, max_memory_bytes=2**28, max_disk_bytes=2**32):
+        self.namespace = namespace
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self.directory = None
+        self._disk = OrderedDict()  # key -> file size, least recently used first
+        self._disk_bytes = 0
+        if cache_dir is not None:
+            self.directory = os.path.join(os.path.expanduser(cache_dir), _digest(namespace))
+            os.makedirs(self.directory, exist_ok=True)
+            for _, path, size in sorted(self._disk_entries()):
+                self._track(os.path.basename(path)[: -len(".npy")], size)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".npy")
+
+    def _disk_entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npy"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.path, stat.st_size))
+        return entries
+
+    def _track(self, key, size):
+        if key in self._disk:
+            self._disk.move_to_end(key)
+            return
+        self._disk[key] = size
+        self._disk_bytes += size
+
+    def _remember(self, key, embedding):
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = embedding
+        self._memory_bytes += embedding.numel() * embedding.element_size()
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.numel() * evicted.element_size()
+
+    def get(self, sentence):
+        """Returns the cached embedding tensor of `sentence`, or `None`."""
+        key = _digest(sentence)
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return self._memory[key]
+        if self.directory is not None:
+            path = self._path(key)
+            try:
+                embedding = _mapped_tensor(path)
+                # the modification time orders the entries for eviction in later processes
+                os.utime(path)
+                self._track(key, os.path.getsize(path))
+            except (OSError, ValueError):
+                embedding = None
+            if embedding is not None:
+                self._remember(key, embedding)
+                self.hits += 1
+                return embedding
+        self.misses += 1
+        return None
+
+    def put(self, sentence, embedding):
+        """Stores the embedding tensor (sequence length x hidden size) of `sentence`."""
+        key = _digest(sentence)
+        embedding = embedding.detach().cpu()
+        self._remember(key, embedding)
+        if self.directory is None or key in self._disk:
+            return
+        path = self._path(key)
+        if not os.path.exists(path):  # another process may have written it
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, embedding.numpy())
+            os.replace(tmp, path)
+        self._track(key, os.path.getsize(path))
+        if self._disk_bytes > self.max_disk_bytes:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        target = self.max_disk_bytes * _DISK_LOW_WATER
+        for key in list(self._disk):
+            if self._disk_bytes <= target:
+                break
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass  # already evicted by another process
+            except OSError:
+                continue
+            self._disk_bytes -= self._disk.pop(key)
+
+    def clear(self):
+        self._memory.clear()
+        self._memory_bytes = 0
+        if self.directory is not None:
+            for _, path, _ in self._disk_entries():
+                os.remove(path)
+            self._disk.clear()
+            self._disk_bytes = 0
@@ -13,12 +13,14 @@
 # limitations under the License.
 """ BLEU metric. """
 
+import math
+from collections import Counter
+
 import datasets
 
 import evaluate
 
-from .nmt_bleu import compute_bleu  # From: https://github.com/tensorflow/nmt/blob/master/nmt/scripts/bleu.py
-from .tokenizer_13a import Tokenizer13a
+from .tokenizer_13a import Tokenizer13a, shared_cache, tokenize_corpus
 
 
 _CITATION = """\
@@ -61,8 +63,14 @@ Args:
     tokenizer : approach used for tokenizing `predictions` and `references`.
         The default tokenizer is `tokenizer_13a`, a minimal tokenization approach that is equivalent to `mteval-v13a`, used by WMT.
         This can be replaced by any function that takes a string as input and returns a list of tokens as output.
+    tokenization_cache_size: number of tokenized lines kept in memory by the 13a tokenization cache, shared by the
+        bleu, google_bleu and sacrebleu metrics of the process. Defaults to the current size (initially 2**16).
+    tokenization_cache_dir: directory where the 13a tokenization cache also stores the tokenized lines, to reuse
+        them across processes. Defaults to None (memory only).
     max_order: Maximum n-gram order to use when computing BLEU score.
     smooth: Whether or not to apply Lin et al. 2004 smoothing.
+    `tokenizer`, `max_order` and the tokenization cache arguments can also be passed to `add_batch` and `add`, which
+    then only accumulate the sufficient statistics of the corpus (see `BleuStatistics`).
 Returns:
     'bleu': bleu score,
     'precisions': geometric mean of n-gram precisions,
@@ -84,6 +92,141 @@ Examples:
 """
 
 
+def _get_ngrams(segment, max_order):
+    """Counts the n-grams of orders 1 to `max_order` of a tokenized segment."""
+    return Counter(
+        tuple(segment[i : i + order]) for order in range(1, max_order + 1) for i in range(len(segment) - order + 1)
+    )
+
+
+class BleuStatistics:
+    """Sufficient statistics of corpus BLEU: the matched and possible n-grams of every order and the translation and
+    reference lengths.
+
+    Tokenized segments are added one at a time and only `2 * max_order + 2` integers are kept, so memory does not grow
+    with the corpus. Statistics of shards of a corpus (e.g. computed by several workers) can be combined with `merge`,
+    or sent as the plain dict of `to_dict`; the counts are integers, so the merged statistics, and the score, are
+    exactly those of the whole corpus. `compute` does the same arithmetic as `compute_bleu` of
+    https://github.com/tensorflow/nmt/blob/master/nmt/scripts/bleu.py.
+
+    Args:
+        max_order (`int`, *optional*, defaults to `4`):
+            Maximum n-gram order to use when computing BLEU score.
+    """
+
+    def __init__(self, max_order=4):
+        self.max_order = max_order
+        self.matches_by_order = [0] * max_order
+        self.possible_matches_by_order = [0] * max_order
+        self.translation_length = 0
+        self.reference_length = 0
+
+    def update(self, references, translation):
+        """Adds a tokenized translation and its tokenized references."""
+        max_order = self.max_order
+        self.reference_length += min(len(r) for r in references)
+        self.translation_length += len(translation)
+
+        merged_ref_ngram_counts = Counter()
+        for reference in references:
+            merged_ref_ngram_counts |= _get_ngrams(reference, max_order)
+        overlap = _get_ngrams(translation, max_order) & merged_ref_ngram_counts
+        for ngram, count in overlap.items():
+            self.matches_by_order[len(ngram) - 1] += count
+        for order in range(1, max_order + 1):
+            possible_matches = len(translation) - order + 1
+            if possible_matches > 0:
+                self.possible_matches_by_order[order - 1] += possible_matches
+        return self
+
+    def update_many(self, reference_corpus, translation_corpus):
+        """Adds the segments of a tokenized corpus."""
+        for references, translation in zip(reference_corpus, translation_corpus):
+            self.update(references, translation)
+        return self
+
+    def merge(self, other):
+        """Adds the statistics of another `BleuStatistics` with the same `max_order`."""
+        if other.max_order != self.max_order:
+            raise ValueError(f"Cannot merge BLEU statistics of max_order {other.max_order} into {self.max_order}.")
+        for i in range(self.max_order):
+            self.matches_by_order[i] += other.matches_by_order[i]
+            self.possible_matches_by_order[i] += other.possible_matches_by_order[i]
+        self.translation_length += other.translation_length
+        self.reference_length += other.reference_length
+        return self
+
+    def to_dict(self):
+        return {
+            "max_order": self.max_order,
+            "matches_by_order": list(self.matches_by_order),
+            "possible_matches_by_order": list(self.possible_matches_by_order),
+            "translation_length": self.translation_length,
+            "reference_length": self.reference_length,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        statistics = cls(state["max_order"])
+        statistics.matches_by_order = list(state["matches_by_order"])
+        statistics.possible_matches_by_order = list(state["possible_matches_by_order"])
+        statistics.translation_length = state["translation_length"]
+        statistics.reference_length = state["reference_length"]
+        return statistics
+
+    def compute(self, smooth=False):
+        """Returns the outputs of the metric for everything added so far."""
+        max_order = self.max_order
+        precisions = [0] * max_order
+        for i in range(0, max_order):
+            if smooth:
+                precisions[i] = (self.matches_by_order[i] + 1.0) / (self.possible_matches_by_order[i] + 1.0)
+            else:
+                if self.possible_matches_by_order[i] > 0:
+                    precisions[i] = float(self.matches_by_order[i]) / self.possible_matches_by_order[i]
+                else:
+                    precisions[i] = 0.0
+
+        if min(precisions) > 0:
+            p_log_sum = sum((1.0 / max_order) * math.log(p) for p in precisions)
+            geo_mean = math.exp(p_log_sum)
+        else:
+            geo_mean = 0
+
+        ratio = float(self.translation_length) / self.reference_length
+        if ratio > 1.0:
+            bp = 1.0
+        else:
+            bp = math.exp(1 - 1.0 / ratio)
+
+        return {
+            "bleu": geo_mean * bp,
+            "precisions": precisions,
+            "brevity_penalty": bp,
+            "length_ratio": ratio,
+            "translation_length": self.translation_length,
+            "reference_length": self.reference_length,
+        }
+
+
+def bleu_statistics(
+    predictions,
+    references,
+    tokenizer=Tokenizer13a(),
+    max_order=4,
+    tokenization_cache_size=None,
+    tokenization_cache_dir=None,
+):
+    """Tokenizes a batch of predictions and references and returns its `BleuStatistics`."""
+    # if only one reference is provided make sure we still use list of lists
+    if isinstance(references[0], str):
+        references = [[ref] for ref in references]
+
+    shared_cache(tokenization_cache_size, tokenization_cache_dir)
+    predictions, references = tokenize_corpus(tokenizer, predictions, references)
+    return BleuStatistics(max_order).update_many(references, predictions)
+
+
 @evaluate.utils.file_utils.add_start_docstrings(_DESCRIPTION, _KWARGS_DESCRIPTION)
 class Bleu(evaluate.Metric):
     def _info(self):
@@ -112,22 +255,72 @@ class Bleu(evaluate.Metric):
             ],
         )
 
-    def _compute(self, predictions, references, tokenizer=Tokenizer13a(), max_order=4, smooth=False):
-        # if only one reference is provided make sure we still use list of lists
-        if isinstance(references[0], str):
-            references = [[ref] for ref in references]
+    def add_batch(self, *, predictions=None, references=None, **kwargs):
+        """Add a batch of predictions and references.
+
+        In a single process, only the sufficient statistics of the batch are kept, merged into `self.statistics`.
+        """
+        if self.num_process > 1:
+            return super().add_batch(predictions=predictions, references=references, **kwargs)
+        if predictions is None or references is None:
+            raise ValueError("add_batch requires both predictions and references.")
+        if len(predictions) != len(references):
+            raise ValueError(
+                f"Predictions and references have different lengths: {len(predictions)} and {len(references)}"
+            )
+        if not predictions:
+            return
+        statistics = bleu_statistics(predictions, references, **kwargs)
+        if getattr(self, "statistics", None) is None:
+            self.statistics = statistics
+        else:
+            self.statistics.merge(statistics)
 
-        references = [[tokenizer(r) for r in ref] for ref in references]
-        predictions = [tokenizer(p) for p in predictions]
-        score = compute_bleu(
-            reference_corpus=references, translation_corpus=predictions, max_order=max_order, smooth=smooth
+    def add(self, *, prediction=None, reference=None, **kwargs):
+        """Add one prediction and its references.
+
+        In a single process, only the sufficient statistics of the pair are kept, merged into `self.statistics`.
+        """
+        if self.num_process > 1:
+            return super().add(prediction=prediction, reference=reference, **kwargs)
+        if prediction is None or reference is None:
+            raise ValueError("add requires both a prediction and a reference.")
+        self.add_batch(predictions=[prediction], references=[reference], **kwargs)
+
+    def compute(self, *, predictions=None, references=None, **kwargs):
+        """Compute BLEU, over the given predictions and references and those added with `add_batch` and `add`.
+
+        In a single process, the score is computed from the accumulated `BleuStatistics`, which are then reset.
+        `tokenizer` and `max_order` apply to the given predictions and references only: batches already added were
+        tokenized with the arguments given to `add_batch`.
+        """
+        if self.num_process > 1:
+            return super().compute(predictions=predictions, references=references, **kwargs)
+        smooth = kwargs.pop("smooth", False)
+        if predictions is not None or references is not None:
+            self.add_batch(predictions=predictions, references=references, **kwargs)
+        statistics = getattr(self, "statistics", None)
+        if statistics is None:
+            raise ValueError("No predictions or references were added to compute BLEU on.")
+        if kwargs.get("max_order", statistics.max_order) != statistics.max_order:
+            raise ValueError(
+                f"max_order={kwargs['max_order']} differs from the max_order={statistics.max_order} of the added "
+                "batches."
+            )
+        self.statistics = None
+        return statistics.compute(smooth=smooth)
+
+    def _compute(
+        self,
+        predictions,
+        references,
+        tokenizer=Tokenizer13a(),
+        max_order=4,
+        smooth=False,
+        tokenization_cache_size=None,
+        tokenization_cache_dir=None,
+    ):
+        statistics = bleu_statistics(
+            predictions, references, tokenizer, max_order, tokenization_cache_size, tokenization_cache_dir
         )
-        (bleu, precisions, bp, ratio, translation_length, reference_length) = score
-        return {
-            "bleu": bleu,
-            "precisions": precisions,
-            "brevity_penalty": bp,
-            "length_ratio": ratio,
-            "translation_length": translation_length,
-            "reference_length": reference_length,
-        }
+        return statistics.compute(smooth=smooth)
@@ -16,6 +16,7 @@ import datasets
 import sacrebleu as scb
 from packaging import version
 from sacrebleu import CHRF
+from sacrebleu.utils import sum_of_lists
 
 import evaluate
 
@@ -85,6 +86,11 @@ Args:
     to reference chrF++.py, NLTK and Moses implementations. If `False`,
     it takes into account effective match order similar to sacreBLEU < 2.0.0. Defaults to `False`.
 
+To score a corpus in shards, e.g. across processes or machines, `partial_stats(predictions, references, ...)` returns
+the sufficient statistics of a shard, `merge(*stats)` sums them and `finalize(stats, ...)` returns the same outputs as
+`compute` on the whole corpus. All the other arguments must be given the same values in `partial_stats` and
+`finalize`.
+
 Returns:
     'score' (float): The chrF (chrF++) score,
     'char_order' (int): The character n-gram order,
@@ -126,10 +132,10 @@ Examples:
 @evaluate.utils.file_utils.add_start_docstrings(_DESCRIPTION, _KWARGS_DESCRIPTION)
 class ChrF(evaluate.Metric):
     def _info(self):
-        if version.parse(scb.__version__) < version.parse("1.4.12"):
+        if version.parse(scb.__version__) < version.parse("2.0.0"):
             raise ImportWarning(
-                "To use `sacrebleu`, the module `sacrebleu>=1.4.12` is required, and the current version of `sacrebleu` doesn't match this condition.\n"
-                'You can install it with `pip install "sacrebleu>=1.4.12"`.'
+                "To use `sacrebleu`, the module `sacrebleu>=2.0.0` is required, and the current version of `sacrebleu` doesn't match this condition.\n"
+                'You can install it with `pip install "sacrebleu>=2.0.0"`.'
             )
         return evaluate.MetricInfo(
             description=_DESCRIPTION,
@@ -156,7 +162,7 @@ class ChrF(evaluate.Metric):
             ],
         )
 
-    def _compute(
+    def partial_stats(
         self,
         predictions,
         references,
@@ -167,6 +173,9 @@ class ChrF(evaluate.Metric):
         whitespace: bool = False,
         eps_smoothing: bool = False,
     ):
+        """Sufficient statistics of corpus chrF over a shard of the corpus: the hypothesis, reference and matched
+        n-grams of every character and word order (for the best reference of each segment), summed over the
+        segments."""
         # if only one reference is provided make sure we still use list of lists
         if isinstance(references[0], str):
             references = [[ref] for ref in references]
@@ -178,7 +187,26 @@ class ChrF(evaluate.Metric):
         transformed_references = [[refs[i] for refs in references] for i in range(references_per_prediction)]
 
         sb_chrf = CHRF(char_order, word_order, beta, lowercase, whitespace, eps_smoothing)
-        output = sb_chrf.corpus_score(predictions, transformed_references)
+        sb_chrf._check_corpus_score_args(predictions, transformed_references)
+        return {"stats": sum_of_lists(sb_chrf._extract_corpus_statistics(predictions, transformed_references))}
+
+    def merge(self, *stats):
+        """Sums the `partial_stats` of shards of a corpus."""
+        return {"stats": sum_of_lists([shard["stats"] for shard in stats])}
+
+    def finalize(
+        self,
+        stats,
+        char_order: int = CHRF.CHAR_ORDER,
+        word_order: int = CHRF.WORD_ORDER,
+        beta: int = CHRF.BETA,
+        lowercase: bool = False,
+        whitespace: bool = False,
+        eps_smoothing: bool = False,
+    ):
+        """Returns the outputs of the metric from the (merged) `partial_stats` of a corpus."""
+        sb_chrf = CHRF(char_order, word_order, beta, lowercase, whitespace, eps_smoothing)
+        output = sb_chrf._compute_score_from_stats(stats["stats"])
 
         return {
             "score": output.score,
@@ -186,3 +214,17 @@ class ChrF(evaluate.Metric):
             "word_order": output.word_order,
             "beta": output.beta,
         }
+
+    def _compute(
+        self,
+        predictions,
+        references,
+        char_order: int = CHRF.CHAR_ORDER,
+        word_order: int = CHRF.WORD_ORDER,
+        beta: int = CHRF.BETA,
+        lowercase: bool = False,
+        whitespace: bool = False,
+        eps_smoothing: bool = False,
+    ):
+        arguments = (char_order, word_order, beta, lowercase, whitespace, eps_smoothing)
+        return self.finalize(self.partial_stats(predictions, references, *arguments), *arguments)
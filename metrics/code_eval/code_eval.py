@@ -16,17 +16,21 @@ This is an evaluation harness for the HumanEval problem solving dataset
 described in the paper "Evaluating Large Language Models Trained on Code"
 (https://arxiv.org/abs/2107.03374)."""
 
-import itertools
 import os
-from collections import Counter, defaultdict
+from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import datasets
 import numpy as np
 
 import evaluate
+from evaluate import logging
 
-from .execute import check_correctness
+from .execute import SandboxPool
+from .execution_cache import ExecutionCache, program_digest
+
+
+logger = logging.get_logger(__name__)
 
 
 _CITATION = """\
@@ -71,7 +75,23 @@ Args:
         correctness of a code candidate.
     k: number of code candidates to consider in the evaluation (Default: [1, 10, 100])
     num_workers: number of workers used to evaluate the canidate programs (Default: 4).
-    timeout:
+    timeout: maximum time in seconds a candidate program may run before it is considered timed out (Default: 3.0).
+    max_executions_per_worker: number of programs a worker process runs before it is replaced by a fresh one
+        (Default: 100). Each program runs in a child forked from its worker, so programs never see each other's
+        changes to the interpreter; a worker that dies or does not answer is replaced right away.
+    execution_cache_dir: directory of a SQLite cache of execution outcomes, keyed by the program content and the
+        timeout, so that scoring the same samples again does not execute them again (Default: None, no cache).
+        Timeouts and crashes are not cached. Identical candidate + test programs are executed only once per call in
+        any case.
+    per_problem: if True, also returns the pass@k estimate of every problem as `pass@{k}_per_problem` (Default: False).
+    bootstrap_samples: number of bootstrap resamples of the problems used to estimate a confidence interval of each
+        pass@k, returned as `pass@{k}_ci` (Default: 0, no confidence intervals).
+    confidence_level: coverage of the bootstrap confidence intervals (Default: 0.95).
+    seed: seed of the bootstrap resampling (Default: None).
+    early_exit_tolerance: if set, the candidates of each problem are executed a few at a time and the remaining ones
+        are skipped as soon as no outcome of them could move any requested pass@k of the problem by more than this
+        tolerance; the midpoint of the possible estimates is reported, and `skipped_executions` counts the skipped
+        candidates. With 0.0 the scores are exactly those of a full run (Default: None, execute every candidate).
 Returns:
     pass_at_k: dict with pass rates for each k
     results: dict with granular results of each unittest
@@ -152,7 +172,21 @@ class CodeEval(evaluate.Metric):
             license=_LICENSE,
         )
 
-    def _compute(self, predictions, references, k=[1, 10, 100], num_workers=4, timeout=3.0):
+    def _compute(
+        self,
+        predictions,
+        references,
+        k=[1, 10, 100],
+        num_workers=4,
+        timeout=3.0,
+        max_executions_per_worker=100,
+        execution_cache_dir=None,
+        per_problem=False,
+        bootstrap_samples=0,
+        confidence_level=0.95,
+        seed=None,
+        early_exit_tolerance=None,
+    ):
         """Returns the scores"""
 
         if os.getenv("HF_ALLOW_CODE_EVAL", 0) != "1":
@@ -161,53 +195,170 @@ class CodeEval(evaluate.Metric):
         if os.name == "nt":
             raise NotImplementedError("This metric is currently not supported on Windows.")
 
-        with ThreadPoolExecutor(max_workers=num_workers) as executor:
-            futures = []
-            completion_id = Counter()
-            n_samples = 0
-            results = defaultdict(list)
-
-            for task_id, (candidates, test_case) in enumerate(zip(predictions, references)):
-                for candidate in candidates:
-                    test_program = candidate + "\n" + test_case
-                    args = (test_program, timeout, task_id, completion_id[task_id])
-                    future = executor.submit(check_correctness, *args)
-                    futures.append(future)
-                    completion_id[task_id] += 1
-                    n_samples += 1
-
-            for future in as_completed(futures):
-                result = future.result()
-                results[result["task_id"]].append((result["completion_id"], result))
-
-        total, correct = [], []
+        # identical candidate + test programs are executed once and their outcome shared
+        programs = {}
+        digests = []
+        for candidates, test_case in zip(predictions, references):
+            task_digests = []
+            for candidate in candidates:
+                test_program = candidate + "\n" + test_case
+                digest = program_digest(test_program)
+                programs.setdefault(digest, test_program)
+                task_digests.append(digest)
+            digests.append(task_digests)
+
+        cache = ExecutionCache(execution_cache_dir) if execution_cache_dir is not None else None
+        outcomes = cache.get_many(programs, timeout) if cache is not None else {}
+        pending = [digest for digest in programs if digest not in outcomes]
+        logger.info(
+            f"code_eval: {sum(map(len, digests))} programs, {len(programs)} unique, "
+            f"{len(programs) - len(pending)} cached, executing {len(pending)}"
+        )
+
+        ks = [k for k in _as_list(k) if all(len(task_digests) >= k for task_digests in digests)]
+        executed = {}
+        if pending:
+            with SandboxPool(min(num_workers, len(pending)), max_executions_per_worker) as pool, ThreadPoolExecutor(
+                max_workers=num_workers
+            ) as executor:
+                if early_exit_tolerance is None:
+                    executed = _execute(pool, executor, programs, pending, timeout)
+                else:
+                    executed = _execute_adaptive(
+                        pool, executor, programs, digests, outcomes, ks, early_exit_tolerance, num_workers, timeout
+                    )
+        if cache is not None:
+            cache.put_many(executed, timeout)
+            cache.close()
+        outcomes.update(executed)
+
+        results = defaultdict(list)
+        for task_id, task_digests in enumerate(digests):
+            for completion_id, digest in enumerate(task_digests):
+                outcome = outcomes.get(digest, "skipped")
+                result = dict(
+                    task_id=task_id,
+                    passed=outcome == "passed",
+                    result=outcome,
+                    completion_id=completion_id,
+                )
+                results[task_id].append((completion_id, result))
+
+        total, correct, skipped = [], [], []
         for result in results.values():
             result.sort()
             passed = [r[1]["passed"] for r in result]
             total.append(len(passed))
             correct.append(sum(passed))
+            skipped.append(sum(r[1]["result"] == "skipped" for r in result))
         total = np.array(total)
         correct = np.array(correct)
-
-        ks = k
-        pass_at_k = {f"pass@{k}": estimate_pass_at_k(total, correct, k).mean() for k in ks if (total >= k).all()}
+        skipped = np.array(skipped)
+
+        estimates = estimate_pass_at_k(total, correct, ks)
+        if skipped.any():
+            estimates = (estimates + estimate_pass_at_k(total, correct + skipped, ks)) / 2
+        pass_at_k = {f"pass@{k}": estimates[:, i].mean() for i, k in enumerate(ks)}
+        if per_problem:
+            for i, k in enumerate(ks):
+                pass_at_k[f"pass@{k}_per_problem"] = estimates[:, i]
+        if bootstrap_samples > 0:
+            intervals = bootstrap_pass_at_k(estimates, bootstrap_samples, confidence_level, seed)
+            for i, k in enumerate(ks):
+                pass_at_k[f"pass@{k}_ci"] = tuple(intervals[:, i])
+        if early_exit_tolerance is not None:
+            pass_at_k["skipped_executions"] = int(skipped.sum())
 
         return pass_at_k, results
 
 
-def estimate_pass_at_k(num_samples, num_correct, k):
-    """Estimates pass@k of each problem and returns them in an array."""
+def _execute(pool, executor, programs, digests, timeout):
+    """Executes the programs with the given digests on the pool and returns their outcomes by digest."""
+    futures = [executor.submit(pool.check_correctness, programs[digest], timeout, digest, 0) for digest in digests]
+    outcomes = {}
+    for future in as_completed(futures):
+        result = future.result()
+        outcomes[result["task_id"]] = result["result"]
+    return outcomes
+
+
+def _execute_adaptive(pool, executor, programs, digests, outcomes, ks, tolerance, num_workers, timeout):
+    """
+    Executes the candidates of all problems in rounds, a few candidates per problem and round, and stops scheduling
+    the candidates of a problem once the lowest and highest pass@k it could still get (all remaining candidates
+    failing or passing) are within `tolerance` for every k. Returns the outcomes of the executed programs.
+    """
+    known = dict(outcomes)
+    executed = {}
+    num_samples = np.array([len(task_digests) for task_digests in digests], dtype=np.int64)
+    resolved = np.zeros(len(digests), dtype=np.int64)
+    active = np.arange(len(digests))
+    while len(active):
+        # enough candidates per round to keep every worker busy
+        step = -(-num_workers // len(active))
+        batch = []
+        for task_id in active:
+            for digest in digests[task_id][resolved[task_id] : resolved[task_id] + step]:
+                if digest not in known and digest not in batch:
+                    batch.append(digest)
+        executed.update(_execute(pool, executor, programs, batch, timeout))
+        known.update(executed)
+        resolved[active] = np.minimum(resolved[active] + step, num_samples[active])
+
+        n = num_samples[active]
+        passed = np.array([sum(known[d] == "passed" for d in digests[t][: resolved[t]]) for t in active])
+        lowest = estimate_pass_at_k(n, passed, ks)
+        highest = estimate_pass_at_k(n, passed + n - resolved[active], ks)
+        determined = (highest - lowest <= tolerance).all(axis=1) | (resolved[active] == n)
+        active = active[~determined]
+    return executed
+
+
+def _as_list(k):
+    return [k] if isinstance(k, (int, np.integer)) else list(k)
 
-    def estimator(n: int, c: int, k: int) -> float:
-        """Calculates 1 - comb(n - c, k) / comb(n, k)."""
-        if n - c < k:
-            return 1.0
-        return 1.0 - np.prod(1.0 - k / np.arange(n - c + 1, n + 1))
 
-    if isinstance(num_samples, int):
-        num_samples_it = itertools.repeat(num_samples, len(num_correct))
+def estimate_pass_at_k(num_samples, num_correct, k):
+    """Estimates pass@k of each problem and returns them in an array.
+
+    `k` may be an int, which gives one estimate per problem, or a list of ints, which gives an array of shape
+    (number of problems, len(k)). Every 1 - comb(n - c, k) / comb(n, k) is computed at once from a table of
+    log-factorials instead of a Python loop over problems.
+    """
+    num_correct = np.asarray(num_correct, dtype=np.int64)
+    if isinstance(num_samples, (int, np.integer)):
+        num_samples = np.full(num_correct.shape, num_samples, dtype=np.int64)
     else:
         assert len(num_samples) == len(num_correct)
-        num_samples_it = iter(num_samples)
-
-    return np.array([estimator(int(n), int(c), k) for n, c in zip(num_samples_it, num_correct)])
+        num_samples = np.asarray(num_samples, dtype=np.int64)
+    ks = np.asarray(_as_list(k), dtype=np.int64)
+
+    n = num_samples[:, None]
+    c = num_correct[:, None]
+    log_factorial = np.concatenate([[0.0], np.cumsum(np.log(np.arange(1, max(num_samples.max(initial=0), 1) + 1)))])
+    # log(comb(n - c, k) / comb(n, k)); comb(n - c, k) is 0 when n - c < k
+    always_passes = n - c < ks
+    log_ratio = (
+        log_factorial[n - c]
+        - log_factorial[np.where(always_passes, 0, n - c - ks)]
+        - log_factorial[n]
+        + log_factorial[np.where(always_passes, 0, n - ks)]
+    )
+    estimates = -np.expm1(np.where(always_passes, -np.inf, log_ratio))
+
+    return estimates[:, 0] if isinstance(k, (int, np.integer)) else estimates
+
+
+def bootstrap_pass_at_k(estimates, num_resamples=1000, confidence_level=0.95, seed=None):
+    """Percentile bootstrap over problems of the mean of per-problem pass@k estimates.
+
+    `estimates` has one row per problem and one column per k; returns an array of shape (2, number of columns)
+    with the lower and upper bounds.
+    """
+    num_problems = len(estimates)
+    rng = np.random.default_rng(seed)
+    # each resample is a vector of how often every problem is drawn, so all means come from one matrix product
+    draws = rng.multinomial(num_problems, np.full(num_problems, 1.0 / num_problems), size=num_resamples)
+    means = draws @ estimates / num_problems
+    tail = (1.0 - confidence_level) / 2
+    return np.quantile(means, [tail, 1.0 - tail], axis=0)
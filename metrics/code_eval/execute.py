@@ -21,8 +21,16 @@ import io
 import multiprocessing
 import os
 import platform
+import queue
 import signal
 import tempfile
+import threading
+
+
+# results of programs that did not finish normally, which depend on the machine rather than on the program
+TIMED_OUT = "timed out"
+PROGRAM_CRASHED = "failed: the program crashed the interpreter"
+WORKER_CRASHED = "failed: the sandbox worker crashed"
 
 
 def check_correctness(check_program, timeout, task_id, completion_id):
@@ -53,6 +61,222 @@ def check_correctness(check_program, timeout, task_id, completion_id):
     )
 
 
+# everything `reliability_guard` overwrites, so that a pooled program can restore it before its cleanup
+_GUARDED_ATTRIBUTES = {
+    "os": [
+        "kill", "system", "putenv", "remove", "removedirs", "rmdir", "fchdir", "setuid", "fork", "forkpty",
+        "killpg", "rename", "renames", "truncate", "replace", "unlink", "fchmod", "fchown", "chmod", "chown",
+        "chroot", "lchflags", "lchmod", "lchown", "getcwd", "chdir",
+    ],
+    "shutil": ["rmtree", "move", "chown"],
+    "subprocess": ["Popen"],
+}
+_GUARDED_MODULES = ["ipdb", "joblib", "resource", "psutil", "tkinter"]
+_MISSING = object()
+
+
+def _save_guarded_state():
+    import builtins
+    import importlib
+    import sys
+
+    attributes = {}
+    for module_name, names in _GUARDED_ATTRIBUTES.items():
+        module = importlib.import_module(module_name)
+        for name in names:
+            attributes[module, name] = getattr(module, name, _MISSING)
+    modules = {name: sys.modules.get(name, _MISSING) for name in _GUARDED_MODULES}
+    # programs may also rebind builtins themselves, so the whole namespace is restored
+    return attributes, modules, os.environ.get("OMP_NUM_THREADS"), dict(vars(builtins))
+
+
+def _restore_guarded_state(state):
+    import builtins
+    import sys
+
+    attributes, modules, omp_num_threads, builtins_namespace = state
+    namespace = vars(builtins)
+    namespace.clear()
+    namespace.update(builtins_namespace)
+    for (module, name), value in attributes.items():
+        if value is _MISSING:
+            if hasattr(module, name):
+                delattr(module, name)
+        else:
+            setattr(module, name, value)
+    for name, value in modules.items():
+        if value is _MISSING:
+            sys.modules.pop(name, None)
+        else:
+            sys.modules[name] = value
+    if omp_num_threads is None:
+        os.environ.pop("OMP_NUM_THREADS", None)
+    else:
+        os.environ["OMP_NUM_THREADS"] = omp_num_threads
+
+
+def _execute_guarded(check_program, result, timeout):
+    """
+    Same as `unsafe_execute`, except that everything `reliability_guard` disabled is restored before the temporary
+    directory is removed, so that files left there by the program do not make the cleanup fail.
+    """
+    state = _save_guarded_state()
+    with create_tempdir():
+        reliability_guard()
+        try:
+            run_program(check_program, result, timeout)
+        finally:
+            _restore_guarded_state(state)
+
+
+def _execute_forked(check_program, timeout):
+    """
+    Runs one program in a child forked from the calling worker, so that it starts from the worker's pre-warmed
+    interpreter and whatever it changes (module attributes, imported modules, builtins, ...) is discarded with the
+    child. Returns its result; a child that exits without one is reported as failed.
+    """
+    reader, writer = multiprocessing.Pipe(duplex=False)
+    pid = os.fork()
+    if pid == 0:
+        reader.close()
+        exit_ = os._exit
+        result = []
+        try:
+            _execute_guarded(check_program, result, timeout)
+        except BaseException:
+            pass
+        finally:
+            try:
+                writer.send(result[0] if result else PROGRAM_CRASHED)
+            finally:
+                exit_(0)
+    writer.close()
+    try:
+        if reader.poll(timeout + 1):
+            result = reader.recv()
+        else:
+            result = TIMED_OUT
+    except (EOFError, OSError):
+        result = PROGRAM_CRASHED
+    finally:
+        reader.close()
+        if os.waitpid(pid, os.WNOHANG) == (0, 0):
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+    return result
+
+
+def sandbox_worker(conn):
+    """
+    Main loop of a pooled worker process: receives `(check_program, timeout)` pairs over `conn`, runs each one in a
+    child forked from the worker (under `reliability_guard` and `time_limit`, as `unsafe_execute` does), and sends
+    back its result. A `None` message stops the worker.
+    """
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        check_program, timeout = message
+        conn.send(_execute_forked(check_program, timeout))
+
+
+class _SandboxWorker:
+    def __init__(self):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=sandbox_worker, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.executions = 0
+
+    def close(self, kill=False):
+        if not kill:
+            try:
+                self.conn.send(None)
+            except (OSError, ValueError):
+                kill = True
+            else:
+                self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class SandboxPool:
+    """
+    A pool of pre-started worker processes that execute check programs, replacing the Manager and Process
+    that `check_correctness` starts for every single program.
+
+    Programs are sent to an idle worker over a pipe, which runs each of them in a child process forked from itself,
+    under `reliability_guard` and `time_limit` as in `check_correctness`; every program thus starts from the same
+    clean interpreter, without paying for a process start. A worker is replaced by a fresh process after
+    `max_executions_per_worker` programs, and right away when it dies or does not answer within `timeout + 2`
+    seconds.
+    `check_correctness` may be called from several threads at once; each call holds one worker.
+    """
+
+    def __init__(self, num_workers=4, max_executions_per_worker=100):
+        self.max_executions_per_worker = max_executions_per_worker
+        self._idle = queue.Queue()
+        self._workers = set()
+        self._lock = threading.Lock()
+        for _ in range(num_workers):
+            self._idle.put(self._start_worker())
+
+    def _start_worker(self):
+        worker = _SandboxWorker()
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _retire(self, worker, kill):
+        with self._lock:
+            self._workers.discard(worker)
+        worker.close(kill=kill)
+
+    def check_correctness(self, check_program, timeout, task_id, completion_id):
+        """Same as the module level `check_correctness`, but runs the program on a pooled worker."""
+        worker = self._idle.get()
+        crashed = False
+        try:
+            worker.conn.send((check_program, timeout))
+            # the worker itself gives up on the program after timeout + 1 seconds
+            if worker.conn.poll(timeout + 2):
+                result = worker.conn.recv()
+            else:
+                result, crashed = TIMED_OUT, True
+        except (EOFError, OSError):
+            result, crashed = WORKER_CRASHED, True
+        worker.executions += 1
+        if crashed or worker.executions >= self.max_executions_per_worker:
+            self._retire(worker, kill=crashed)
+            worker = self._start_worker()
+        self._idle.put(worker)
+
+        return dict(
+            task_id=task_id,
+            passed=result == "passed",
+            result=result,
+            completion_id=completion_id,
+        )
+
+    def close(self):
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
 def unsafe_execute(check_program, result, timeout):
 
     with create_tempdir():
@@ -69,16 +293,7 @@ def unsafe_execute(check_program, result, timeout):
         reliability_guard()
 
         # Run program.
-        try:
-            exec_globals = {}
-            with swallow_io():
-                with time_limit(timeout):
-                    exec(check_program, exec_globals)
-            result.append("passed")
-        except TimeoutException:
-            result.append("timed out")
-        except BaseException as e:
-            result.append(f"failed: {e}")
+        run_program(check_program, result, timeout)
 
         # Needed for cleaning up.
         shutil.rmtree = rmtree
@@ -86,6 +301,19 @@ def unsafe_execute(check_program, result, timeout):
         os.chdir = chdir
 
 
+def run_program(check_program, result, timeout):
+    try:
+        exec_globals = {}
+        with swallow_io():
+            with time_limit(timeout):
+                exec(check_program, exec_globals)
+        result.append("passed")
+    except TimeoutException:
+        result.append("timed out")
+    except BaseException as e:
+        result.append(f"failed: {e}")
+
+
 @contextlib.contextmanager
 def time_limit(seconds):
     def signal_handler(signum, frame):
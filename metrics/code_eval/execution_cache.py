@@ -0,0 +1,84 @@
+# Copyright 2020 The HuggingFace Evaluate Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" Persistent SQLite cache of code_eval execution outcomes. """
+
+import hashlib
+import os
+import sqlite3
+
+from .execute import PROGRAM_CRASHED, TIMED_OUT, WORKER_CRASHED
+
+
+# outcomes that depend on the load of the machine or on a crash, which are executed again instead of being cached
+TRANSIENT_OUTCOMES = (TIMED_OUT, PROGRAM_CRASHED, WORKER_CRASHED)
+
+
+def program_digest(program):
+    """Content hash identifying a candidate + test program."""
+    return hashlib.sha256(program.encode("utf-8")).hexdigest()
+
+
+class ExecutionCache:
+    """Stores the outcome ("passed" or "failed: ...") of executed programs.
+
+    Outcomes are keyed by the program digest and the timeout it was run with. Timeouts and crashes depend on the
+    load of the machine as much as on the program, so they are never stored (nor read back from databases written
+    by earlier versions): such programs are executed again on the next run.
+
+    Args:
+        cache_dir (str): directory of the SQLite database, created if needed.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(os.path.expanduser(cache_dir), exist_ok=True)
+        self.path = os.path.join(os.path.expanduser(cache_dir), "code_eval_outcomes.sqlite")
+        self._connection = sqlite3.connect(self.path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS outcomes ("
+            "digest TEXT NOT NULL, timeout REAL NOT NULL, result TEXT NOT NULL, PRIMARY KEY (digest, timeout))"
+        )
+        self._connection.commit()
+
+    def get_many(self, digests, timeout):
+        """Returns a dict mapping the cached ones among `digests` to their outcome."""
+        outcomes = {}
+        digests = list(digests)
+        for start in range(0, len(digests), 500):  # stays below SQLite's limit on query parameters
+            batch = digests[start : start + 500]
+            rows = self._connection.execute(
+                f"SELECT digest, result FROM outcomes WHERE timeout = ? AND digest IN ({','.join('?' * len(batch))})",
+                [float(timeout)] + batch,
+            )
+            outcomes.update((digest, result) for digest, result in rows if result not in TRANSIENT_OUTCOMES)
+        return outcomes
+
+    def put_many(self, outcomes, timeout):
+        """Stores a dict mapping program digests to their outcome, leaving out timeouts and crashes."""
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO outcomes (digest, timeout, result) VALUES (?, ?, ?)",
+            [
+                (digest, float(timeout), result)
+                for digest, result in outcomes.items()
+                if result not in TRANSIENT_OUTCOMES
+            ],
+        )
+        self._connection.commit()
+
+    def clear(self):
+        self._connection.execute("DELETE FROM outcomes")
+        self._connection.commit()
+
+    def close(self):
+        self._connection.close()
@@ -0,0 +1,53 @@
+import os
+import sqlite3
+
+import evaluate
+from _pytest.fixtures import fixture
+
+
+@fixture
+def code_eval(monkeypatch):
+    monkeypatch.setenv("HF_ALLOW_CODE_EVAL", "1")
+    return evaluate.load(os.path.dirname(os.path.abspath(__file__)))
+
+
+def outcomes(code_eval, candidates, test_case, **kwargs):
+    _, results = code_eval.compute(predictions=[candidates], references=[test_case], k=[1], **kwargs)
+    return [result["result"] for _, result in results[0]]
+
+
+def test_candidate_writing_a_file_passes(code_eval):
+    candidates = ["def f(x):\n    open('tmp.txt', 'w').write('x')\n    return 2", "def f(x):\n    return 2"]
+    assert outcomes(code_eval, candidates, "assert f(4) == 2", num_workers=1) == ["passed", "passed"]
+
+
+def test_candidate_cannot_change_the_next_one(code_eval):
+    candidates = [
+        "import math\nmath.sqrt = lambda v: 3\ndef f(x):\n    return 2",
+        "import math\ndef f(x):\n    return math.sqrt(x)",
+        "import builtins\nbuiltins.len = lambda v: 0\ndef f(x):\n    return 2",
+        "def f(x):\n    return len([0, 0])",
+    ]
+    assert outcomes(code_eval, candidates, "assert f(4) == 2", num_workers=1) == ["passed"] * 4
+
+
+def test_crash_is_a_failure(code_eval):
+    candidates = ["import os\nos._exit(1)", "def f(x):\n    return 2"]
+    results = outcomes(code_eval, candidates, "assert f(4) == 2", num_workers=1)
+    assert results[0].startswith("failed")
+    assert results[1] == "passed"
+
+
+def test_timeout(code_eval):
+    candidates = ["def f(x):\n    while True:\n        pass", "def f(x):\n    return 2"]
+    results = outcomes(code_eval, candidates, "assert f(4) == 2", num_workers=1, timeout=0.5)
+    assert results == ["timed out", "passed"]
+
+
+def test_timeouts_are_not_cached(code_eval, tmp_path):
+    candidates = ["def f(x):\n    while True:\n        pass", "def f(x):\n    return 2", "def f(x):\n    return 3"]
+    kwargs = dict(num_workers=1, timeout=0.5, execution_cache_dir=str(tmp_path))
+    assert outcomes(code_eval, candidates, "assert f(4) == 2", **kwargs)[0] == "timed out"
+    with sqlite3.connect(str(tmp_path / "code_eval_outcomes.sqlite")) as connection:
+        cached = sorted(result for (result,) in connection.execute("SELECT result FROM outcomes"))
+    assert cached == ["failed: ", "passed"]
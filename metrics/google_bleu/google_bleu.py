@@ -13,15 +13,16 @@
 # limitations under the License.
 """ Google BLEU (aka GLEU) metric. """
 
-from typing import Dict, List
+from collections import Counter
+from typing import Dict, List, Optional
 
 import datasets
-from nltk.translate import gleu_score
+from nltk.util import everygrams
 
 import evaluate
 from evaluate import MetricInfo
 
-from .tokenizer_13a import Tokenizer13a
+from .tokenizer_13a import Tokenizer13a, shared_cache, tokenize_corpus
 
 
 _CITATION = """\
@@ -69,9 +70,17 @@ Args:
     tokenizer : approach used for tokenizing `predictions` and `references`.
         The default tokenizer is `tokenizer_13a`, a minimal tokenization approach that is equivalent to `mteval-v13a`, used by WMT.
         This can be replaced by any function that takes a string as input and returns a list of tokens as output.
+    tokenization_cache_size: number of tokenized lines kept in memory by the 13a tokenization cache, shared by the
+        bleu, google_bleu and sacrebleu metrics of the process. Defaults to the current size (initially 2**16).
+    tokenization_cache_dir: directory where the 13a tokenization cache also stores the tokenized lines, to reuse
+        them across processes. Defaults to None (memory only).
     min_len (int): The minimum order of n-gram this function should extract. Defaults to 1.
     max_len (int): The maximum order of n-gram this function should extract. Defaults to 4.
 
+To score a corpus in shards, e.g. across processes or machines, `partial_stats(predictions, references, ...)` returns
+the sufficient statistics of a shard (all the arguments above apply there), `merge(*stats)` sums them and
+`finalize(stats)` returns the same outputs as `compute` on the whole corpus.
+
 Returns:
     'google_bleu': google_bleu score
 
@@ -147,22 +156,75 @@ class GoogleBleu(evaluate.Metric):
             ],
         )
 
-    def _compute(
+    def partial_stats(
         self,
         predictions: List[str],
         references: List[List[str]],
         tokenizer=Tokenizer13a(),
         min_len: int = 1,
         max_len: int = 4,
-    ) -> Dict[str, float]:
+        tokenization_cache_size: Optional[int] = None,
+        tokenization_cache_dir: Optional[str] = None,
+    ) -> Dict[str, int]:
+        """Sufficient statistics of corpus GLEU over a shard of the corpus: the matching n-grams and the max of the
+        hypothesis and reference n-grams (for the best reference of each segment), summed over the segments, as in
+        `nltk.translate.gleu_score.corpus_gleu`."""
         # if only one reference is provided make sure we still use list of lists
         if isinstance(references[0], str):
             references = [[ref] for ref in references]
-
-        references = [[tokenizer(r) for r in ref] for ref in references]
-        predictions = [tokenizer(p) for p in predictions]
+        if len(references) != len(predictions):
+            raise ValueError("The number of hypotheses and their reference(s) should be the same")
+
+        shared_cache(tokenization_cache_size, tokenization_cache_dir)
+        predictions, references = tokenize_corpus(tokenizer, predictions, references)
+        corpus_n_match = 0
+        corpus_n_all = 0
+        for refs, prediction in zip(references, predictions):
+            hyp_ngrams = Counter(everygrams(prediction, min_len, max_len))
+            tpfp = sum(hyp_ngrams.values())
+
+            hyp_counts = []
+            for reference in refs:
+                ref_ngrams = Counter(everygrams(reference, min_len, max_len))
+                tpfn = sum(ref_ngrams.values())
+                tp = sum((ref_ngrams & hyp_ngrams).values())
+                # GLEU is min(tp / tpfp, tp / tpfn) == tp / max(tpfp, tpfn)
+                n_all = max(tpfp, tpfn)
+                if n_all > 0:
+                    hyp_counts.append((tp, n_all))
+
+            # use the reference yielding the highest score
+            if hyp_counts:
+                n_match, n_all = max(hyp_counts, key=lambda hc: hc[0] / hc[1])
+                corpus_n_match += n_match
+                corpus_n_all += n_all
+        return {"n_match": corpus_n_match, "n_all": corpus_n_all}
+
+    def merge(self, *stats: Dict[str, int]) -> Dict[str, int]:
+        """Sums the `partial_stats` of shards of a corpus."""
         return {
-            "google_bleu": gleu_score.corpus_gleu(
-                list_of_references=references, hypotheses=predictions, min_len=min_len, max_len=max_len
-            )
+            "n_match": sum(shard["n_match"] for shard in stats),
+            "n_all": sum(shard["n_all"] for shard in stats),
         }
+
+    def finalize(self, stats: Dict[str, int]) -> Dict[str, float]:
+        """Returns the outputs of the metric from the (merged) `partial_stats` of a corpus."""
+        # corner case: empty corpus or empty references---don't divide by zero!
+        if stats["n_all"] == 0:
+            return {"google_bleu": 0.0}
+        return {"google_bleu": stats["n_match"] / stats["n_all"]}
+
+    def _compute(
+        self,
+        predictions: List[str],
+        references: List[List[str]],
+        tokenizer=Tokenizer13a(),
+        min_len: int = 1,
+        max_len: int = 4,
+        tokenization_cache_size: Optional[int] = None,
+        tokenization_cache_dir: Optional[str] = None,
+    ) -> Dict[str, float]:
+        stats = self.partial_stats(
+            predictions, references, tokenizer, min_len, max_len, tokenization_cache_size, tokenization_cache_dir
+        )
+        return self.finalize(stats)
@@ -0,0 +1,32 @@
+import os
+import random
+
+import evaluate
+import pytest
+
+
+google_bleu = evaluate.load(os.path.dirname(os.path.abspath(__file__)))
+
+
+def corpus(num_references, size=300, seed=0):
+    rng = random.Random(seed)
+    words = "The the a cat dog sat on mat , . ! hello there general kenobi foo bar Cat ?".split()
+
+    def sentence():
+        return " ".join(rng.choice(words) for _ in range(rng.randint(1, 20)))
+
+    return [sentence() for _ in range(size)], [[sentence() for _ in range(num_references)] for _ in range(size)]
+
+
+def shards(predictions, references, cuts=(70, 71, 200)):
+    bounds = [0, *cuts, len(predictions)]
+    return [(predictions[start:stop], references[start:stop]) for start, stop in zip(bounds, bounds[1:])]
+
+
+@pytest.mark.parametrize("num_references", [1, 3])
+@pytest.mark.parametrize("kwargs", [{}, {"min_len": 2, "max_len": 3}])
+def test_merged_shards_equal_compute(num_references, kwargs):
+    predictions, references = corpus(num_references)
+    expected = google_bleu.compute(predictions=predictions, references=references, **kwargs)
+    stats = [google_bleu.partial_stats(p, r, **kwargs) for p, r in shards(predictions, references)]
+    assert google_bleu.finalize(google_bleu.merge(*stats)) == expected
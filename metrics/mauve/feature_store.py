@@ -0,0 +1,86 @@
+# Copyright 2020 The HuggingFace Evaluate Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" In-memory and on-disk store of MAUVE text features. """
+
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class FeatureStore:
+    """Stores the feature vector of every featurized text for one featurization setting.
+
+    Entries are keyed by `namespace` (the featurize model name and `max_text_length`) and the text. Features are
+    kept in memory and, if `cache_dir` is given, also written to one `.npy` file per text, so that a fixed reference
+    set is featurized once and then read back by every later run.
+
+    Args:
+        namespace (str): identifies the featurization setting.
+        cache_dir (str): directory of the on-disk store. `None` keeps the features in memory only.
+    """
+
+    def __init__(self, namespace, cache_dir=None):
+        self.namespace = namespace
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._memory = {}
+        self.directory = None
+        if cache_dir is not None:
+            self.directory = os.path.join(os.path.expanduser(cache_dir), _digest(namespace))
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".npy")
+
+    def get(self, text):
+        """Returns the feature vector of `text`, or `None`."""
+        key = _digest(text)
+        if key in self._memory:
+            self.hits += 1
+            return self._memory[key]
+        if self.directory is not None:
+            try:
+                feature = np.load(self._path(key))
+            except (OSError, ValueError):
+                feature = None
+            if feature is not None:
+                self._memory[key] = feature
+                self.hits += 1
+                return feature
+        self.misses += 1
+        return None
+
+    def put(self, text, feature):
+        key = _digest(text)
+        self._memory[key] = feature
+        if self.directory is None or os.path.exists(self._path(key)):
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, feature)
+        os.replace(tmp, self._path(key))
+
+    def clear(self):
+        self._memory.clear()
+        if self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith(".npy"):
+                    os.remove(os.path.join(self.directory, name))
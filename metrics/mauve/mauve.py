@@ -14,6 +14,8 @@
 # limitations under the License.
 """ MAUVE metric from https://github.com/krishnap25/mauve. """
 
+import time
+
 import datasets
 import faiss  # Here to have a nice missing dependency error message early on
 import numpy  # Here to have a nice missing dependency error message early on
@@ -21,9 +23,13 @@ import requests  # Here to have a nice missing dependency error message early on
 import sklearn  # Here to have a nice missing dependency error message early on
 import tqdm  # Here to have a nice missing dependency error message early on
 from mauve import compute_mauve  # From: mauve-text
+from mauve.compute_mauve import get_features_from_input
 
 import evaluate
 
+from .feature_store import FeatureStore
+from .quantization import mauve_from_histograms, minibatch_quantize
+
 
 _CITATION = """\
 @inproceedings{pillutla-etal:mauve:neurips2021,
@@ -62,6 +68,7 @@ Args:
 Optional Args:
     num_buckets: the size of the histogram to quantize P and Q. Options: 'auto' (default) or an integer
     pca_max_data: the number data points to use for PCA dimensionality reduction prior to clustering. If -1, use all the data. Default -1
+        (with 'minibatch_kmeans', the PCA is fitted on that many references)
     kmeans_explained_var: amount of variance of the data to keep in dimensionality reduction by PCA. Default 0.9
     kmeans_num_redo: number of times to redo k-means clustering (the best objective is kept). Default 5
     kmeans_max_iter: maximum number of k-means iterations. Default 500
@@ -72,6 +79,18 @@ Optional Args:
     mauve_scaling_factor: "c" from the paper. Default 5.
     verbose: If True (default), print running time updates
     seed: random seed to initialize k-means cluster assignments.
+    batch_size: batch size of the featurization model. Default 1
+    feature_cache_dir: directory where the features of the references are stored, keyed by featurize_model_name and
+        max_text_length, so that a fixed reference set is featurized only once across runs. Default None (the
+        reference features are then only kept in memory, for later calls of the same metric object)
+    cache_reference_features: if False, the references are featurized again on every call. Default True
+    quantization: how features are quantized into histograms. 'faiss' (default) is the k-means of the official
+        implementation; 'minibatch_kmeans' uses a float32 PCA fitted on the references and scikit-learn's
+        multithreaded mini-batch k-means, which is much faster on large sets but gives slightly different scores
+    warm_start: with 'minibatch_kmeans', reuse the PCA projection and start k-means from the centroids of the previous
+        call of this metric object on the same references and settings. Default False
+    quantization_report: with 'minibatch_kmeans', also run the default 'faiss' quantization on the same features and
+        add `quantization_report`, a dict with the time of both and the difference of their scores. Default False
 Returns:
     mauve: MAUVE score, a number between 0 and 1. Larger values indicate that P and Q are closer,
     frontier_integral: Frontier Integral, a number between 0 and 1. Smaller values indicate that P and Q are closer,
@@ -132,8 +151,59 @@ class Mauve(evaluate.Metric):
         mauve_scaling_factor=5,
         verbose=True,
         seed=25,
+        batch_size=1,
+        feature_cache_dir=None,
+        cache_reference_features=True,
+        quantization="faiss",
+        warm_start=False,
+        quantization_report=False,
     ):
-        out = compute_mauve(
+        if quantization not in ["faiss", "minibatch_kmeans"]:
+            raise ValueError(f"Unknown quantization {quantization}, expected 'faiss' or 'minibatch_kmeans'.")
+
+        # texts are featurized here rather than in compute_mauve, so that the featurization model is loaded once
+        # per metric object and the features of a fixed reference set are reused
+        if p_features is None and p_tokens is None:
+            p_features = self._featurize(
+                predictions, "p", featurize_model_name, device_id, max_text_length, batch_size, verbose
+            )
+        if q_features is None and q_tokens is None:
+            store = None
+            if cache_reference_features:
+                store = self._feature_store(featurize_model_name, max_text_length, feature_cache_dir)
+            q_features = self._featurize(
+                references, "q", featurize_model_name, device_id, max_text_length, batch_size, verbose, store
+            )
+
+        if quantization == "minibatch_kmeans":
+            if p_features is None:
+                p_features = get_features_from_input(
+                    None, p_tokens, None, featurize_model_name, max_text_length, device_id, "p", batch_size, verbose
+                )
+            if q_features is None:
+                q_features = get_features_from_input(
+                    None, q_tokens, None, featurize_model_name, max_text_length, device_id, "q", batch_size, verbose
+                )
+            start = time.perf_counter()
+            out = self._minibatch_mauve(
+                numpy.asarray(p_features),
+                numpy.asarray(q_features),
+                num_buckets,
+                pca_max_data,
+                kmeans_explained_var,
+                kmeans_num_redo,
+                kmeans_max_iter,
+                divergence_curve_discretization_size,
+                mauve_scaling_factor,
+                seed,
+                warm_start,
+            )
+            minibatch_seconds = time.perf_counter() - start
+            if not quantization_report:
+                return out
+            start = time.perf_counter()
+
+        reference_out = compute_mauve(
             p_text=predictions,
             q_text=references,
             p_features=p_features,
@@ -153,4 +223,97 @@ class Mauve(evaluate.Metric):
             verbose=verbose,
             seed=seed,
         )
+        if quantization == "faiss":
+            return reference_out
+        out.quantization_report = {
+            "minibatch_kmeans_seconds": minibatch_seconds,
+            "faiss_seconds": time.perf_counter() - start,
+            "faiss_mauve": reference_out.mauve,
+            "mauve_difference": abs(out.mauve - reference_out.mauve),
+            "frontier_integral_difference": abs(out.frontier_integral - reference_out.frontier_integral),
+        }
         return out
+
+    def _minibatch_mauve(
+        self,
+        p_features,
+        q_features,
+        num_buckets,
+        pca_max_data,
+        kmeans_explained_var,
+        kmeans_num_redo,
+        kmeans_max_iter,
+        divergence_curve_discretization_size,
+        mauve_scaling_factor,
+        seed,
+        warm_start,
+    ):
+        if num_buckets == "auto":
+            # same heuristic as compute_mauve
+            num_buckets = max(2, int(round(min(p_features.shape[0], q_features.shape[0]) / 10)))
+        if not hasattr(self, "quantization_states"):
+            self.quantization_states = {}
+        key = (
+            hash(numpy.ascontiguousarray(q_features).tobytes()),
+            q_features.shape,
+            num_buckets,
+            pca_max_data,
+            kmeans_explained_var,
+        )
+        state = self.quantization_states.get(key) if warm_start else None
+        *histograms, self.quantization_states[key] = minibatch_quantize(
+            p_features,
+            q_features,
+            num_buckets,
+            explained_variance=kmeans_explained_var,
+            num_redo=kmeans_num_redo,
+            max_iter=kmeans_max_iter,
+            seed=seed,
+            state=state,
+            pca_max_data=pca_max_data,
+        )
+        return mauve_from_histograms(*histograms, divergence_curve_discretization_size, mauve_scaling_factor)
+
+    def _featurizer(self, featurize_model_name, device_id):
+        from mauve.utils import get_model, get_tokenizer
+
+        key = (featurize_model_name, device_id)
+        if getattr(self, "cached_featurizer_key", None) != key:
+            self.cached_tokenizer = get_tokenizer(featurize_model_name)
+            self.cached_model = get_model(featurize_model_name, self.cached_tokenizer, device_id)
+            self.cached_featurizer_key = key
+        return self.cached_model, self.cached_tokenizer
+
+    def _feature_store(self, featurize_model_name, max_text_length, feature_cache_dir):
+        if not hasattr(self, "feature_stores"):
+            self.feature_stores = {}
+        namespace = f"{featurize_model_name}-max_text_length={max_text_length}"
+        key = (namespace, feature_cache_dir)
+        if key not in self.feature_stores:
+            self.feature_stores[key] = FeatureStore(namespace, cache_dir=feature_cache_dir)
+        return self.feature_stores[key]
+
+    def _featurize(self, texts, name, featurize_model_name, device_id, max_text_length, batch_size, verbose, store=None):
+        import torch
+        from mauve.utils import featurize_tokens_from_model
+
+        texts = [text for text in texts if len(text) > 0]  # compute_mauve drops empty texts as well
+        if len(texts) == 0:
+            raise ValueError(f"Variable `{name}_text` is empty. Please provide non-empty strings.")
+        features = [store.get(text) if store is not None else None for text in texts]
+        missing = [i for i, feature in enumerate(features) if feature is None]
+        if verbose and store is not None:
+            print(f"Found features of {len(texts) - len(missing)} of {len(texts)} texts in the feature store")
+        if missing:
+            model, tokenizer = self._featurizer(featurize_model_name, device_id)
+            tokenized_texts = [
+                tokenizer.encode(texts[i], return_tensors="pt", truncation=True, max_length=max_text_length)
+                for i in missing
+            ]
+            with torch.no_grad():
+                computed = featurize_tokens_from_model(model, tokenized_texts, batch_size, name).cpu().numpy()
+            for i, feature in zip(missing, computed):
+                features[i] = feature
+                if store is not None:
+                    store.put(texts[i], feature)
+        return numpy.stack(features)
@@ -0,0 +1,125 @@
+# Copyright 2020 The HuggingFace Evaluate Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" Mini-batch k-means quantization backend for MAUVE. """
+
+from types import SimpleNamespace
+
+import numpy as np
+from mauve.compute_mauve import get_divergence_curve_for_multinomials, get_fronter_integral
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.metrics import auc as compute_area_under_curve
+from sklearn.preprocessing import normalize
+
+
+def fit_projection(features, explained_variance):
+    """Float32 PCA: returns the mean and the principal axes keeping `explained_variance` of the variance."""
+    mean = features.mean(axis=0)
+    centered = features - mean
+    if centered.shape[1] <= centered.shape[0]:
+        # eigendecomposition of the (dimension x dimension) covariance is much cheaper than an SVD of the data
+        variances, axes = np.linalg.eigh(centered.T @ centered)
+        variances, axes = variances[::-1].clip(min=0), axes[:, ::-1].T
+    else:
+        _, singular_values, axes = np.linalg.svd(centered, full_matrices=False)
+        variances = singular_values**2
+    variance_ratio = np.cumsum(variances) / np.sum(variances)
+    num_components = int(np.argmax(variance_ratio >= explained_variance)) + 1
+    return mean, np.ascontiguousarray(axes[:num_components])
+
+
+def minibatch_quantize(
+    p_features,
+    q_features,
+    num_clusters,
+    explained_variance=0.9,
+    num_redo=5,
+    max_iter=500,
+    seed=25,
+    batch_size=1024,
+    state=None,
+    pca_max_data=-1,
+):
+    """
+    Quantizes the l2-normalized features of P and Q into `num_clusters` buckets with mini-batch k-means, in float32.
+
+    Unlike the default path, the PCA projection is fitted on the Q (reference) features only, so that for a fixed
+    reference set the projection and the centroids are comparable across runs. Passing the `state` returned by a
+    previous call on the same reference set reuses its projection and starts k-means from its centroids.
+    With `pca_max_data` other than -1, the projection is fitted on that many references drawn at random with `seed`.
+
+    Returns the histograms of P and Q, their smoothed versions and the new state.
+    """
+    p_features = normalize(np.asarray(p_features, dtype=np.float32), norm="l2", axis=1)
+    q_features = normalize(np.asarray(q_features, dtype=np.float32), norm="l2", axis=1)
+    if state is None:
+        pca_features = q_features
+        if 0 <= pca_max_data < len(q_features):
+            rows = np.random.default_rng(seed).choice(len(q_features), pca_max_data, replace=False)
+            pca_features = q_features[np.sort(rows)]
+        mean, axes = fit_projection(pca_features, explained_variance)
+        # random initialization, as in faiss; k-means++ seeding costs more than the clustering itself
+        init, n_init = "random", num_redo
+    else:
+        mean, axes = state["mean"], state["axes"]
+        init, n_init = state["centroids"], 1
+    data = np.vstack([q_features, p_features]) - mean
+    data = data @ axes.T
+
+    kmeans = MiniBatchKMeans(
+        n_clusters=num_clusters,
+        init=init,
+        n_init=n_init,
+        max_iter=max_iter,
+        batch_size=batch_size,
+        random_state=seed + 2,
+    )
+    labels = kmeans.fit_predict(data)
+    q_bin_counts = np.bincount(labels[: len(q_features)], minlength=num_clusters)
+    p_bin_counts = np.bincount(labels[len(q_features) :], minlength=num_clusters)
+
+    state = {"mean": mean, "axes": axes, "centroids": kmeans.cluster_centers_.astype(np.float32)}
+    return (
+        p_bin_counts / p_bin_counts.sum(),
+        q_bin_counts / q_bin_counts.sum(),
+        (p_bin_counts + 0.5) / (p_bin_counts + 0.5).sum(),
+        (q_bin_counts + 0.5) / (q_bin_counts + 0.5).sum(),
+        state,
+    )
+
+
+def _area(curve):
+    x, y = curve.T
+    idxs1, idxs2 = np.argsort(x), np.argsort(y)
+    return 0.5 * (compute_area_under_curve(x[idxs1], y[idxs1]) + compute_area_under_curve(y[idxs2], x[idxs2]))
+
+
+def mauve_from_histograms(
+    p_hist, q_hist, p_hist_smoothed, q_hist_smoothed, divergence_curve_discretization_size=25, mauve_scaling_factor=5
+):
+    """Same outputs as `mauve.compute_mauve`, computed from already quantized distributions."""
+    mixture_weights = np.linspace(1e-6, 1 - 1e-6, divergence_curve_discretization_size)
+    divergence_curve = get_divergence_curve_for_multinomials(p_hist, q_hist, mixture_weights, mauve_scaling_factor)
+    smoothed_curve = get_divergence_curve_for_multinomials(
+        p_hist_smoothed, q_hist_smoothed, mixture_weights, mauve_scaling_factor
+    )
+    return SimpleNamespace(
+        p_hist=p_hist,
+        q_hist=q_hist,
+        divergence_curve=divergence_curve,
+        mauve=_area(divergence_curve),
+        frontier_integral=get_fronter_integral(p_hist, q_hist),
+        mauve_star=_area(smoothed_curve),
+        frontier_integral_star=get_fronter_integral(p_hist_smoothed, q_hist_smoothed),
+        num_buckets=len(p_hist),
+    )
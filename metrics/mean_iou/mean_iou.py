@@ -13,6 +13,10 @@
 # limitations under the License.
 """Mean IoU (Intersection-over-Union) metric."""
 
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 from typing import Dict, Optional
 
 import datasets
@@ -44,6 +48,8 @@ Args:
     reduce_labels (`bool`, *optional*, defaults to `False`):
         Whether or not to reduce all label values of segmentation maps by 1. Usually used for datasets where 0 is used for background,
         and background itself is not included in all classes of a dataset (e.g. ADE20k). The background label will be replaced by 255.
+    num_workers (`int`, *optional*, defaults to `1`):
+        Number of processes the image pairs are sharded across, `None` for the number of CPUs.
 
 Returns:
     `Dict[str, float | ndarray]` comprising various elements:
@@ -157,6 +163,244 @@ def intersect_and_union(
     return area_intersect, area_union, area_pred_label, area_label
 
 
+class ConfusionMatrix:
+    """Streaming accumulator of a confusion matrix between ground truth and predicted labels.
+
+    Segmentation maps are consumed one pair at a time (any array-like, including memory-mapped arrays, which are read in
+    chunks of `chunk_size` pixels) and only a `(num_labels + 1) x (num_labels + 1)` matrix of counts is kept, so memory
+    does not grow with the number or size of the maps. The extra row and column count labels and predictions outside of
+    `[0, num_labels)`, which `intersect_and_union` leaves out of the per-class areas as well.
+
+    Each chunk is first counted as a joint histogram of the raw (label, prediction) values whenever their ranges are
+    small (always the case for 8 bit maps); `label_map`, `reduce_labels` and `ignore_index` are then applied to the
+    values of that histogram only, so the input maps are neither copied nor modified.
+
+    Args:
+        num_labels (`int`):
+            Number of categories.
+        ignore_index (`int`):
+            Index that will be ignored during evaluation.
+        label_map (`dict`, *optional*):
+            Mapping old labels to new labels.
+        reduce_labels (`bool`, *optional*, defaults to `False`):
+            Whether or not to reduce all label values of segmentation maps by 1, see `intersect_and_union`.
+        chunk_size (`int`, *optional*, defaults to `2**22`):
+            Number of pixels processed at once.
+        max_joint_bins (`int`, *optional*, defaults to `2**20`):
+            Largest joint histogram of raw values; chunks with wider value ranges are mapped pixel by pixel.
+    """
+
+    def __init__(
+        self,
+        num_labels,
+        ignore_index: bool,
+        label_map: Optional[Dict[int, int]] = None,
+        reduce_labels: bool = False,
+        chunk_size: int = 2**22,
+        max_joint_bins: int = 2**20,
+    ):
+        self.num_labels = num_labels
+        self.ignore_index = ignore_index
+        self.label_map = label_map
+        self.reduce_labels = reduce_labels
+        self.chunk_size = chunk_size
+        self.max_joint_bins = max_joint_bins
+        self.matrix = np.zeros((num_labels + 1, num_labels + 1), dtype=np.int64)
+
+    def _columns(self, values):
+        # predictions outside of [0, num_labels) all go to the last column
+        signed = values.dtype.kind == "i"
+        values = values.astype(np.int64)
+        if signed:
+            values[values < 0] = self.num_labels
+        return np.minimum(values, self.num_labels, out=values)
+
+    def _rows(self, values):
+        # same transformations as in `intersect_and_union`, ignored labels go to an extra row num_labels + 1
+        values = values.astype(np.int64)
+        if self.label_map is not None:
+            for old_id, new_id in self.label_map.items():
+                values[values == old_id] = new_id
+        if self.reduce_labels:
+            values = np.where((values == 0) | (values == 255), 255, values - 1)
+        ignored = values == self.ignore_index
+        values = self._columns(values)
+        values[ignored] = self.num_labels + 1
+        return values
+
+    @staticmethod
+    def _value_range(values):
+        if values.dtype.kind in "bu" and values.dtype.itemsize == 1:
+            return 0, 256
+        low = int(values.min())
+        return low, int(values.max()) - low + 1
+
+    def _update_chunk(self, pred_label, label):
+        size = self.num_labels + 1
+        label_low, label_span = self._value_range(label)
+        pred_low, pred_span = self._value_range(pred_label)
+        if label_span * pred_span <= self.max_joint_bins:
+            # joint histogram of the raw values, whose label / prediction values are then mapped to rows / columns
+            index = label.astype(np.int64)
+            if label_low:
+                index -= label_low
+            index *= pred_span
+            index += pred_label
+            if pred_low:
+                index -= pred_low
+            counts = np.bincount(index, minlength=label_span * pred_span)
+            rows = self._rows(np.arange(label_low, label_low + label_span))
+            columns = self._columns(np.arange(pred_low, pred_low + pred_span))
+            index = (rows[:, None] * size + columns[None, :]).reshape(-1)
+            counts = np.bincount(index, weights=counts, minlength=(size + 1) * size).astype(np.int64)
+        else:
+            index = self._rows(label)
+            index *= size
+            index += self._columns(pred_label)
+            counts = np.bincount(index, minlength=(size + 1) * size)
+        # the row of ignored labels comes last and is dropped
+        self.matrix += counts[: size * size].reshape(size, size)
+
+    def update(self, pred_label, label):
+        """Adds one (predicted, ground truth) pair of segmentation maps."""
+        pred_label = np.asarray(pred_label).reshape(-1)
+        label = np.asarray(label).reshape(-1)
+        for start in range(0, len(label), self.chunk_size):
+            self._update_chunk(pred_label[start : start + self.chunk_size], label[start : start + self.chunk_size])
+        return self
+
+    def update_many(self, results, gt_seg_maps):
+        """Adds the (predicted, ground truth) pairs of two iterables of segmentation maps."""
+        for result, gt_seg_map in zip(results, gt_seg_maps):
+            self.update(result, gt_seg_map)
+        return self
+
+    def merge(self, other):
+        """Adds the counts of another `ConfusionMatrix` with the same number of labels."""
+        self.matrix += other.matrix
+        return self
+
+    def areas(self):
+        """Returns the total intersection, union, prediction and ground truth areas of every class, as in
+        `total_intersect_and_union`."""
+        num_labels = self.num_labels
+        area_intersect = np.diagonal(self.matrix)[:num_labels].astype(np.float64)
+        area_pred_label = self.matrix[:, :num_labels].sum(axis=0).astype(np.float64)
+        area_label = self.matrix[:num_labels, :].sum(axis=1).astype(np.float64)
+        area_union = area_pred_label + area_label - area_intersect
+        return area_intersect, area_union, area_pred_label, area_label
+
+    def compute(self, nan_to_num: Optional[int] = None):
+        """Returns the metrics of `mean_iou` for everything added so far."""
+        total_area_intersect, total_area_union, total_area_pred_label, total_area_label = self.areas()
+
+        # compute metrics
+        metrics = dict()
+
+        all_acc = total_area_intersect.sum() / total_area_label.sum()
+        iou = total_area_intersect / total_area_union
+        acc = total_area_intersect / total_area_label
+
+        metrics["mean_iou"] = np.nanmean(iou)
+        metrics["mean_accuracy"] = np.nanmean(acc)
+        metrics["overall_accuracy"] = all_acc
+        metrics["per_category_iou"] = iou
+        metrics["per_category_accuracy"] = acc
+
+        if nan_to_num is not None:
+            metrics = dict(
+                {metric: np.nan_to_num(metric_value, nan=nan_to_num) for metric, metric_value in metrics.items()}
+            )
+
+        return metrics
+
+
+# inputs and output buffer of `sharded_confusion_matrix`, inherited by the forked shard workers
+_shard_inputs = None
+_shard_matrices = None
+
+
+def _confusion_matrix_shard(config, shard, start, stop, results=None, gt_seg_maps=None):
+    if results is None:
+        results, gt_seg_maps = _shard_inputs[0][start:stop], _shard_inputs[1][start:stop]
+    confusion_matrix = ConfusionMatrix(*config).update_many(results, gt_seg_maps)
+    if _shard_matrices is None:
+        return confusion_matrix.matrix
+    _shard_matrices[shard] = confusion_matrix.matrix
+    return None
+
+
+def sharded_confusion_matrix(
+    results,
+    gt_seg_maps,
+    num_labels,
+    ignore_index: bool,
+    label_map: Optional[Dict[int, int]] = None,
+    reduce_labels: bool = False,
+    num_workers: Optional[int] = None,
+):
+    """Accumulates a `ConfusionMatrix` over shards of the (predicted, ground truth) pairs in a pool of processes.
+
+    Where processes are forked, the workers read their shard of the maps from the parent's memory and write their
+    partial matrix to a shared memory buffer, so neither the maps nor the results are pickled; the partial matrices
+    are summed once at the end. Elsewhere the shards are sent to the workers and their matrices returned.
+
+    Args:
+        num_workers (`int`, *optional*):
+            Number of processes, defaults to the number of CPUs.
+        Other arguments are those of `total_intersect_and_union`.
+
+    Returns:
+        `ConfusionMatrix` holding the counts of all pairs.
+    """
+    global _shard_inputs, _shard_matrices
+
+    results, gt_seg_maps = list(results), list(gt_seg_maps)
+    config = (num_labels, ignore_index, label_map, reduce_labels)
+    num_shards = max(1, min(num_workers or os.cpu_count(), len(results)))
+    if num_shards == 1:
+        return ConfusionMatrix(*config).update_many(results, gt_seg_maps)
+
+    bounds = np.linspace(0, len(results), num_shards + 1).astype(int)
+    shape = (num_shards, num_labels + 1, num_labels + 1)
+    total = ConfusionMatrix(*config)
+    if "fork" in multiprocessing.get_all_start_methods():
+        buffer = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 8)
+        try:
+            _shard_inputs = (results, gt_seg_maps)
+            _shard_matrices = np.ndarray(shape, dtype=np.int64, buffer=buffer.buf)
+            _shard_matrices[:] = 0
+            with ProcessPoolExecutor(num_shards, mp_context=multiprocessing.get_context("fork")) as executor:
+                futures = [
+                    executor.submit(_confusion_matrix_shard, config, shard, bounds[shard], bounds[shard + 1])
+                    for shard in range(num_shards)
+                ]
+                for future in futures:
+                    future.result()
+            total.matrix += _shard_matrices.sum(axis=0)
+        finally:
+            _shard_inputs = _shard_matrices = None
+            buffer.close()
+            buffer.unlink()
+    else:
+        with ProcessPoolExecutor(num_shards) as executor:
+            futures = [
+                executor.submit(
+                    _confusion_matrix_shard,
+                    config,
+                    shard,
+                    bounds[shard],
+                    bounds[shard + 1],
+                    results[bounds[shard] : bounds[shard + 1]],
+                    gt_seg_maps[bounds[shard] : bounds[shard + 1]],
+                )
+                for shard in range(num_shards)
+            ]
+            for future in futures:
+                total.matrix += future.result()
+    return total
+
+
 def total_intersect_and_union(
     results,
     gt_seg_maps,
@@ -192,19 +436,8 @@ def total_intersect_and_union(
          total_area_label (`ndarray`):
             The ground truth histogram on all classes.
     """
-    total_area_intersect = np.zeros((num_labels,), dtype=np.float64)
-    total_area_union = np.zeros((num_labels,), dtype=np.float64)
-    total_area_pred_label = np.zeros((num_labels,), dtype=np.float64)
-    total_area_label = np.zeros((num_labels,), dtype=np.float64)
-    for result, gt_seg_map in zip(results, gt_seg_maps):
-        area_intersect, area_union, area_pred_label, area_label = intersect_and_union(
-            result, gt_seg_map, num_labels, ignore_index, label_map, reduce_labels
-        )
-        total_area_intersect += area_intersect
-        total_area_union += area_union
-        total_area_pred_label += area_pred_label
-        total_area_label += area_label
-    return total_area_intersect, total_area_union, total_area_pred_label, total_area_label
+    confusion_matrix = ConfusionMatrix(num_labels, ignore_index, label_map, reduce_labels)
+    return confusion_matrix.update_many(results, gt_seg_maps).areas()
 
 
 def mean_iou(
@@ -215,6 +448,7 @@ def mean_iou(
     nan_to_num: Optional[int] = None,
     label_map: Optional[Dict[int, int]] = None,
     reduce_labels: bool = False,
+    num_workers: int = 1,
 ):
     """Calculate Mean Intersection and Union (mIoU).
 
@@ -234,6 +468,8 @@ def mean_iou(
         reduce_labels (`bool`, *optional*, defaults to `False`):
             Whether or not to reduce all label values of segmentation maps by 1. Usually used for datasets where 0 is used for background,
             and background itself is not included in all classes of a dataset (e.g. ADE20k). The background label will be replaced by 255.
+        num_workers (`int`, *optional*, defaults to `1`):
+            Number of processes the image pairs are sharded across, `None` for the number of CPUs.
 
     Returns:
         `Dict[str, float | ndarray]` comprising various elements:
@@ -248,29 +484,14 @@ def mean_iou(
         - *per_category_iou* (`ndarray` of shape `(num_labels,)`):
             Per category IoU.
     """
-    total_area_intersect, total_area_union, total_area_pred_label, total_area_label = total_intersect_and_union(
-        results, gt_seg_maps, num_labels, ignore_index, label_map, reduce_labels
-    )
-
-    # compute metrics
-    metrics = dict()
-
-    all_acc = total_area_intersect.sum() / total_area_label.sum()
-    iou = total_area_intersect / total_area_union
-    acc = total_area_intersect / total_area_label
-
-    metrics["mean_iou"] = np.nanmean(iou)
-    metrics["mean_accuracy"] = np.nanmean(acc)
-    metrics["overall_accuracy"] = all_acc
-    metrics["per_category_iou"] = iou
-    metrics["per_category_accuracy"] = acc
-
-    if nan_to_num is not None:
-        metrics = dict(
-            {metric: np.nan_to_num(metric_value, nan=nan_to_num) for metric, metric_value in metrics.items()}
+    if num_workers == 1:
+        confusion_matrix = ConfusionMatrix(num_labels, ignore_index, label_map, reduce_labels)
+        confusion_matrix.update_many(results, gt_seg_maps)
+    else:
+        confusion_matrix = sharded_confusion_matrix(
+            results, gt_seg_maps, num_labels, ignore_index, label_map, reduce_labels, num_workers
         )
-
-    return metrics
+    return confusion_matrix.compute(nan_to_num)
 
 
 @evaluate.utils.file_utils.add_start_docstrings(_DESCRIPTION, _KWARGS_DESCRIPTION)
@@ -301,6 +522,7 @@ class MeanIoU(evaluate.Metric):
         nan_to_num: Optional[int] = None,
         label_map: Optional[Dict[int, int]] = None,
         reduce_labels: bool = False,
+        num_workers: int = 1,
     ):
         iou_result = mean_iou(
             results=predictions,
@@ -310,5 +532,6 @@ class MeanIoU(evaluate.Metric):
             nan_to_num=nan_to_num,
             label_map=label_map,
             reduce_labels=reduce_labels,
+            num_workers=num_workers,
         )
         return iou_result
@@ -19,6 +19,9 @@ from nltk.translate import meteor_score
 from packaging import version
 
 import evaluate
+from evaluate import logging
+
+from .meteor_engine import MeteorIndex, meteor_scores
 
 
 if evaluate.config.PY_VERSION < version.parse("3.8"):
@@ -32,6 +35,9 @@ if NLTK_VERSION >= version.Version("3.6.4"):
     from nltk import word_tokenize
 
 
+logger = logging.get_logger(__name__)
+
+
 _CITATION = """\
 @inproceedings{banarjee2005,
   title     = {{METEOR}: An Automatic Metric for {MT} Evaluation with Improved Correlation with Human Judgments},
@@ -75,6 +81,7 @@ Args:
     alpha: Parameter for controlling relative weights of precision and recall. default: 0.9
     beta: Parameter for controlling shape of penalty as a function of fragmentation. default: 3
     gamma: Relative weight assigned to fragmentation penalty. default: 0.5
+    num_workers: Number of processes scoring chunks of predictions, `None` for all CPUs. default: 1
 Returns:
     'meteor': meteor score.
 Examples:
@@ -125,28 +132,32 @@ class Meteor(evaluate.Metric):
         if NLTK_VERSION >= version.Version("3.6.6"):
             nltk.download("omw-1.4")
 
-    def _compute(self, predictions, references, alpha=0.9, beta=3, gamma=0.5):
+    def _compute(self, predictions, references, alpha=0.9, beta=3, gamma=0.5, num_workers=1):
         multiple_refs = isinstance(references[0], list)
         if NLTK_VERSION >= version.Version("3.6.5"):
             # the version of METEOR in NLTK version 3.6.5 and earlier expect tokenized inputs
             if multiple_refs:
-                scores = [
-                    meteor_score.meteor_score(
-                        [word_tokenize(ref) for ref in refs],
-                        word_tokenize(pred),
-                        alpha=alpha,
-                        beta=beta,
-                        gamma=gamma,
-                    )
-                    for refs, pred in zip(references, predictions)
-                ]
+                list_of_references = [[word_tokenize(ref) for ref in refs] for refs in references]
             else:
-                scores = [
-                    meteor_score.single_meteor_score(
-                        word_tokenize(ref), word_tokenize(pred), alpha=alpha, beta=beta, gamma=gamma
-                    )
-                    for ref, pred in zip(references, predictions)
-                ]
+                list_of_references = [[word_tokenize(ref)] for ref in references]
+            # stems and WordNet synonyms of the words seen so far, kept across calls
+            if not hasattr(self, "meteor_index"):
+                self.meteor_index = MeteorIndex()
+            self.meteor_index.reset_stats()
+            scores = meteor_scores(
+                list_of_references,
+                [word_tokenize(pred) for pred in predictions],
+                alpha=alpha,
+                beta=beta,
+                gamma=gamma,
+                index=self.meteor_index,
+                num_workers=num_workers,
+            )
+            stats = self.meteor_index.stats()
+            logger.info(
+                f"METEOR index: {stats['stem_misses']} of {stats['stem_lookups']} words stemmed, "
+                f"{stats['synonym_misses']} of {stats['synonym_lookups']} looked up in WordNet"
+            )
         else:
             if multiple_refs:
                 scores = [
@@ -0,0 +1,256 @@
+# Copyright 2020 The HuggingFace Evaluate Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" METEOR scoring over a pre-built stem and synonym index.
+
+`nltk.translate.meteor_score` stems every unmatched word with the Porter stemmer and queries WordNet for the synsets
+of every unmatched hypothesis word, for every pair. Here the stems and WordNet synonyms of all the words of a corpus
+are computed once into a `MeteorIndex`, kept across calls, and the alignment only does dict and set lookups. The
+matching rules and the score arithmetic are the same as nltk's, so the scores are identical to `meteor_score`.
+"""
+
+import functools
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+
+@functools.lru_cache(maxsize=1)
+def _porter_stemmer():
+    from nltk.stem.porter import PorterStemmer
+
+    return PorterStemmer()
+
+
+class MeteorIndex:
+    """Memoized word -> stem and stem -> WordNet synonyms index.
+
+    The synonyms of a word are the single-word lemma names of all its WordNet synsets, plus the word itself: the set
+    of reference words nltk accepts as a synonym match for it.
+
+    Args:
+        stemmer: stemmer with a `stem` method, defaults to nltk's `PorterStemmer`.
+        wordnet: WordNet reader with a `synsets` method, defaults to `nltk.corpus.wordnet`. For `num_workers` other
+            than 1 in `meteor_scores`, custom stemmers and readers must be picklable.
+    """
+
+    def __init__(self, stemmer=None, wordnet=None):
+        self.stemmer = stemmer
+        self.wordnet = wordnet
+        self.stems = {}
+        self.synonyms = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stem_lookups = self.stem_misses = self.synonym_lookups = self.synonym_misses = 0
+
+    def stats(self):
+        """Lookups (word occurrences) and misses (distinct words that had to be stemmed or looked up in WordNet) since
+        the last `reset_stats`."""
+
+        def hit_rate(lookups, misses):
+            return 1 - misses / lookups if lookups else None
+
+        return {
+            "stem_lookups": self.stem_lookups,
+            "stem_misses": self.stem_misses,
+            "stem_hit_rate": hit_rate(self.stem_lookups, self.stem_misses),
+            "synonym_lookups": self.synonym_lookups,
+            "synonym_misses": self.synonym_misses,
+            "synonym_hit_rate": hit_rate(self.synonym_lookups, self.synonym_misses),
+            "indexed_stems": len(self.stems),
+            "indexed_synonyms": len(self.synonyms),
+        }
+
+    def _synonyms(self, word):
+        wordnet = self.wordnet
+        if wordnet is None:
+            from nltk.corpus import wordnet
+        names = {word}
+        for synset in wordnet.synsets(word):
+            names.update(name for name in (lemma.name() for lemma in synset.lemmas()) if name.find("_") < 0)
+        return frozenset(names)
+
+    def build(self, reference_words, hypothesis_words):
+        """Indexes the stems of all words and the synonyms of the hypothesis stems, counting one lookup per word."""
+        stemmer = self.stemmer or _porter_stemmer()
+        reference_words, hypothesis_words = Counter(reference_words), Counter(hypothesis_words)
+        for words in (reference_words, hypothesis_words):
+            self.stem_lookups += sum(words.values())
+            for word in words:
+                if word not in self.stems:
+                    self.stem_misses += 1
+                    self.stems[word] = stemmer.stem(word)
+        hypothesis_stems = Counter()
+        for word, count in hypothesis_words.items():
+            hypothesis_stems[self.stems[word]] += count
+        self.synonym_lookups += sum(hypothesis_stems.values())
+        for stem in hypothesis_stems:
+            if stem not in self.synonyms:
+                self.synonym_misses += 1
+                self.synonyms[stem] = self._synonyms(stem)
+        return self
+
+
+def _match_enums(enum_hypothesis_list, enum_reference_list):
+    """Exact matches, each hypothesis word (from the last) taking the last unused equal reference word."""
+    positions = {}
+    for j, (_, word) in enumerate(enum_reference_list):
+        positions.setdefault(word, []).append(j)
+    word_match = []
+    matched_hypothesis, matched_reference = set(), set()
+    for i in range(len(enum_hypothesis_list) - 1, -1, -1):
+        word_positions = positions.get(enum_hypothesis_list[i][1])
+        if word_positions:
+            j = word_positions.pop()
+            matched_hypothesis.add(i)
+            matched_reference.add(j)
+            word_match.append((enum_hypothesis_list[i][0], enum_reference_list[j][0]))
+    return (
+        word_match,
+        [pair for i, pair in enumerate(enum_hypothesis_list) if i not in matched_hypothesis],
+        [pair for j, pair in enumerate(enum_reference_list) if j not in matched_reference],
+    )
+
+
+def _synonym_match(enum_hypothesis_list, enum_reference_list, synonyms):
+    """Synonym matches, each hypothesis word (from the last) taking the last unused reference synonym."""
+    positions = {}
+    for j, (_, word) in enumerate(enum_reference_list):
+        positions.setdefault(word, []).append(j)
+    word_match = []
+    matched_hypothesis, matched_reference = set(), set()
+    for i in range(len(enum_hypothesis_list) - 1, -1, -1):
+        best_j, best_word = -1, None
+        for word in synonyms[enum_hypothesis_list[i][1]]:
+            word_positions = positions.get(word)
+            if word_positions and word_positions[-1] > best_j:
+                best_j, best_word = word_positions[-1], word
+        if best_word is not None:
+            positions[best_word].pop()
+            matched_hypothesis.add(i)
+            matched_reference.add(best_j)
+            word_match.append((enum_hypothesis_list[i][0], enum_reference_list[best_j][0]))
+    return (
+        word_match,
+        [pair for i, pair in enumerate(enum_hypothesis_list) if i not in matched_hypothesis],
+        [pair for j, pair in enumerate(enum_reference_list) if j not in matched_reference],
+    )
+
+
+def align_words(hypothesis, reference, index):
+    """Exact, then stem, then synonym matches of two preprocessed word lists, sorted by hypothesis position."""
+    stems = index.stems
+    exact_matches, enum_hypothesis, enum_reference = _match_enums(
+        list(enumerate(hypothesis)), list(enumerate(reference))
+    )
+    stem_matches, enum_hypothesis, enum_reference = _match_enums(
+        [(i, stems[word]) for i, word in enum_hypothesis], [(j, stems[word]) for j, word in enum_reference]
+    )
+    synonym_matches, _, _ = _synonym_match(enum_hypothesis, enum_reference, index.synonyms)
+    return sorted(exact_matches + stem_matches + synonym_matches, key=lambda wordpair: wordpair[0])
+
+
+def _count_chunks(matches):
+    chunks = 1
+    for previous, current in zip(matches, matches[1:]):
+        if not (current[0] == previous[0] + 1 and current[1] == previous[1] + 1):
+            chunks += 1
+    return chunks
+
+
+def single_meteor_score(reference, hypothesis, index, alpha=0.9, beta=3.0, gamma=0.5):
+    """Same as `nltk.translate.meteor_score.single_meteor_score` on preprocessed (lowercased) word lists."""
+    matches = align_words(hypothesis, reference, index)
+    matches_count = len(matches)
+    try:
+        precision = float(matches_count) / len(hypothesis)
+        recall = float(matches_count) / len(reference)
+        fmean = (precision * recall) / (alpha * precision + (1 - alpha) * recall)
+        chunk_count = float(_count_chunks(matches))
+        frag_frac = chunk_count / matches_count
+    except ZeroDivisionError:
+        return 0.0
+    penalty = gamma * frag_frac**beta
+    return (1 - penalty) * fmean
+
+
+def _score_chunk(index, chunk, alpha, beta, gamma):
+    return [
+        max(single_meteor_score(reference, hypothesis, index, alpha, beta, gamma) for reference in references)
+        for references, hypothesis in chunk
+    ]
+
+
+_worker_index = None
+
+
+def _init_worker(index):
+    global _worker_index
+    _worker_index = index
+
+
+def _score_worker_chunk(chunk, alpha, beta, gamma):
+    return _score_chunk(_worker_index, chunk, alpha, beta, gamma)
+
+
+def meteor_scores(
+    list_of_references,
+    hypotheses,
+    alpha=0.9,
+    beta=3.0,
+    gamma=0.5,
+    index=None,
+    preprocess=str.lower,
+    num_workers=1,
+    chunk_size=256,
+):
+    """METEOR of every hypothesis against its references, same as `nltk.translate.meteor_score.meteor_score`.
+
+    Args:
+        list_of_references: for every hypothesis, a list of tokenized references.
+        hypotheses: list of tokenized hypotheses.
+        index (`MeteorIndex`): index extended with the words of this corpus. Pass the same index across calls to
+            reuse it; a new one is used if `None`.
+        preprocess: applied to every word before matching, as in nltk.
+        num_workers (`int`): number of processes scoring chunks of `chunk_size` pairs, `None` for all CPUs. The
+            index is built in the calling process and sent once to every worker.
+
+    Returns:
+        list of scores.
+    """
+    if index is None:
+        index = MeteorIndex()
+    for references, hypothesis in zip(list_of_references, hypotheses):
+        if isinstance(hypothesis, str):
+            raise TypeError(f'"hypothesis" expects pre-tokenized hypothesis (Iterable[str]): {hypothesis}')
+        for reference in references:
+            if isinstance(reference, str):
+                raise TypeError(f'"reference" expects pre-tokenized reference (Iterable[str]): {reference}')
+    hypotheses = [[preprocess(word) for word in hypothesis] for hypothesis in hypotheses]
+    list_of_references = [
+        [[preprocess(word) for word in reference] for reference in references] for references in list_of_references
+    ]
+    index.build(
+        (word for references in list_of_references for reference in references for word in reference),
+        (word for hypothesis in hypotheses for word in hypothesis),
+    )
+
+    pairs = list(zip(list_of_references, hypotheses))
+    if num_workers == 1 or len(pairs) <= chunk_size:
+        return _score_chunk(index, pairs, alpha, beta, gamma)
+    chunks = [pairs[start : start + chunk_size] for start in range(0, len(pairs), chunk_size)]
+    with ProcessPoolExecutor(num_workers, initializer=_init_worker, initargs=(index,)) as executor:
+        results = executor.map(
+            _score_worker_chunk, chunks, [alpha] * len(chunks), [beta] * len(chunks), [gamma] * len(chunks)
+        )
+        return [score for chunk_scores in results for score in chunk_scores]
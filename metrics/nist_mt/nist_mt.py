@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 """NLTK's NIST implementation on both the sentence and corpus level"""
+import math
+from collections import Counter
 from typing import Dict, Optional
 
 import datasets
@@ -25,7 +27,8 @@ except LookupError:
     nltk.download("perluniprops", quiet=True)  # NISTTokenizer requirement
 
 from nltk.tokenize.nist import NISTTokenizer
-from nltk.translate.nist_score import corpus_nist, sentence_nist
+from nltk.translate.nist_score import nist_length_penalty
+from nltk.util import ngrams
 
 import evaluate
 
@@ -67,6 +70,12 @@ Args:
     western_lang: whether the current language is a Western language, which will enable some specific tokenization
  rules with respect to, e.g., punctuation
 
+To score a corpus in shards, e.g. across processes or machines, `partial_stats(predictions, references, ...)` returns
+the sufficient statistics of a shard (all the arguments above apply there), `merge(*stats)` combines them and
+`finalize(stats)` returns the same outputs as `compute` on the whole corpus. NIST weighs every n-gram by its
+information over the references of the whole corpus, so the statistics keep the reference n-gram counts and the
+n-gram overlaps of every segment; pass the shards to `merge` in corpus order.
+
 Returns:
     'nist_mt': nist_mt score
 Examples:
@@ -111,12 +120,17 @@ class NistMt(evaluate.Metric):
             reference_urls=["https://en.wikipedia.org/wiki/NIST_(metric)"],
         )
 
-    def _compute(self, predictions, references, n: int = 5, lowercase=False, western_lang=True):
+    def partial_stats(self, predictions, references, n: int = 5, lowercase=False, western_lang=True):
+        """Sufficient statistics of corpus NIST over a shard of the corpus: the counts of the reference n-grams, the
+        number of reference words and, for every segment, the hypothesis length, the number of hypothesis n-grams of
+        every order and, for every reference, its length and the n-grams it shares with the hypothesis."""
         tokenizer = NISTTokenizer()
 
         # Account for single reference cases: references always need to have one more dimension than predictions
         if isinstance(references[0], str):
             references = [[ref] for ref in references]
+        if len(references) != len(predictions):
+            raise ValueError("The number of hypotheses and their reference(s) should be the same")
 
         predictions = [
             tokenizer.tokenize(pred, return_str=False, lowercase=lowercase, western_lang=western_lang)
@@ -129,4 +143,86 @@ class NistMt(evaluate.Metric):
             ]
             for ref_sentences in references
         ]
-        return {"nist_mt": corpus_nist(list_of_references=references, hypotheses=predictions, n=n)}
+
+        ngram_freq = Counter()
+        total_reference_words = 0
+        segments = []
+        for ref_sentences, prediction in zip(references, predictions):
+            hyp_ngrams = [Counter(ngrams(prediction, i)) for i in range(1, n + 1)]
+            refs = []
+            for reference in ref_sentences:
+                ref_ngrams = [Counter(ngrams(reference, i)) for i in range(1, n + 1)]
+                for order_ngrams in ref_ngrams:
+                    ngram_freq.update(order_ngrams)
+                total_reference_words += len(reference)
+                # the overlaps keep the order of the hypothesis n-grams, in which nltk sums their information
+                overlaps = [list((h & r).items()) for h, r in zip(hyp_ngrams, ref_ngrams)]
+                refs.append((len(reference), overlaps))
+            segments.append((len(prediction), [sum(h.values()) for h in hyp_ngrams], refs))
+        return {
+            "n": n,
+            "ngram_freq": ngram_freq,
+            "total_reference_words": total_reference_words,
+            "segments": segments,
+        }
+
+    def merge(self, *stats):
+        """Combines the `partial_stats` of consecutive shards of a corpus, given in corpus order."""
+        n = stats[0]["n"]
+        if any(shard["n"] != n for shard in stats):
+            raise ValueError("Cannot merge NIST statistics of different n-gram orders.")
+        ngram_freq = Counter()
+        for shard in stats:
+            ngram_freq.update(shard["ngram_freq"])
+        return {
+            "n": n,
+            "ngram_freq": ngram_freq,
+            "total_reference_words": sum(shard["total_reference_words"] for shard in stats),
+            "segments": [segment for shard in stats for segment in shard["segments"]],
+        }
+
+    def finalize(self, stats):
+        """Returns the outputs of the metric from the (merged) `partial_stats` of a corpus, with the arithmetic of
+        `nltk.translate.nist_score.corpus_nist`."""
+        n = stats["n"]
+        ngram_freq = stats["ngram_freq"]
+        total_reference_words = stats["total_reference_words"]
+
+        # Info(w_1 ... w_n) = log_2 [ (# of occurrences of w_1 ... w_n-1) / (# of occurrences of w_1 ... w_n) ],
+        # only needed for the n-grams shared with a hypothesis
+        information_weights = {}
+
+        def information_weight(ngram):
+            weight = information_weights.get(ngram)
+            if weight is None:
+                mgram = ngram[:-1]
+                numerator = ngram_freq[mgram] if mgram and mgram in ngram_freq else total_reference_words
+                weight = information_weights[ngram] = math.log(numerator / ngram_freq[ngram], 2)
+            return weight
+
+        nist_precision_numerator_per_ngram = Counter()
+        nist_precision_denominator_per_ngram = Counter()
+        l_ref, l_sys = 0, 0
+        for i in range(1, n + 1):
+            for hyp_len, denominators, refs in stats["segments"]:
+                # Find reference with the best NIST score.
+                nist_score_per_ref = []
+                for _ref_len, overlaps in refs:
+                    _numerator = sum(information_weight(ngram) * count for ngram, count in overlaps[i - 1])
+                    _denominator = denominators[i - 1]
+                    _precision = 0 if _denominator == 0 else _numerator / _denominator
+                    nist_score_per_ref.append((_precision, _numerator, _denominator, _ref_len))
+                precision, numerator, denominator, ref_len = max(nist_score_per_ref)
+                nist_precision_numerator_per_ngram[i] += numerator
+                nist_precision_denominator_per_ngram[i] += denominator
+                l_ref += ref_len
+                l_sys += hyp_len
+
+        nist_precision = 0
+        for i in nist_precision_numerator_per_ngram:
+            precision = nist_precision_numerator_per_ngram[i] / nist_precision_denominator_per_ngram[i]
+            nist_precision += precision
+        return {"nist_mt": nist_precision * nist_length_penalty(l_ref, l_sys)}
+
+    def _compute(self, predictions, references, n: int = 5, lowercase=False, western_lang=True):
+        return self.finalize(self.partial_stats(predictions, references, n, lowercase, western_lang))
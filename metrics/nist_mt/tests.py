@@ -1,8 +1,26 @@
+import random
+
+import pytest
 from _pytest.fixtures import fixture
-from nist_mt import Nist_mt
+from nist_mt import NistMt
+
+
+nist = NistMt()
+
+
+def corpus(num_references, size=300, seed=0):
+    rng = random.Random(seed)
+    words = "The the a cat dog sat on mat , . ! hello there general kenobi foo bar Cat ?".split()
 
+    def sentence():
+        return " ".join(rng.choice(words) for _ in range(rng.randint(1, 20)))
 
-nist = Nist_mt()
+    return [sentence() for _ in range(size)], [[sentence() for _ in range(num_references)] for _ in range(size)]
+
+
+def shards(predictions, references, cuts=(70, 71, 200)):
+    bounds = [0, *cuts, len(predictions)]
+    return [(predictions[start:stop], references[start:stop]) for start, stop in zip(bounds, bounds[1:])]
 
 
 @fixture
@@ -32,3 +50,12 @@ def test_nist_sentence(hypothesis_sent, reference_sent1, reference_sent2, refere
         predictions=[hypothesis_sent], references=[[reference_sent1, reference_sent2, reference_sent3]]
     )
     assert abs(nist_score["nist_mt"] - 3.3709935957649324) < 1e-6
+
+
+@pytest.mark.parametrize("num_references", [1, 3])
+@pytest.mark.parametrize("kwargs", [{}, {"n": 3, "lowercase": True}])
+def test_merged_shards_equal_compute(num_references, kwargs):
+    predictions, references = corpus(num_references)
+    expected = nist.compute(predictions=predictions, references=references, **kwargs)
+    stats = [nist.partial_stats(p, r, **kwargs) for p, r in shards(predictions, references)]
+    assert nist.finalize(nist.merge(*stats)) == expected
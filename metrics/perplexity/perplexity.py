@@ -13,6 +13,8 @@
 # limitations under the License.
 """Perplexity Metric."""
 
+import time
+
 import datasets
 import numpy as np
 import torch
@@ -23,6 +25,42 @@ import evaluate
 from evaluate import logging
 
 
+logger = logging.get_logger(__name__)
+
+# with `max_tokens`, texts are sorted by length within groups of this many texts
+_SCHEDULE_CHUNK_SIZE = 4096
+
+
+def length_batches(lengths, batch_size, max_tokens=None):
+    """Splits the indices of `lengths` into batches.
+
+    Without `max_tokens` the batches hold `batch_size` consecutive items. With `max_tokens` the items are
+    sorted longest first and a batch grows while `number of rows x longest row` stays within the budget.
+    """
+    if max_tokens is None:
+        return [list(range(start, min(start + batch_size, len(lengths)))) for start in range(0, len(lengths), batch_size)]
+    batches = []
+    for i in sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True):
+        if batches and (len(batches[-1]) + 1) * lengths[batches[-1][0]] <= max_tokens:
+            batches[-1].append(i)
+        else:
+            batches.append([i])
+    return batches
+
+
+def masked_nll(model, encoded_batch, attn_mask, target_mask, loss_fct):
+    """Summed negative log-likelihood of the tokens selected by `target_mask`, and their number, per row."""
+    with torch.no_grad():
+        out_logits = model(encoded_batch, attention_mask=attn_mask).logits
+
+    shift_logits = out_logits[..., :-1, :].contiguous()
+    shift_labels = encoded_batch[..., 1:].contiguous()
+    shift_target_mask = target_mask[..., 1:].contiguous()
+
+    nll = (loss_fct(shift_logits.transpose(1, 2), shift_labels) * shift_target_mask).sum(1)
+    return nll, shift_target_mask.sum(1)
+
+
 _CITATION = """\
 
 """
@@ -49,6 +87,13 @@ Args:
     add_start_token (bool): whether to add the start token to the texts,
         so the perplexity can include the probability of the first word. Defaults to True.
     device (str): device to run on, defaults to 'cuda' when available
+    max_length (int): the maximum number of tokens of a text (or, with `stride`, of a window) fed to the model.
+    stride (int): if set, texts longer than `max_length` are scored with a sliding window that moves `stride`
+        tokens at a time instead of being truncated; the overlapping tokens only provide context.
+        `max_length` defaults to the model's maximum input length in this mode.
+    max_tokens (int): if set, texts (or windows) are sorted by tokenized length and batched so that
+        `batch rows x longest row` stays within this many tokens, instead of `batch_size` texts in input order.
+        Perplexities are still returned in input order, and the throughput is added as `tokens_per_second`.
 Returns:
     perplexity: dictionary containing the perplexity scores for the texts
         in the input list, as well as the mean perplexity. If one of the input texts is
@@ -100,8 +145,25 @@ class Perplexity(evaluate.Metric):
             reference_urls=["https://huggingface.co/docs/transformers/perplexity"],
         )
 
+    def _load(self, model_id, device):
+        # keep the model and tokenizer of the last call around, loading them again only when they change
+        if getattr(self, "cached_model_key", None) != (model_id, device):
+            self.cached_model = AutoModelForCausalLM.from_pretrained(model_id).to(device)
+            self.cached_model.eval()
+            self.cached_tokenizer = AutoTokenizer.from_pretrained(model_id)
+            self.cached_model_key = (model_id, device)
+        return self.cached_model, self.cached_tokenizer
+
     def _compute(
-        self, predictions, model_id, batch_size: int = 16, add_start_token: bool = True, device=None, max_length=None
+        self,
+        predictions,
+        model_id,
+        batch_size: int = 16,
+        add_start_token: bool = True,
+        device=None,
+        max_length=None,
+        stride=None,
+        max_tokens=None,
     ):
 
         if device is not None:
@@ -111,10 +173,7 @@ class Perplexity(evaluate.Metric):
         else:
             device = "cuda" if torch.cuda.is_available() else "cpu"
 
-        model = AutoModelForCausalLM.from_pretrained(model_id)
-        model = model.to(device)
-
-        tokenizer = AutoTokenizer.from_pretrained(model_id)
+        model, tokenizer = self._load(model_id, device)
 
         # if batch_size > 1 (which generally leads to padding being required), and
         # if there is not an already assigned pad_token, assign an existing
@@ -128,43 +187,53 @@ class Perplexity(evaluate.Metric):
             # assign one of the special tokens to also be the pad token
             tokenizer.add_special_tokens({"pad_token": existing_special_tokens[0]})
 
-        if add_start_token and max_length:
+        if add_start_token and (max_length or stride):
             # leave room for <BOS> token to be added:
             assert (
                 tokenizer.bos_token is not None
             ), "Input model must already have a BOS token if using add_start_token=True. Please use a different model, or set add_start_token=False"
+
+        if stride is not None or max_tokens is not None:
+            if stride is not None:
+                if max_length is None:
+                    max_length = getattr(model.config, "n_positions", None) or model.config.max_position_embeddings
+                assert 0 < stride <= max_length, "stride should be positive and at most max_length."
+            return self._scheduled_perplexities(
+                predictions, model, tokenizer, batch_size, add_start_token, device, max_length, stride, max_tokens
+            )
+
+        if add_start_token and max_length:
             max_tokenized_len = max_length - 1
         else:
             max_tokenized_len = max_length
 
-        encodings = tokenizer(
-            predictions,
-            add_special_tokens=False,
-            padding=True,
-            truncation=True if max_tokenized_len else False,
-            max_length=max_tokenized_len,
-            return_tensors="pt",
-            return_attention_mask=True,
-        ).to(device)
-
-        encoded_texts = encodings["input_ids"]
-        attn_masks = encodings["attention_mask"]
-
-        # check that each input is long enough:
-        if add_start_token:
-            assert torch.all(torch.ge(attn_masks.sum(1), 1)), "Each input text must be at least one token long."
-        else:
-            assert torch.all(
-                torch.ge(attn_masks.sum(1), 2)
-            ), "When add_start_token=False, each input text must be at least two tokens long. Run with add_start_token=True if inputting strings of only one token, and remove all empty input strings."
-
         ppls = []
         loss_fct = CrossEntropyLoss(reduction="none")
 
-        for start_index in logging.tqdm(range(0, len(encoded_texts), batch_size)):
-            end_index = min(start_index + batch_size, len(encoded_texts))
-            encoded_batch = encoded_texts[start_index:end_index]
-            attn_mask = attn_masks[start_index:end_index]
+        for start_index in logging.tqdm(range(0, len(predictions), batch_size)):
+            end_index = min(start_index + batch_size, len(predictions))
+
+            # tokenize one batch at a time, so memory grows with the batch size rather than the corpus size
+            encodings = tokenizer(
+                predictions[start_index:end_index],
+                add_special_tokens=False,
+                padding=True,
+                truncation=True if max_tokenized_len else False,
+                max_length=max_tokenized_len,
+                return_tensors="pt",
+                return_attention_mask=True,
+            ).to(device)
+
+            encoded_batch = encodings["input_ids"]
+            attn_mask = encodings["attention_mask"]
+
+            # check that each input is long enough:
+            if add_start_token:
+                assert torch.all(torch.ge(attn_mask.sum(1), 1)), "Each input text must be at least one token long."
+            else:
+                assert torch.all(
+                    torch.ge(attn_mask.sum(1), 2)
+                ), "When add_start_token=False, each input text must be at least two tokens long. Run with add_start_token=True if inputting strings of only one token, and remove all empty input strings."
 
             if add_start_token:
                 bos_tokens_tensor = torch.tensor([[tokenizer.bos_token_id]] * encoded_batch.size(dim=0)).to(device)
@@ -173,20 +242,85 @@ class Perplexity(evaluate.Metric):
                     [torch.ones(bos_tokens_tensor.size(), dtype=torch.int64).to(device), attn_mask], dim=1
                 )
 
-            labels = encoded_batch
+            nll, num_tokens = masked_nll(model, encoded_batch, attn_mask, attn_mask, loss_fct)
+            perplexity_batch = torch.exp(nll / num_tokens)
 
-            with torch.no_grad():
-                out_logits = model(encoded_batch, attention_mask=attn_mask).logits
+            ppls += perplexity_batch.tolist()
 
-            shift_logits = out_logits[..., :-1, :].contiguous()
-            shift_labels = labels[..., 1:].contiguous()
-            shift_attention_mask_batch = attn_mask[..., 1:].contiguous()
+        return {"perplexities": ppls, "mean_perplexity": np.mean(ppls)}
 
-            perplexity_batch = torch.exp(
-                (loss_fct(shift_logits.transpose(1, 2), shift_labels) * shift_attention_mask_batch).sum(1)
-                / shift_attention_mask_batch.sum(1)
-            )
+    def _scheduled_perplexities(
+        self, predictions, model, tokenizer, batch_size, add_start_token, device, max_length, stride, max_tokens
+    ):
+        """Perplexities computed over explicitly scheduled rows, for `stride` and/or `max_tokens`.
 
-            ppls += perplexity_batch.tolist()
+        Each text becomes one row (truncated to `max_length`), or, with `stride`, overlapping windows of
+        `max_length` tokens that move `stride` tokens at a time; in a window only the tokens not scored by the
+        previous window count towards the loss, the others serve as context. A text that fits into one window
+        is scored exactly as without `stride`. Rows of several texts are batched together, by `batch_size` in
+        input order, or by length under the `max_tokens` budget, and the results are put back in input order.
+        """
+        pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else 0
+        loss_fct = CrossEntropyLoss(reduction="none")
+        chunk_size = batch_size if max_tokens is None else max(batch_size, _SCHEDULE_CHUNK_SIZE)
+        if stride is None and max_length and add_start_token:
+            max_length -= 1  # leave room for the <BOS> token
+        ppls = []
+        total_tokens = 0
+        start_time = time.perf_counter()
 
-        return {"perplexities": ppls, "mean_perplexity": np.mean(ppls)}
+        for chunk_start in logging.tqdm(range(0, len(predictions), chunk_size)):
+            texts = predictions[chunk_start : chunk_start + chunk_size]
+            encoded_texts = tokenizer(texts, add_special_tokens=False)["input_ids"]
+
+            rows = []  # (text index in this chunk, input ids, number of leading context-only tokens)
+            for i, ids in enumerate(encoded_texts):
+                if stride is None and max_length:
+                    ids = ids[:max_length]
+                if add_start_token:
+                    ids = [tokenizer.bos_token_id] + ids
+                    assert len(ids) >= 2, "Each input text must be at least one token long."
+                else:
+                    assert (
+                        len(ids) >= 2
+                    ), "When add_start_token=False, each input text must be at least two tokens long. Run with add_start_token=True if inputting strings of only one token, and remove all empty input strings."
+                if stride is None:
+                    rows.append((i, ids, 0))
+                    continue
+                prev_end = 0
+                for begin in range(0, len(ids), stride):
+                    end = min(begin + max_length, len(ids))
+                    rows.append((i, ids[begin:end], prev_end - begin))
+                    prev_end = end
+                    if end == len(ids):
+                        break
+
+            nll = torch.zeros(len(texts), dtype=torch.float64)
+            counts = torch.zeros(len(texts), dtype=torch.float64)
+            for batch in length_batches([len(ids) for _, ids, _ in rows], batch_size, max_tokens):
+                width = max(len(rows[row][1]) for row in batch)
+                encoded_batch = torch.full((len(batch), width), pad_token_id, dtype=torch.long)
+                attn_mask = torch.zeros((len(batch), width), dtype=torch.int64)
+                target_mask = torch.zeros((len(batch), width), dtype=torch.int64)
+                for j, row in enumerate(batch):
+                    _, ids, context = rows[row]
+                    encoded_batch[j, : len(ids)] = torch.tensor(ids, dtype=torch.long)
+                    attn_mask[j, : len(ids)] = 1
+                    target_mask[j, max(context, 1) : len(ids)] = 1
+                total_tokens += int(attn_mask.sum())
+
+                batch_nll, batch_counts = masked_nll(
+                    model, encoded_batch.to(device), attn_mask.to(device), target_mask.to(device), loss_fct
+                )
+                text_index = torch.tensor([rows[row][0] for row in batch], dtype=torch.long)
+                nll.index_add_(0, text_index, batch_nll.double().cpu())
+                counts.index_add_(0, text_index, batch_counts.double().cpu())
+
+            ppls += torch.exp(nll / counts).tolist()
+
+        results = {"perplexities": ppls, "mean_perplexity": np.mean(ppls)}
+        if max_tokens is not None:
+            elapsed = time.perf_counter() - start_time
+            results["tokens_per_second"] = total_tokens / elapsed if elapsed > 0 else float("inf")
+            logger.info(f"perplexity: {total_tokens} tokens in {elapsed:.2f} seconds, {results['tokens_per_second']:.1f} tokens/sec")
+        return results
@@ -16,9 +16,13 @@
 import datasets
 import sacrebleu as scb
 from packaging import version
+from sacrebleu import BLEU
+from sacrebleu.utils import sum_of_lists
 
 import evaluate
 
+from .tokenizer_13a import Tokenizer13a, shared_cache, tokenize_corpus
+
 
 _CITATION = """\
 @inproceedings{post-2018-call,
@@ -65,6 +69,14 @@ Args:
     lowercase (`bool`): If `True`, lowercases the input, enabling case-insensitivity. Defaults to `False`.
     force (`bool`): If `True`, insists that your tokenized input is actually detokenized. Defaults to `False`.
     use_effective_order (`bool`): If `True`, stops including n-gram orders for which precision is 0. This should be `True`, if sentence-level BLEU will be computed. Defaults to `False`.
+    tokenization_cache_size (`int`): Number of tokenized lines kept in memory by the `'13a'` tokenization cache, shared by the bleu, google_bleu and sacrebleu metrics of the process. Defaults to the current size (initially `2**16`).
+    tokenization_cache_dir (`str`): Directory where the `'13a'` tokenization cache also stores the tokenized lines, to reuse them across processes. Defaults to `None` (memory only).
+
+
+To score a corpus in shards, e.g. across processes or machines, `partial_stats(predictions, references, ...)` returns
+the sufficient statistics of a shard (the `force`, `lowercase`, `tokenize` and tokenization cache arguments apply
+there), `merge(*stats)` sums them and `finalize(stats, ...)` returns the same outputs as `compute` on the whole corpus
+(the `smooth_method`, `smooth_value` and `use_effective_order` arguments apply there).
 
 Returns:
     'score': BLEU score,
@@ -105,10 +117,10 @@ Examples:
 @evaluate.utils.file_utils.add_start_docstrings(_DESCRIPTION, _KWARGS_DESCRIPTION)
 class Sacrebleu(evaluate.Metric):
     def _info(self):
-        if version.parse(scb.__version__) < version.parse("1.4.12"):
+        if version.parse(scb.__version__) < version.parse("2.0.0"):
             raise ImportWarning(
-                "To use `sacrebleu`, the module `sacrebleu>=1.4.12` is required, and the current version of `sacrebleu` doesn't match this condition.\n"
-                'You can install it with `pip install "sacrebleu>=1.4.12"`.'
+                "To use `sacrebleu`, the module `sacrebleu>=2.0.0` is required, and the current version of `sacrebleu` doesn't match this condition.\n"
+                'You can install it with `pip install "sacrebleu>=2.0.0"`.'
             )
         return evaluate.MetricInfo(
             description=_DESCRIPTION,
@@ -137,17 +149,18 @@ class Sacrebleu(evaluate.Metric):
             ],
         )
 
-    def _compute(
+    def partial_stats(
         self,
         predictions,
         references,
-        smooth_method="exp",
-        smooth_value=None,
         force=False,
         lowercase=False,
         tokenize=None,
-        use_effective_order=False,
+        tokenization_cache_size=None,
+        tokenization_cache_dir=None,
     ):
+        """Sufficient statistics of corpus BLEU over a shard of the corpus: the hypothesis and closest reference
+        lengths and the matched and total n-grams of every order, summed over the segments."""
         # if only one reference is provided make sure we still use list of lists
         if isinstance(references[0], str):
             references = [[ref] for ref in references]
@@ -155,17 +168,31 @@ class Sacrebleu(evaluate.Metric):
         references_per_prediction = len(references[0])
         if any(len(refs) != references_per_prediction for refs in references):
             raise ValueError("Sacrebleu requires the same number of references for each prediction")
+        if tokenize in (None, "13a"):
+            # tokenize through the shared 13a cache, exactly as sacrebleu would (lowercase, rstrip, then 13a), and let
+            # sacrebleu score the already tokenized lines
+            shared_cache(tokenization_cache_size, tokenization_cache_dir)
+            predictions, references = tokenize_corpus(
+                Tokenizer13a(),
+                [(pred.lower() if lowercase else pred).rstrip() for pred in predictions],
+                [[(ref.lower() if lowercase else ref).rstrip() for ref in refs] for refs in references],
+            )
+            predictions = [" ".join(tokens) for tokens in predictions]
+            references = [[" ".join(tokens) for tokens in refs] for refs in references]
+            tokenize, lowercase = "none", False
         transformed_references = [[refs[i] for refs in references] for i in range(references_per_prediction)]
-        output = scb.corpus_bleu(
-            predictions,
-            transformed_references,
-            smooth_method=smooth_method,
-            smooth_value=smooth_value,
-            force=force,
-            lowercase=lowercase,
-            use_effective_order=use_effective_order,
-            **(dict(tokenize=tokenize) if tokenize else {}),
-        )
+        sb_bleu = BLEU(lowercase=lowercase, force=force, **(dict(tokenize=tokenize) if tokenize else {}))
+        sb_bleu._check_corpus_score_args(predictions, transformed_references)
+        return {"stats": sum_of_lists(sb_bleu._extract_corpus_statistics(predictions, transformed_references))}
+
+    def merge(self, *stats):
+        """Sums the `partial_stats` of shards of a corpus."""
+        return {"stats": sum_of_lists([shard["stats"] for shard in stats])}
+
+    def finalize(self, stats, smooth_method="exp", smooth_value=None, use_effective_order=False):
+        """Returns the outputs of the metric from the (merged) `partial_stats` of a corpus."""
+        sb_bleu = BLEU(smooth_method=smooth_method, smooth_value=smooth_value, effective_order=use_effective_order)
+        output = sb_bleu._compute_score_from_stats(stats["stats"])
         output_dict = {
             "score": output.score,
             "counts": output.counts,
@@ -176,3 +203,21 @@ class Sacrebleu(evaluate.Metric):
             "ref_len": output.ref_len,
         }
         return output_dict
+
+    def _compute(
+        self,
+        predictions,
+        references,
+        smooth_method="exp",
+        smooth_value=None,
+        force=False,
+        lowercase=False,
+        tokenize=None,
+        use_effective_order=False,
+        tokenization_cache_size=None,
+        tokenization_cache_dir=None,
+    ):
+        stats = self.partial_stats(
+            predictions, references, force, lowercase, tokenize, tokenization_cache_size, tokenization_cache_dir
+        )
+        return self.finalize(stats, smooth_method, smooth_value, use_effective_order)
@@ -0,0 +1,41 @@
+# run with `pytest --import-mode=importlib`: with the default mode, this folder is put first on sys.path and the
+# metric script shadows the sacrebleu library
+import os
+import random
+
+import evaluate
+import pytest
+
+
+sacrebleu = evaluate.load(os.path.dirname(os.path.abspath(__file__)))
+
+
+def corpus(num_references, size=300, seed=0):
+    rng = random.Random(seed)
+    words = "The the a cat dog sat on mat , . ! hello there general kenobi foo bar Cat ?".split()
+
+    def sentence():
+        return " ".join(rng.choice(words) for _ in range(rng.randint(1, 20)))
+
+    return [sentence() for _ in range(size)], [[sentence() for _ in range(num_references)] for _ in range(size)]
+
+
+def shards(predictions, references, cuts=(70, 71, 200)):
+    bounds = [0, *cuts, len(predictions)]
+    return [(predictions[start:stop], references[start:stop]) for start, stop in zip(bounds, bounds[1:])]
+
+
+@pytest.mark.parametrize("num_references", [1, 3])
+@pytest.mark.parametrize(
+    "stats_kwargs, finalize_kwargs",
+    [
+        ({}, {}),
+        ({"lowercase": True}, {}),
+        ({"tokenize": "intl"}, {"smooth_method": "floor", "use_effective_order": True}),
+    ],
+)
+def test_merged_shards_equal_compute(num_references, stats_kwargs, finalize_kwargs):
+    predictions, references = corpus(num_references)
+    expected = sacrebleu.compute(predictions=predictions, references=references, **stats_kwargs, **finalize_kwargs)
+    stats = [sacrebleu.partial_stats(p, r, **stats_kwargs) for p, r in shards(predictions, references)]
+    assert sacrebleu.finalize(sacrebleu.merge(*stats), **finalize_kwargs) == expected
@@ -0,0 +1,259 @@
+# Source: https://github.com/mjpost/sacrebleu/blob/master/sacrebleu/tokenizers/tokenizer_13a.py
+# Copyright 2020 SacreBLEU Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""13a tokenization, with a tokenization cache shared by the metrics shipping this file.
+
+The same file is shipped in the `bleu`, `google_bleu` and `sacrebleu` metric folders; keep the copies identical.
+Since a metric script can only import modules from its own folder, every metric loads its own copy of this module.
+The first copy to run registers the `TokenizationCache` under `sys.modules[SHARED_CACHE_MODULE]`, and the others use
+that one, so a string scored with several of these metrics in one process is tokenized once.
+"""
+
+import os
+import re
+import sqlite3
+import sys
+import threading
+import types
+from collections import OrderedDict
+
+
+SHARED_CACHE_MODULE = "evaluate_tokenization_cache"
+
+
+class BaseTokenizer:
+    """A base dummy tokenizer to derive from."""
+
+    def signature(self):
+        """
+        Returns a signature for the tokenizer.
+        :return: signature string
+        """
+        return "none"
+
+    def __call__(self, line):
+        """
+        Tokenizes an input line with the tokenizer.
+        :param line: a segment to tokenize
+        :return: the tokenized line
+        """
+        return line
+
+
+class TokenizerRegexp(BaseTokenizer):
+    def signature(self):
+        return "re"
+
+    def __init__(self):
+        self._re = [
+            # language-dependent part (assuming Western languages)
+            (re.compile(r"([\{-\~\[-\` -\&\(-\+\:-\@\/])"), r" \1 "),
+            # tokenize period and comma unless preceded by a digit
+            (re.compile(r"([^0-9])([\.,])"), r"\1 \2 "),
+            # tokenize period and comma unless followed by a digit
+            (re.compile(r"([\.,])([^0-9])"), r" \1 \2"),
+            # tokenize dash when preceded by a digit
+            (re.compile(r"([0-9])(-)"), r"\1 \2 "),
+            # one space only between words
+            # NOTE: Doing this in Python (below) is faster
+            # (re.compile(r'\s+'), r' '),
+        ]
+
+    def __call__(self, line):
+        """Common post-processing tokenizer for `13a` and `zh` tokenizers.
+        :param line: a segment to tokenize
+        :return: the tokenized line
+        """
+        for (_re, repl) in self._re:
+            line = _re.sub(repl, line)
+
+        # no leading or trailing spaces, single space within words
+        # return ' '.join(line.split())
+        # This line is changed with regards to the original tokenizer (seen above) to return individual words
+        return line.split()
+
+
+class Tokenizer13a(BaseTokenizer):
+    def signature(self):
+        return "13a"
+
+    def __init__(self):
+        self._post_tokenizer = TokenizerRegexp()
+
+    def __call__(self, line):
+        """Tokenizes an input line through the shared tokenization cache.
+        :param line: a segment to tokenize
+        :return: the tokenized line
+        """
+        return shared_cache().tokenize(self, [line])[0]
+
+    def tokenize_uncached(self, line):
+        """Tokenizes an input line using a relatively minimal tokenization
+        that is however equivalent to mteval-v13a, used by WMT.
+
+        :param line: a segment to tokenize
+        :return: the tokenized line
+        """
+
+        # language-independent part:
+        line = line.replace("<skipped>", "")
+        line = line.replace("-\n", "")
+        line = line.replace("\n", " ")
+
+        if "&" in line:
+            line = line.replace("&quot;", '"')
+            line = line.replace("&amp;", "&")
+            line = line.replace("&lt;", "<")
+            line = line.replace("&gt;", ">")
+
+        return self._post_tokenizer(f" {line} ")
+
+
+class TokenizationCache:
+    """Size-bounded LRU cache of tokenized lines, optionally backed by an SQLite file.
+
+    Entries are keyed by the tokenizer signature and the line. Lines missing from memory are looked up on disk, and
+    only the remaining ones are tokenized, once per distinct line.
+
+    Args:
+        max_entries (int): number of lines kept in memory, `None` for no bound.
+        cache_dir (str): directory of the on-disk cache. `None` keeps the tokenized lines in memory only.
+    """
+
+    def __init__(self, max_entries=2**16, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = None
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._connection = None
+        self._lock = threading.RLock()
+        self.configure(max_entries, cache_dir)
+
+    def configure(self, max_entries=2**16, cache_dir=None):
+        """Changes the memory bound and the on-disk cache (`None` keeps the current directory)."""
+        with self._lock:
+            self.max_entries = max_entries
+            self._evict()
+            if cache_dir is not None and cache_dir != self.cache_dir:
+                self.close()
+                os.makedirs(os.path.expanduser(cache_dir), exist_ok=True)
+                path = os.path.join(os.path.expanduser(cache_dir), "tokenization_cache.sqlite")
+                self._connection = sqlite3.connect(path, check_same_thread=False)
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS tokens ("
+                    "signature TEXT NOT NULL, line TEXT NOT NULL, tokens TEXT NOT NULL, PRIMARY KEY (signature, line))"
+                )
+                # lines tokenized before the directory was set are stored as well
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO tokens (signature, line, tokens) VALUES (?, ?, ?)",
+                    [(signature, line, " ".join(tokens)) for (signature, line), tokens in self._memory.items()],
+                )
+                self._connection.commit()
+                self.cache_dir = cache_dir
+
+    def _evict(self):
+        if self.max_entries is not None:
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _load(self, signature, lines):
+        found = {}
+        for start in range(0, len(lines), 500):  # stays below SQLite's limit on query parameters
+            batch = lines[start : start + 500]
+            rows = self._connection.execute(
+                f"SELECT line, tokens FROM tokens WHERE signature = ? AND line IN ({','.join('?' * len(batch))})",
+                [signature] + batch,
+            )
+            found.update((line, tokens.split(" ") if tokens else []) for line, tokens in rows)
+        return found
+
+    def tokenize(self, tokenizer, lines):
+        """Returns the tokens of every line, as `tokenizer.tokenize_uncached` would."""
+        signature = tokenizer.signature()
+        results = [None] * len(lines)
+        missing = {}  # line -> positions in `lines`
+        with self._lock:
+            for i, line in enumerate(lines):
+                tokens = self._memory.get((signature, line))
+                if tokens is None:
+                    missing.setdefault(line, []).append(i)
+                else:
+                    self._memory.move_to_end((signature, line))
+                    self.hits += 1
+                    results[i] = tokens
+            if not missing:
+                return results
+
+            found = self._load(signature, list(missing)) if self._connection is not None else {}
+            self.hits += sum(len(missing[line]) for line in found)
+            new = {line: tokenizer.tokenize_uncached(line) for line in missing if line not in found}
+            self.misses += sum(len(missing[line]) for line in new)
+            if new and self._connection is not None:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO tokens (signature, line, tokens) VALUES (?, ?, ?)",
+                    [(signature, line, " ".join(tokens)) for line, tokens in new.items()],
+                )
+                self._connection.commit()
+            for line_tokens in (found, new):
+                for line, tokens in line_tokens.items():
+                    self._memory[(signature, line)] = tokens
+                    for i in missing[line]:
+                        results[i] = tokens
+            self._evict()
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._connection is not None:
+                self._connection.execute("DELETE FROM tokens")
+                self._connection.commit()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+            self.cache_dir = None
+
+
+def shared_cache(max_entries=None, cache_dir=None):
+    """Returns the process-wide `TokenizationCache`, reconfigured if `max_entries` or `cache_dir` are given."""
+    holder = sys.modules.setdefault(SHARED_CACHE_MODULE, types.ModuleType(SHARED_CACHE_MODULE))
+    cache = getattr(holder, "cache", None)
+    if cache is None:
+        cache = holder.cache = TokenizationCache(2**16 if max_entries is None else max_entries, cache_dir)
+    elif max_entries is not None or cache_dir is not None:
+        cache.configure(cache.max_entries if max_entries is None else max_entries, cache_dir)
+    return cache
+
+
+def tokenize_corpus(tokenizer, predictions, references):
+    """Tokenizes predictions and lists of references in one pass over the shared cache.
+
+    Tokenizers without a `tokenize_uncached` method (e.g. user-provided callables) are called on every line.
+    """
+    lines = list(predictions) + [line for refs in references for line in refs]
+    if hasattr(tokenizer, "tokenize_uncached"):
+        tokens = shared_cache().tokenize(tokenizer, lines)
+    else:
+        tokens = [tokenizer(line) for line in lines]
+    tokenized_predictions = tokens[: len(predictions)]
+    tokenized_references = []
+    start = len(predictions)
+    for refs in references:
+        tokenized_references.append(tokens[start : start + len(refs)])
+        start += len(refs)
+    return tokenized_predictions, tokenized_references
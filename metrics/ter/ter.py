@@ -16,6 +16,7 @@ import datasets
 import sacrebleu as scb
 from packaging import version
 from sacrebleu import TER
+from sacrebleu.utils import sum_of_lists
 
 import evaluate
 
@@ -75,6 +76,10 @@ Args:
                                     Only applies if `normalized = True`. Defaults to `False`.
     case_sensitive (boolean): If `False`, makes all predictions and references lowercase to ignore differences in case. Defaults to `False`.
 
+To score a corpus in shards, e.g. across processes or machines, `partial_stats(predictions, references, ...)` returns
+the sufficient statistics of a shard (all the arguments above apply there), `merge(*stats)` sums them and
+`finalize(stats)` returns the same outputs as `compute` on the whole corpus.
+
 Returns:
     'score' (float): TER score (num_edits / sum_ref_lengths * 100)
     'num_edits' (int): The cumulative number of edits
@@ -153,10 +158,10 @@ Examples:
 @evaluate.utils.file_utils.add_start_docstrings(_DESCRIPTION, _KWARGS_DESCRIPTION)
 class Ter(evaluate.Metric):
     def _info(self):
-        if version.parse(scb.__version__) < version.parse("1.4.12"):
+        if version.parse(scb.__version__) < version.parse("2.0.0"):
             raise ImportWarning(
-                "To use `sacrebleu`, the module `sacrebleu>=1.4.12` is required, and the current version of `sacrebleu` doesn't match this condition.\n"
-                'You can install it with `pip install "sacrebleu>=1.4.12"`.'
+                "To use `sacrebleu`, the module `sacrebleu>=2.0.0` is required, and the current version of `sacrebleu` doesn't match this condition.\n"
+                'You can install it with `pip install "sacrebleu>=2.0.0"`.'
             )
         return evaluate.MetricInfo(
             description=_DESCRIPTION,
@@ -183,7 +188,7 @@ class Ter(evaluate.Metric):
             ],
         )
 
-    def _compute(
+    def partial_stats(
         self,
         predictions,
         references,
@@ -192,6 +197,8 @@ class Ter(evaluate.Metric):
         support_zh_ja_chars: bool = False,
         case_sensitive: bool = False,
     ):
+        """Sufficient statistics of corpus TER over a shard of the corpus: the number of edits to the closest reference
+        and the total length of the references, summed over the segments."""
         # if only one reference is provided make sure we still use list of lists
         if isinstance(references[0], str):
             references = [[ref] for ref in references]
@@ -207,6 +214,47 @@ class Ter(evaluate.Metric):
             asian_support=support_zh_ja_chars,
             case_sensitive=case_sensitive,
         )
-        output = sb_ter.corpus_score(predictions, transformed_references)
+        sb_ter._check_corpus_score_args(predictions, transformed_references)
+        # sacrebleu sums the average reference length of every segment, whose float sum would depend on how the corpus
+        # is split; the (integer) total reference length of every segment is summed instead, and averaged in `finalize`
+        num_edits, ref_lengths = 0, 0
+        for segment_edits, avg_ref_length in sb_ter._extract_corpus_statistics(predictions, transformed_references):
+            num_edits += segment_edits
+            ref_lengths += round(avg_ref_length * references_per_prediction)
+        return {"stats": [num_edits, ref_lengths], "references_per_prediction": references_per_prediction}
+
+    def merge(self, *stats):
+        """Sums the `partial_stats` of shards of a corpus."""
+        references_per_prediction = stats[0]["references_per_prediction"]
+        if any(shard["references_per_prediction"] != references_per_prediction for shard in stats):
+            raise ValueError("Sacrebleu requires the same number of references for each prediction")
+        return {
+            "stats": sum_of_lists([shard["stats"] for shard in stats]),
+            "references_per_prediction": references_per_prediction,
+        }
+
+    def finalize(self, stats):
+        """Returns the outputs of the metric from the (merged) `partial_stats` of a corpus."""
+        num_edits, ref_lengths = stats["stats"]
+        output = TER()._compute_score_from_stats([num_edits, ref_lengths / stats["references_per_prediction"]])
 
         return {"score": output.score, "num_edits": output.num_edits, "ref_length": output.ref_length}
+
+    def _compute(
+        self,
+        predictions,
+        references,
+        normalized: bool = False,
+        ignore_punct: bool = False,
+        support_zh_ja_chars: bool = False,
+        case_sensitive: bool = False,
+    ):
+        stats = self.partial_stats(
+            predictions,
+            references,
+            normalized=normalized,
+            ignore_punct=ignore_punct,
+            support_zh_ja_chars=support_zh_ja_chars,
+            case_sensitive=case_sensitive,
+        )
+        return self.finalize(stats)
@@ -0,0 +1,268 @@
+# Copyright 2020 The HuggingFace Evaluate Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" SARI n-gram engine shared by the `sari` and `wiki_split` metrics.
+
+The same file is shipped in both metric folders, since a metric script can only import modules from its own folder;
+keep the copies identical.
+
+Tokens are interned to integer ids and the n-grams of each order are built from those of the previous order in one
+sliding pass, as integers (`previous_gram << 32 | token_id`), then counted in plain dicts. Dicts keep the
+first-occurrence order of the n-grams, which is the order the reference implementation sums its per n-gram fractions
+in, so the scores are bit-identical to the original `Counter` based code.
+
+`corpus_scores` scores a whole corpus, optionally in chunks over a pool of processes.
+"""
+
+import itertools
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+MAX_ORDER = 4
+_SHIFT = 32
+
+
+class SariEngine:
+    """Scores sentences with SARI, interning tokens into `self.vocab` as they are seen."""
+
+    def __init__(self):
+        self.vocab = {}
+
+    def ngrams(self, sentence):
+        """Returns the lists of 1- to 4-grams of the space separated `sentence`, in order of position."""
+        vocab = self.vocab
+        token_ids = [vocab.setdefault(token, len(vocab)) for token in sentence.split(" ")]
+        grams = [token_ids]
+        for order in range(1, MAX_ORDER):
+            # the n-gram starting at i is the (n-1)-gram starting at i extended by token i + n - 1
+            grams.append([(gram << _SHIFT) | token_id for gram, token_id in zip(grams[-1], token_ids[order:])])
+        return grams
+
+    def ngram_counts(self, sentence):
+        """Returns one dict per order (1 to 4) mapping the n-grams of the space separated `sentence` to their count."""
+        return [count(order_grams) for order_grams in self.ngrams(sentence)]
+
+    def reference_table(self, references):
+        """Pre-builds the n-gram counts of a set of references, summed over the references."""
+        table = [[] for _ in range(MAX_ORDER)]
+        for reference in references:
+            for order_grams, reference_grams in zip(table, self.ngrams(reference)):
+                order_grams.extend(reference_grams)
+        return len(references), [count(order_grams) for order_grams in table]
+
+    def sentence_scores(self, source, prediction, references=None, reference_table=None):
+        """Returns the keep, deletion and addition scores of a sentence, averaged over the n-gram orders.
+
+        The references are given either as a list of sentences or as a `reference_table`.
+        """
+        if reference_table is None:
+            reference_table = self.reference_table(references)
+        numref, table = reference_table
+        scores = [
+            ngram_scores(source_counts, prediction_counts, reference_counts, numref)
+            for source_counts, prediction_counts, reference_counts in zip(
+                self.ngram_counts(source), self.ngram_counts(prediction), table
+            )
+        ]
+        keepscore, delscore, addscore = ([order_scores[i] for order_scores in scores] for i in range(3))
+        return sum(keepscore) / MAX_ORDER, sum(delscore) / MAX_ORDER, sum(addscore) / MAX_ORDER
+
+    def sentence_sari(self, source, prediction, references=None, reference_table=None):
+        keepscore, delscore, addscore = self.sentence_scores(source, prediction, references, reference_table)
+        return (keepscore + delscore + addscore) / 3
+
+
+def _normalize_chunk(normalize, sentences):
+    return [normalize(sentence) for sentence in sentences]
+
+
+def _score_chunk(normalize, chunk):
+    engine = SariEngine()
+    return [
+        engine.sentence_scores(source, normalize(prediction), references)
+        for source, prediction, references in chunk
+    ]
+
+
+class NormalizedSentences:
+    """Memo of normalized sentences that keeps the `max_entries` most recently used ones."""
+
+    def __init__(self, max_entries=2**16):
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+
+    def __len__(self):
+        return len(self._memory)
+
+    def lookup(self, sentences):
+        """Returns `{sentence: normalized sentence}` for the `sentences` that are memoized."""
+        found = {}
+        for sentence in sentences:
+            normalized = self._memory.get(sentence)
+            if normalized is not None:
+                self._memory.move_to_end(sentence)
+                found[sentence] = normalized
+        return found
+
+    def update(self, items):
+        self._memory.update(items)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+def corpus_scores(sources, predictions, references, normalize, num_workers=1, chunk_size=512, normalized=None):
+    """Returns the (keep, deletion, addition) scores of every sentence of a corpus.
+
+    Sources and references are normalized once per distinct sentence, and looked up in and added to `normalized`, a
+    `NormalizedSentences`, so that a caller keeping it across calls normalizes a reused source or reference set only
+    once. Predictions are normalized with the sentence they are scored with.
+
+    With `num_workers` other than 1, the normalization of the new sentences and then the scoring are spread over that
+    many processes (all CPUs for `None`) in chunks of `chunk_size`; `normalize` must then be picklable, e.g. a module
+    level function. The scores are the same either way.
+    """
+    sentences = list(dict.fromkeys(itertools.chain(sources, *references)))
+    # the normalized sentences of this call; the memo may evict some of them before they are used
+    table = normalized.lookup(sentences) if normalized is not None else {}
+    pending = [sentence for sentence in sentences if sentence not in table]
+
+    if num_workers == 1:
+        new = dict(zip(pending, map(normalize, pending)))
+        table.update(new)
+        if normalized is not None:
+            normalized.update(new)
+        engine = SariEngine()
+        return [
+            engine.sentence_scores(table[source], normalize(prediction), [table[ref] for ref in refs])
+            for source, prediction, refs in zip(sources, predictions, references)
+        ]
+
+    def chunks(items):
+        return [items[start : start + chunk_size] for start in range(0, len(items), chunk_size)]
+
+    with ProcessPoolExecutor(num_workers or os.cpu_count()) as executor:
+        pending_chunks = chunks(pending)
+        results = executor.map(partial(_normalize_chunk, normalize), pending_chunks)
+        new = {}
+        for chunk, normalized_chunk in zip(pending_chunks, results):
+            new.update(zip(chunk, normalized_chunk))
+        table.update(new)
+        if normalized is not None:
+            normalized.update(new)
+        sentence_chunks = chunks(
+            [
+                (table[source], prediction, [table[ref] for ref in refs])
+                for source, prediction, refs in zip(sources, predictions, references)
+            ]
+        )
+        return [
+            scores
+            for chunk_scores in executor.map(partial(_score_chunk, normalize), sentence_chunks)
+            for scores in chunk_scores
+        ]
+
+
+def corpus_sari(scores, per_sentence=False):
+    """Corpus SARI (between 0 and 100) from the scores returned by `corpus_scores`.
+
+    With `per_sentence`, also returns the SARI of every sentence and its keep, deletion and addition scores, on the
+    same 0 to 100 scale.
+    """
+    sentence_saris = [(keepscore + delscore + addscore) / 3 for keepscore, delscore, addscore in scores]
+    result = {"sari": 100 * (sum(sentence_saris) / len(sentence_saris))}
+    if per_sentence:
+        result["sari_per_sentence"] = [100 * sari for sari in sentence_saris]
+        for i, name in enumerate(["keep", "del", "add"]):
+            result[f"{name}_per_sentence"] = [100 * sentence_scores[i] for sentence_scores in scores]
+    return result
+
+
+def count(grams):
+    """Counts a list of n-grams in first-occurrence order."""
+    counts = {}
+    for gram in grams:
+        counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+def ngram_scores(sgramcounter, cgramcounter, rgramcounter, numref):
+    """Keep, deletion and addition scores of one n-gram order, from the counts of the source, the prediction and
+    all references. Same arithmetic, in the same order, as the `Counter` based reference implementation."""
+    # KEEP
+    keepgramcounter_rep = {}
+    keepgramcountergood_rep = {}
+    keepgramcounterall_rep = {}
+    for gram, scount in sgramcounter.items():
+        rcount = rgramcounter.get(gram, 0)
+        ccount = cgramcounter.get(gram, 0)
+        if ccount:
+            keepcount = min(scount * numref, ccount * numref)
+            keepgramcounter_rep[gram] = keepcount
+            if rcount:
+                keepgramcountergood_rep[gram] = min(keepcount, rcount)
+        if rcount:
+            keepgramcounterall_rep[gram] = min(scount * numref, rcount)
+
+    keeptmpscore1 = 0
+    keeptmpscore2 = 0
+    for keepgram, goodcount in keepgramcountergood_rep.items():
+        keeptmpscore1 += goodcount / keepgramcounter_rep[keepgram]
+        keeptmpscore2 += goodcount
+    # Define 0/0=1 instead of 0 to give higher scores for predictions that match
+    #      a target exactly.
+    keepscore_precision = 1
+    keepscore_recall = 1
+    if len(keepgramcounter_rep) > 0:
+        keepscore_precision = keeptmpscore1 / len(keepgramcounter_rep)
+    if len(keepgramcounterall_rep) > 0:
+        keepscore_recall = keeptmpscore2 / sum(keepgramcounterall_rep.values())
+    keepscore = 0
+    if keepscore_precision > 0 or keepscore_recall > 0:
+        keepscore = 2 * keepscore_precision * keepscore_recall / (keepscore_precision + keepscore_recall)
+
+    # DELETION
+    delgramcount = 0
+    deltmpscore1 = 0
+    for gram, scount in sgramcounter.items():
+        delcount = scount * numref - cgramcounter.get(gram, 0) * numref
+        if delcount > 0:
+            delgramcount += 1
+            goodcount = delcount - rgramcounter.get(gram, 0)
+            if goodcount > 0:
+                deltmpscore1 += goodcount / delcount
+    # Define 0/0=1 instead of 0 to give higher scores for predictions that match
+    # a target exactly.
+    delscore_precision = 1
+    if delgramcount > 0:
+        delscore_precision = deltmpscore1 / delgramcount
+
+    # ADDITION
+    addgramcounter = cgramcounter.keys() - sgramcounter.keys()
+    addtmpscore = len(addgramcounter & rgramcounter.keys())
+    addgramcounterall = len(rgramcounter.keys() - sgramcounter.keys())
+
+    # Define 0/0=1 instead of 0 to give higher scores for predictions that match
+    # a target exactly.
+    addscore_precision = 1
+    addscore_recall = 1
+    if len(addgramcounter) > 0:
+        addscore_precision = addtmpscore / len(addgramcounter)
+    if addgramcounterall > 0:
+        addscore_recall = addtmpscore / addgramcounterall
+    addscore = 0
+    if addscore_precision > 0 or addscore_recall > 0:
+        addscore = 2 * addscore_precision * addscore_recall / (addscore_precision + addscore_recall)
+
+    return (keepscore, delscore_precision, addscore)
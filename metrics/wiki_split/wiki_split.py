@@ -15,7 +15,6 @@
 
 import re
 import string
-from collections import Counter
 
 import datasets
 import sacrebleu
@@ -24,6 +23,8 @@ from packaging import version
 
 import evaluate
 
+from .sari_engine import NormalizedSentences, SariEngine, corpus_sari, corpus_scores, count, ngram_scores
+
 
 _CITATION = """
 @inproceedings{xu-etal-2016-optimizing,
@@ -61,10 +62,16 @@ Args:
     sources: list of source sentences where each sentence should be a string.
     predictions: list of predicted sentences where each sentence should be a string.
     references: list of lists of reference sentences where each sentence should be a string.
+    num_workers: number of processes normalizing and scoring chunks of sentences for sari, `None` for all CPUs.
+        Defaults to 1.
+    per_sentence: if True, also returns the per-sentence sari scores. Defaults to False.
 Returns:
     sari: sari score
     sacrebleu: sacrebleu score
     exact: exact score
+    sari_per_sentence: sari score of every sentence, only with `per_sentence=True`
+    keep_per_sentence, del_per_sentence, add_per_sentence: the keep, deletion and addition scores (between 0 and 100)
+        the sari score of every sentence is the mean of, only with `per_sentence=True`
 
 Examples:
     >>> sources=["About 95 species are currently accepted ."]
@@ -108,150 +115,11 @@ def compute_em(predictions, references):
 
 def SARIngram(sgrams, cgrams, rgramslist, numref):
     rgramsall = [rgram for rgrams in rgramslist for rgram in rgrams]
-    rgramcounter = Counter(rgramsall)
-
-    sgramcounter = Counter(sgrams)
-    sgramcounter_rep = Counter()
-    for sgram, scount in sgramcounter.items():
-        sgramcounter_rep[sgram] = scount * numref
-
-    cgramcounter = Counter(cgrams)
-    cgramcounter_rep = Counter()
-    for cgram, ccount in cgramcounter.items():
-        cgramcounter_rep[cgram] = ccount * numref
-
-    # KEEP
-    keepgramcounter_rep = sgramcounter_rep & cgramcounter_rep
-    keepgramcountergood_rep = keepgramcounter_rep & rgramcounter
-    keepgramcounterall_rep = sgramcounter_rep & rgramcounter
-
-    keeptmpscore1 = 0
-    keeptmpscore2 = 0
-    for keepgram in keepgramcountergood_rep:
-        keeptmpscore1 += keepgramcountergood_rep[keepgram] / keepgramcounter_rep[keepgram]
-        # Fix an alleged bug [2] in the keep score computation.
-        # keeptmpscore2 += keepgramcountergood_rep[keepgram] / keepgramcounterall_rep[keepgram]
-        keeptmpscore2 += keepgramcountergood_rep[keepgram]
-    # Define 0/0=1 instead of 0 to give higher scores for predictions that match
-    #      a target exactly.
-    keepscore_precision = 1
-    keepscore_recall = 1
-    if len(keepgramcounter_rep) > 0:
-        keepscore_precision = keeptmpscore1 / len(keepgramcounter_rep)
-    if len(keepgramcounterall_rep) > 0:
-        # Fix an alleged bug [2] in the keep score computation.
-        # keepscore_recall = keeptmpscore2 / len(keepgramcounterall_rep)
-        keepscore_recall = keeptmpscore2 / sum(keepgramcounterall_rep.values())
-    keepscore = 0
-    if keepscore_precision > 0 or keepscore_recall > 0:
-        keepscore = 2 * keepscore_precision * keepscore_recall / (keepscore_precision + keepscore_recall)
-
-    # DELETION
-    delgramcounter_rep = sgramcounter_rep - cgramcounter_rep
-    delgramcountergood_rep = delgramcounter_rep - rgramcounter
-    delgramcounterall_rep = sgramcounter_rep - rgramcounter
-    deltmpscore1 = 0
-    deltmpscore2 = 0
-    for delgram in delgramcountergood_rep:
-        deltmpscore1 += delgramcountergood_rep[delgram] / delgramcounter_rep[delgram]
-        deltmpscore2 += delgramcountergood_rep[delgram] / delgramcounterall_rep[delgram]
-    # Define 0/0=1 instead of 0 to give higher scores for predictions that match
-    # a target exactly.
-    delscore_precision = 1
-    if len(delgramcounter_rep) > 0:
-        delscore_precision = deltmpscore1 / len(delgramcounter_rep)
-
-    # ADDITION
-    addgramcounter = set(cgramcounter) - set(sgramcounter)
-    addgramcountergood = set(addgramcounter) & set(rgramcounter)
-    addgramcounterall = set(rgramcounter) - set(sgramcounter)
-
-    addtmpscore = 0
-    for addgram in addgramcountergood:
-        addtmpscore += 1
-
-    # Define 0/0=1 instead of 0 to give higher scores for predictions that match
-    # a target exactly.
-    addscore_precision = 1
-    addscore_recall = 1
-    if len(addgramcounter) > 0:
-        addscore_precision = addtmpscore / len(addgramcounter)
-    if len(addgramcounterall) > 0:
-        addscore_recall = addtmpscore / len(addgramcounterall)
-    addscore = 0
-    if addscore_precision > 0 or addscore_recall > 0:
-        addscore = 2 * addscore_precision * addscore_recall / (addscore_precision + addscore_recall)
-
-    return (keepscore, delscore_precision, addscore)
+    return ngram_scores(count(sgrams), count(cgrams), count(rgramsall), numref)
 
 
 def SARIsent(ssent, csent, rsents):
-    numref = len(rsents)
-
-    s1grams = ssent.split(" ")
-    c1grams = csent.split(" ")
-    s2grams = []
-    c2grams = []
-    s3grams = []
-    c3grams = []
-    s4grams = []
-    c4grams = []
-
-    r1gramslist = []
-    r2gramslist = []
-    r3gramslist = []
-    r4gramslist = []
-    for rsent in rsents:
-        r1grams = rsent.split(" ")
-        r2grams = []
-        r3grams = []
-        r4grams = []
-        r1gramslist.append(r1grams)
-        for i in range(0, len(r1grams) - 1):
-            if i < len(r1grams) - 1:
-                r2gram = r1grams[i] + " " + r1grams[i + 1]
-                r2grams.append(r2gram)
-            if i < len(r1grams) - 2:
-                r3gram = r1grams[i] + " " + r1grams[i + 1] + " " + r1grams[i + 2]
-                r3grams.append(r3gram)
-            if i < len(r1grams) - 3:
-                r4gram = r1grams[i] + " " + r1grams[i + 1] + " " + r1grams[i + 2] + " " + r1grams[i + 3]
-                r4grams.append(r4gram)
-        r2gramslist.append(r2grams)
-        r3gramslist.append(r3grams)
-        r4gramslist.append(r4grams)
-
-    for i in range(0, len(s1grams) - 1):
-        if i < len(s1grams) - 1:
-            s2gram = s1grams[i] + " " + s1grams[i + 1]
-            s2grams.append(s2gram)
-        if i < len(s1grams) - 2:
-            s3gram = s1grams[i] + " " + s1grams[i + 1] + " " + s1grams[i + 2]
-            s3grams.append(s3gram)
-        if i < len(s1grams) - 3:
-            s4gram = s1grams[i] + " " + s1grams[i + 1] + " " + s1grams[i + 2] + " " + s1grams[i + 3]
-            s4grams.append(s4gram)
-
-    for i in range(0, len(c1grams) - 1):
-        if i < len(c1grams) - 1:
-            c2gram = c1grams[i] + " " + c1grams[i + 1]
-            c2grams.append(c2gram)
-        if i < len(c1grams) - 2:
-            c3gram = c1grams[i] + " " + c1grams[i + 1] + " " + c1grams[i + 2]
-            c3grams.append(c3gram)
-        if i < len(c1grams) - 3:
-            c4gram = c1grams[i] + " " + c1grams[i + 1] + " " + c1grams[i + 2] + " " + c1grams[i + 3]
-            c4grams.append(c4gram)
-
-    (keep1score, del1score, add1score) = SARIngram(s1grams, c1grams, r1gramslist, numref)
-    (keep2score, del2score, add2score) = SARIngram(s2grams, c2grams, r2gramslist, numref)
-    (keep3score, del3score, add3score) = SARIngram(s3grams, c3grams, r3gramslist, numref)
-    (keep4score, del4score, add4score) = SARIngram(s4grams, c4grams, r4gramslist, numref)
-    avgkeepscore = sum([keep1score, keep2score, keep3score, keep4score]) / 4
-    avgdelscore = sum([del1score, del2score, del3score, del4score]) / 4
-    avgaddscore = sum([add1score, add2score, add3score, add4score]) / 4
-    finalscore = (avgkeepscore + avgdelscore + avgaddscore) / 3
-    return finalscore
+    return SariEngine().sentence_sari(ssent, csent, rsents)
 
 
 def normalize(sentence, lowercase: bool = True, tokenizer: str = "13a", return_str: bool = True):
@@ -284,15 +152,12 @@ def normalize(sentence, lowercase: bool = True, tokenizer: str = "13a", return_s
     return normalized_sent
 
 
-def compute_sari(sources, predictions, references):
+def compute_sari(sources, predictions, references, num_workers=1, normalized=None, per_sentence=False):
 
     if not (len(sources) == len(predictions) == len(references)):
         raise ValueError("Sources length must match predictions and references lengths.")
-    sari_score = 0
-    for src, pred, refs in zip(sources, predictions, references):
-        sari_score += SARIsent(normalize(src), normalize(pred), [normalize(sent) for sent in refs])
-    sari_score = sari_score / len(predictions)
-    return 100 * sari_score
+    scores = corpus_scores(sources, predictions, references, normalize, num_workers=num_workers, normalized=normalized)
+    return corpus_sari(scores, per_sentence=per_sentence)
 
 
 def compute_sacrebleu(
@@ -355,12 +220,25 @@ class WikiSplit(evaluate.Metric):
             ],
         )
 
-    def _compute(self, sources, predictions, references):
+    def _compute(self, sources, predictions, references, num_workers=1, per_sentence=False):
         # if only one reference is provided make sure we still use list of lists
         if isinstance(references[0], str):
             references = [[ref] for ref in references]
+        # normalized sources and references, kept across calls since evaluation sets reuse the same ones; the memo
+        # keeps the most recently used sentences only, so a long-running process does not accumulate every sentence
+        if not hasattr(self, "normalized_sentences"):
+            self.normalized_sentences = NormalizedSentences()
         result = {}
-        result.update({"sari": compute_sari(sources=sources, predictions=predictions, references=references)})
+        result.update(
+            compute_sari(
+                sources=sources,
+                predictions=predictions,
+                references=references,
+                num_workers=num_workers,
+                normalized=self.normalized_sentences,
+                per_sentence=per_sentence,
+            )
+        )
         result.update({"sacrebleu": compute_sacrebleu(predictions=predictions, references=references)})
         result.update({"exact": compute_em(predictions=predictions, references=references)})
         return result
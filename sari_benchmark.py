@@ -0,0 +1,219 @@
+'''
+SARI 引擎基准测试
+
+对比 metrics/sari/sari_engine.py（词编号 + 单次滑窗生成 n-gram）与原来基于字符串拼接和 Counter 的实现：
+随机生成一批 (source, prediction, references)，检查两者的逐句分数完全相等，并输出各自的耗时。
+
+:demo
+    python sari_benchmark.py --sentences 2000 --references 8
+'''
+import argparse
+import importlib.util
+import os
+import random
+import time
+from collections import Counter
+
+
+def _loadEngine():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metrics', 'sari', 'sari_engine.py')
+    spec = importlib.util.spec_from_file_location('sari_engine', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# 原实现（metrics/sari/sari.py 改写前的代码），作为对照
+def referenceSARIngram(sgrams, cgrams, rgramslist, numref):
+    rgramsall = [rgram for rgrams in rgramslist for rgram in rgrams]
+    rgramcounter = Counter(rgramsall)
+
+    sgramcounter = Counter(sgrams)
+    sgramcounter_rep = Counter()
+    for sgram, scount in sgramcounter.items():
+        sgramcounter_rep[sgram] = scount * numref
+
+    cgramcounter = Counter(cgrams)
+    cgramcounter_rep = Counter()
+    for cgram, ccount in cgramcounter.items():
+        cgramcounter_rep[cgram] = ccount * numref
+
+    # KEEP
+    keepgramcounter_rep = sgramcounter_rep & cgramcounter_rep
+    keepgramcountergood_rep = keepgramcounter_rep & rgramcounter
+    keepgramcounterall_rep = sgramcounter_rep & rgramcounter
+
+    keeptmpscore1 = 0
+    keeptmpscore2 = 0
+    for keepgram in keepgramcountergood_rep:
+        keeptmpscore1 += keepgramcountergood_rep[keepgram] / keepgramcounter_rep[keepgram]
+        # Fix an alleged bug [2] in the keep score computation.
+        # keeptmpscore2 += keepgramcountergood_rep[keepgram] / keepgramcounterall_rep[keepgram]
+        keeptmpscore2 += keepgramcountergood_rep[keepgram]
+    # Define 0/0=1 instead of 0 to give higher scores for predictions that match
+    #      a target exactly.
+    keepscore_precision = 1
+    keepscore_recall = 1
+    if len(keepgramcounter_rep) > 0:
+        keepscore_precision = keeptmpscore1 / len(keepgramcounter_rep)
+    if len(keepgramcounterall_rep) > 0:
+        # Fix an alleged bug [2] in the keep score computation.
+        # keepscore_recall = keeptmpscore2 / len(keepgramcounterall_rep)
+        keepscore_recall = keeptmpscore2 / sum(keepgramcounterall_rep.values())
+    keepscore = 0
+    if keepscore_precision > 0 or keepscore_recall > 0:
+        keepscore = 2 * keepscore_precision * keepscore_recall / (keepscore_precision + keepscore_recall)
+
+    # DELETION
+    delgramcounter_rep = sgramcounter_rep - cgramcounter_rep
+    delgramcountergood_rep = delgramcounter_rep - rgramcounter
+    delgramcounterall_rep = sgramcounter_rep - rgramcounter
+    deltmpscore1 = 0
+    deltmpscore2 = 0
+    for delgram in delgramcountergood_rep:
+        deltmpscore1 += delgramcountergood_rep[delgram] / delgramcounter_rep[delgram]
+        deltmpscore2 += delgramcountergood_rep[delgram] / delgramcounterall_rep[delgram]
+    # Define 0/0=1 instead of 0 to give higher scores for predictions that match
+    # a target exactly.
+    delscore_precision = 1
+    if len(delgramcounter_rep) > 0:
+        delscore_precision = deltmpscore1 / len(delgramcounter_rep)
+
+    # ADDITION
+    addgramcounter = set(cgramcounter) - set(sgramcounter)
+    addgramcountergood = set(addgramcounter) & set(rgramcounter)
+    addgramcounterall = set(rgramcounter) - set(sgramcounter)
+
+    addtmpscore = 0
+    for addgram in addgramcountergood:
+        addtmpscore += 1
+
+    # Define 0/0=1 instead of 0 to give higher scores for predictions that match
+    # a target exactly.
+    addscore_precision = 1
+    addscore_recall = 1
+    if len(addgramcounter) > 0:
+        addscore_precision = addtmpscore / len(addgramcounter)
+    if len(addgramcounterall) > 0:
+        addscore_recall = addtmpscore / len(addgramcounterall)
+    addscore = 0
+    if addscore_precision > 0 or addscore_recall > 0:
+        addscore = 2 * addscore_precision * addscore_recall / (addscore_precision + addscore_recall)
+
+    return (keepscore, delscore_precision, addscore)
+
+
+def referenceSARIsent(ssent, csent, rsents):
+    numref = len(rsents)
+
+    s1grams = ssent.split(" ")
+    c1grams = csent.split(" ")
+    s2grams = []
+    c2grams = []
+    s3grams = []
+    c3grams = []
+    s4grams = []
+    c4grams = []
+
+    r1gramslist = []
+    r2gramslist = []
+    r3gramslist = []
+    r4gramslist = []
+    for rsent in rsents:
+        r1grams = rsent.split(" ")
+        r2grams = []
+        r3grams = []
+        r4grams = []
+        r1gramslist.append(r1grams)
+        for i in range(0, len(r1grams) - 1):
+            if i < len(r1grams) - 1:
+                r2gram = r1grams[i] + " " + r1grams[i + 1]
+                r2grams.append(r2gram)
+            if i < len(r1grams) - 2:
+                r3gram = r1grams[i] + " " + r1grams[i + 1] + " " + r1grams[i + 2]
+                r3grams.append(r3gram)
+            if i < len(r1grams) - 3:
+                r4gram = r1grams[i] + " " + r1grams[i + 1] + " " + r1grams[i + 2] + " " + r1grams[i + 3]
+                r4grams.append(r4gram)
+        r2gramslist.append(r2grams)
+        r3gramslist.append(r3grams)
+        r4gramslist.append(r4grams)
+
+    for i in range(0, len(s1grams) - 1):
+        if i < len(s1grams) - 1:
+            s2gram = s1grams[i] + " " + s1grams[i + 1]
+            s2grams.append(s2gram)
+        if i < len(s1grams) - 2:
+            s3gram = s1grams[i] + " " + s1grams[i + 1] + " " + s1grams[i + 2]
+            s3grams.append(s3gram)
+        if i < len(s1grams) - 3:
+            s4gram = s1grams[i] + " " + s1grams[i + 1] + " " + s1grams[i + 2] + " " + s1grams[i + 3]
+            s4grams.append(s4gram)
+
+    for i in range(0, len(c1grams) - 1):
+        if i < len(c1grams) - 1:
+            c2gram = c1grams[i] + " " + c1grams[i + 1]
+            c2grams.append(c2gram)
+        if i < len(c1grams) - 2:
+            c3gram = c1grams[i] + " " + c1grams[i + 1] + " " + c1grams[i + 2]
+            c3grams.append(c3gram)
+        if i < len(c1grams) - 3:
+            c4gram = c1grams[i] + " " + c1grams[i + 1] + " " + c1grams[i + 2] + " " + c1grams[i + 3]
+            c4grams.append(c4gram)
+
+    (keep1score, del1score, add1score) = referenceSARIngram(s1grams, c1grams, r1gramslist, numref)
+    (keep2score, del2score, add2score) = referenceSARIngram(s2grams, c2grams, r2gramslist, numref)
+    (keep3score, del3score, add3score) = referenceSARIngram(s3grams, c3grams, r3gramslist, numref)
+    (keep4score, del4score, add4score) = referenceSARIngram(s4grams, c4grams, r4gramslist, numref)
+    avgkeepscore = sum([keep1score, keep2score, keep3score, keep4score]) / 4
+    avgdelscore = sum([del1score, del2score, del3score, del4score]) / 4
+    avgaddscore = sum([add1score, add2score, add3score, add4score]) / 4
+    finalscore = (avgkeepscore + avgdelscore + avgaddscore) / 3
+    return finalscore
+
+
+def randomCorpus(num_sentences, num_references, vocab_size=500, seed=0):
+    rng = random.Random(seed)
+    vocab = ['w{}'.format(i) for i in range(vocab_size)]
+
+    def sentence(base=None):
+        if base is None:
+            return ' '.join(rng.choices(vocab, k=rng.randint(5, 40)))
+        words = [w for w in base.split(' ') if rng.random() > 0.2]
+        words += rng.choices(vocab, k=rng.randint(0, 5))
+        return ' '.join(words) if words else rng.choice(vocab)
+
+    corpus = []
+    for _ in range(num_sentences):
+        source = sentence()
+        corpus.append((source, sentence(source), [sentence(source) for _ in range(num_references)]))
+    return corpus
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='SARI 引擎与原实现的一致性和速度对比')
+    parser.add_argument('--sentences', type=int, default=2000)
+    parser.add_argument('--references', type=int, default=8)
+    args = parser.parse_args(argv)
+
+    engine_module = _loadEngine()
+    corpus = randomCorpus(args.sentences, args.references)
+
+    start = time.perf_counter()
+    reference_scores = [referenceSARIsent(s, c, r) for s, c, r in corpus]
+    reference_time = time.perf_counter() - start
+
+    engine = engine_module.SariEngine()
+    start = time.perf_counter()
+    engine_scores = [engine.sentence_sari(s, c, r) for s, c, r in corpus]
+    engine_time = time.perf_counter() - start
+
+    mismatches = sum(a != b for a, b in zip(reference_scores, engine_scores))
+    print('sentences: {}, references per sentence: {}'.format(args.sentences, args.references))
+    print('identical scores: {} / {}'.format(len(corpus) - mismatches, len(corpus)))
+    print('original: {:.3f}s, engine: {:.3f}s, speedup: {:.1f}x'.format(
+        reference_time, engine_time, reference_time / engine_time))
+
+
+if __name__ == '__main__':
+    main()
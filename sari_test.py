@@ -0,0 +1,67 @@
+'''
+SARI 引擎与原实现的一致性检查
+
+metrics/sari/sari_engine.py 的逐句分数必须与 sari_benchmark.py 中保留的原实现（字符串拼接 + Counter）逐位相同，
+并行打分（num_workers）、逐句输出（per_sentence）和有上限的规范化缓存也必须与原实现一致。
+
+:demo
+    python sari_test.py
+    pytest sari_test.py
+'''
+import sys
+
+from sari_benchmark import _loadEngine, randomCorpus, referenceSARIsent
+
+# 注册到 sys.modules，多进程打分时子进程才能按模块名找到 _score_chunk
+sari_engine = sys.modules.setdefault('sari_engine', _loadEngine())
+
+EDGE_CASES = [
+    ('a b c d', 'a b c d', ['a b c d']),              # 与 source 完全相同
+    ('a b c d', 'a b c d', ['e f', 'a b']),
+    ('a b c d', '', ['a b c', 'b c d']),              # 空 prediction
+    ('a', 'b', ['a', 'b', 'c']),                      # 单词句子，没有 2~4 元组
+    ('a a a b', 'a a b b', ['a a', 'b b b b']),       # 重复的 n-gram
+]
+
+
+def identity(sentence):
+    return sentence
+
+
+def test_sentence_sari():
+    engine = sari_engine.SariEngine()
+    for num_references in (1, 2, 8):
+        corpus = randomCorpus(300, num_references, vocab_size=50, seed=num_references) + EDGE_CASES
+        for source, prediction, references in corpus:
+            assert engine.sentence_sari(source, prediction, references) == \
+                referenceSARIsent(source, prediction, references), (source, prediction, references)
+
+
+def test_corpus_scores():
+    corpus = randomCorpus(200, 4, vocab_size=50, seed=1) + EDGE_CASES
+    sources, predictions, references = (list(column) for column in zip(*corpus))
+    expected = [referenceSARIsent(s, p, r) for s, p, r in corpus]
+    for num_workers in (1, 2):
+        scores = sari_engine.corpus_scores(sources, predictions, references, identity, num_workers=num_workers,
+                                           chunk_size=64)
+        result = sari_engine.corpus_sari(scores, per_sentence=True)
+        assert result['sari_per_sentence'] == [100 * sari for sari in expected]
+        assert result['sari'] == 100 * (sum(expected) / len(expected))
+
+
+def test_bounded_normalization_memo():
+    corpus = randomCorpus(100, 4, vocab_size=50, seed=2)
+    sources, predictions, references = (list(column) for column in zip(*corpus))
+    expected = sari_engine.corpus_scores(sources, predictions, references, identity)
+    memo = sari_engine.NormalizedSentences(max_entries=10)
+    for num_workers in (1, 2, 1):
+        assert sari_engine.corpus_scores(sources, predictions, references, identity, num_workers=num_workers,
+                                         chunk_size=64, normalized=memo) == expected
+        assert len(memo) == 10
+
+
+if __name__ == '__main__':
+    test_sentence_sari()
+    test_corpus_scores()
+    test_bounded_normalization_memo()
+    print('SARI 引擎与原实现完全一致')
@@ -0,0 +1,167 @@
+'''
+进程级的模型评分器注册表
+
+bertscore、bleurt 这类依赖模型的指标，每次构造评分器都要重新加载一次 checkpoint。
+注册表按 (metric, model, checkpoint, device, options) 缓存已加载好的评分器，同一进程内重复调用直接复用；
+可以设置内存预算，超出预算时按 LRU 顺序淘汰最久未使用的评分器。
+
+:demo
+    from scorer_registry import warmup, get_scorer
+    warmup(['bertscore', 'bleurt'])    # 进程启动时提前加载模型
+    scorer = get_scorer('bleurt', checkpoint='./BLEURT-20')
+'''
+import os
+import threading
+from collections import OrderedDict
+
+
+def _load_bertscore(model=None, checkpoint=None, device=None, **options):
+    '''
+    加载 bertscore 的 evaluate 模块，并用一条样本触发一次 compute，使模块内部的 cached_bertscorer 完成模型加载
+    '''
+    from evaluate import load
+    bertscore = load(checkpoint or "./metrics/bertscore")
+    bertscore.compute(predictions=["warmup"], references=["warmup"], model_type=model, device=device, **options)
+    return bertscore
+
+
+def _load_bleurt(model=None, checkpoint=None, device=None, **options):
+    from bleurt import score
+    return score.BleurtScorer(checkpoint)
+
+
+def _sizeof_bertscore(scorer, checkpoint=None):
+    '''
+    按模型参数和 buffer 实际占用的字节数估算内存
+    '''
+    cached = getattr(scorer, 'cached_bertscorer', None)
+    model = getattr(cached, '_model', None)
+    if model is None:
+        return 0
+    size = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        size += tensor.numel() * tensor.element_size()
+    return size
+
+
+def _sizeof_checkpoint(scorer, checkpoint=None):
+    '''
+    tensorflow 模型不方便统计参数内存，用 checkpoint 目录在磁盘上的大小近似
+    '''
+    if checkpoint is None or not os.path.isdir(checkpoint):
+        return 0
+    size = 0
+    for root, _, files in os.walk(checkpoint):
+        for name in files:
+            size += os.path.getsize(os.path.join(root, name))
+    return size
+
+
+# metric -> (加载函数, 内存估算函数, 默认参数)
+LOADERS = {
+    'bertscore': (_load_bertscore, _sizeof_bertscore,
+                  {'model': 'bert-base-chinese', 'checkpoint': './metrics/bertscore', 'options': {'lang': 'zh'}}),
+    'bleurt': (_load_bleurt, _sizeof_checkpoint,
+               {'model': None, 'checkpoint': './BLEURT-20', 'options': {}}),
+}
+
+
+class ScorerRegistry:
+    '''
+    评分器注册表
+    :param max_memory: 内存预算，单位字节。None 表示不限制；超出预算时淘汰最久未使用的评分器，但至少保留刚加载的那一个
+    '''
+
+    def __init__(self, max_memory=None):
+        self.max_memory = max_memory
+        self._scorers = OrderedDict()    # key -> (scorer, size)，顺序即 LRU 顺序，末尾为最近使用
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def make_key(metric, model=None, checkpoint=None, device=None, **options):
+        if metric not in LOADERS:
+            raise Exception('no such metric like {}'.format(metric))
+        defaults = LOADERS[metric][2]
+        if model is None:
+            model = defaults['model']
+        if checkpoint is None:
+            checkpoint = defaults['checkpoint']
+        merged = dict(defaults['options'])
+        merged.update(options)
+        return metric, model, checkpoint, device, tuple(sorted(merged.items()))
+
+    def get(self, metric, model=None, checkpoint=None, device=None, **options):
+        '''
+        获取一个已加载好的评分器，不存在时加载并缓存
+        :param metric: 指标名，可选 'bertscore', 'bleurt'
+        :param model: 模型名，如 'bert-base-chinese'
+        :param checkpoint: 模型或脚本路径，如 './BLEURT-20'
+        :param device: 模型所在设备，None 表示由各指标自行决定
+        :param options: 其余会影响模型加载的参数，如 lang、num_layers
+        :return: 评分器实例
+        '''
+        key = self.make_key(metric, model, checkpoint, device, **options)
+        with self._lock:
+            if key in self._scorers:
+                self._scorers.move_to_end(key)
+                return self._scorers[key][0]
+            load, sizeof, _ = LOADERS[metric]
+            _, model, checkpoint, device, options = key
+            scorer = load(model=model, checkpoint=checkpoint, device=device, **dict(options))
+            self._scorers[key] = (scorer, sizeof(scorer, checkpoint))
+            self._evict()
+            return scorer
+
+    def warmup(self, metrics, **kwargs):
+        '''
+        提前加载指定指标的评分器，不依赖模型的指标会被忽略
+        :param metrics: 指标名列表，如 ['rouge', 'bertscore', 'bleurt']
+        :param kwargs: 传给 get 的参数，对所有指标生效
+        :return: 已加载的评分器列表
+        '''
+        return [self.get(metric, **kwargs) for metric in metrics if metric in LOADERS]
+
+    def memory_usage(self):
+        with self._lock:
+            return sum(size for _, size in self._scorers.values())
+
+    def evict(self, metric=None):
+        '''
+        手动释放评分器
+        :param metric: 指标名，None 表示释放全部
+        '''
+        with self._lock:
+            for key in [key for key in self._scorers if metric is None or key[0] == metric]:
+                del self._scorers[key]
+
+    def _evict(self):
+        if self.max_memory is None:
+            return
+        while len(self._scorers) > 1 and self.memory_usage() > self.max_memory:
+            self._scorers.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._scorers
+
+    def __len__(self):
+        return len(self._scorers)
+
+
+registry = ScorerRegistry()
+
+
+def get_scorer(metric, model=None, checkpoint=None, device=None, **options):
+    return registry.get(metric, model=model, checkpoint=checkpoint, device=device, **options)
+
+
+def warmup(metrics, **kwargs):
+    return registry.warmup(metrics, **kwargs)
+
+
+def set_memory_budget(max_memory):
+    '''
+    设置默认注册表的内存预算，单位字节，None 表示不限制
+    '''
+    with registry._lock:
+        registry.max_memory = max_memory
+        registry._evict()
@@ -0,0 +1,208 @@
+'''
+流式评估：从 JSONL 文件（或标准输入）按块读取参考译文/候选译文，逐块调用 utils_all.getScores 计算分数，
+每算完一块就把逐行分数追加写入输出文件。内存占用只和块大小有关，与数据总量无关；
+中途崩溃后用同样的命令重新运行，会跳过输出文件中已经写完的行继续计算。
+
+输入每行一个 json 对象，如 {"id": 1, "reference": "你是一个男孩", "candidate": "我是一个男孩"}
+输出每行一个 json 对象，如 {"id": 1, "rouge": 0.83, "chrf": 0.71}
+
+:demo
+    python stream_eval.py data.jsonl scores.jsonl -m rouge chrf bleu --chunk-size 1000
+    cat data.jsonl | python stream_eval.py - scores.jsonl -m rouge
+    python stream_eval.py data.jsonl scores_parquet -m rouge --format parquet    # 每块写一个 part 文件
+'''
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from itertools import islice
+
+from utils_all import getScores
+
+
+def readPairs(source, reference_key='reference', candidate_key='candidate', id_key='id'):
+    '''
+    逐行读取 JSONL，生成 (id, reference, candidate)
+    :param source: 文件路径，'-' 表示标准输入；也可以直接传入已打开的文件对象
+    :param reference_key: 参考译文字段名
+    :param candidate_key: 候选译文字段名
+    :param id_key: 行 id 字段名，缺失时使用行号
+    '''
+    if source == '-':
+        f = sys.stdin
+    elif isinstance(source, str):
+        f = open(source, encoding='utf-8')
+    else:
+        f = source
+    try:
+        index = 0
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            yield row.get(id_key, index), row[reference_key], row[candidate_key]
+            index += 1
+    finally:
+        if f is not source and f is not sys.stdin:
+            f.close()
+
+
+def iterChunks(iterable, chunk_size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class JsonlWriter:
+    '''
+    追加写 JSONL，每块写完后 flush 并 fsync，保证已返回的块不会因进程崩溃丢失
+    '''
+
+    def __init__(self, path):
+        self.path = path
+
+    def finished_rows(self):
+        '''
+        统计已经完整写入的行数；最后一行如果只写了一半（崩溃时），截断掉
+        '''
+        if self.path == '-' or not os.path.exists(self.path):
+            return 0
+        count, end, offset = 0, 0, 0
+        with open(self.path, 'rb+') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):    # 按块扫描，不把整个输出读进内存
+                count += block.count(b'\n')
+                last = block.rfind(b'\n')
+                if last >= 0:
+                    end = offset + last + 1
+                offset += len(block)
+            if end != offset:
+                f.truncate(end)
+        return count
+
+    def reset(self):
+        if self.path != '-' and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def write(self, rows):
+        if self.path == '-':
+            for row in rows:
+                sys.stdout.write(json.dumps(row, ensure_ascii=False) + '\n')
+            sys.stdout.flush()
+            return
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class ParquetWriter:
+    '''
+    每块写成目录下的一个 part-xxxxx.parquet 文件，先写临时文件再改名，目录中只会出现完整的 part
+    需要安装 pyarrow
+    '''
+
+    def __init__(self, path):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError('writing parquet requires pyarrow, you can install it with `pip install pyarrow`')
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _parts(self):
+        return sorted(name for name in os.listdir(self.path) if name.startswith('part-') and name.endswith('.parquet'))
+
+    def finished_rows(self):
+        import pyarrow.parquet as pq
+        return sum(pq.ParquetFile(os.path.join(self.path, name)).metadata.num_rows for name in self._parts())
+
+    def reset(self):
+        for name in self._parts():
+            os.remove(os.path.join(self.path, name))
+
+    def write(self, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        name = 'part-{:05d}.parquet'.format(len(self._parts()))
+        tmp = os.path.join(self.path, '.' + name + '.tmp')
+        pq.write_table(pa.Table.from_pylist(rows), tmp)
+        os.replace(tmp, os.path.join(self.path, name))
+
+
+WRITERS = {
+    'jsonl': JsonlWriter,
+    'parquet': ParquetWriter,
+}
+
+
+def streamScores(metrics: list, source, output, chunk_size=1000, output_format='jsonl', resume=True, n_jobs=1,
+                 reference_key='reference', candidate_key='candidate', id_key='id'):
+    '''
+    流式计算分数
+    :param metrics: 指标名列表，同 utils_all.getScores
+    :param source: 输入 JSONL 路径，'-' 表示标准输入
+    :param output: 输出路径；jsonl 格式为文件（'-' 表示标准输出），parquet 格式为目录
+    :param chunk_size: 每块的行数，决定内存占用上限
+    :param output_format: 'jsonl' 或 'parquet'
+    :param resume: 为 True 时跳过输出中已完成的行，从中断处继续
+    :param n_jobs: 传给 getScores 的并行进程数；并行时所有块共用同一个进程池和模型线程
+    :return: 本次新计算的行数
+    '''
+    if output_format not in WRITERS:
+        raise Exception('no such output format like {}'.format(output_format))
+    writer = WRITERS[output_format](output)
+    if resume:
+        skip = writer.finished_rows()
+    else:
+        writer.reset()
+        skip = 0
+
+    pairs = islice(readPairs(source, reference_key, candidate_key, id_key), skip, None)
+    count = 0
+    with ExitStack() as stack:
+        executors = {}
+        if n_jobs != 1:
+            executors['cpu_executor'] = stack.enter_context(ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count()))
+            executors['model_executor'] = stack.enter_context(ThreadPoolExecutor(max_workers=1))
+        for chunk in iterChunks(pairs, chunk_size):
+            ids, references, candidates = zip(*chunk)
+            scores = getScores(metrics, list(references), list(candidates), n_jobs=n_jobs, **executors)
+            rows = []
+            for i, row_id in enumerate(ids):
+                row = {id_key: row_id}
+                for metric in metrics:
+                    row[metric] = float(scores[metric][i])
+                rows.append(row)
+            writer.write(rows)
+            count += len(rows)
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='流式计算 JSONL 中参考译文/候选译文的逐行分数')
+    parser.add_argument('input', help="输入 JSONL 路径，'-' 表示标准输入")
+    parser.add_argument('output', help="输出路径，jsonl 为文件（'-' 表示标准输出），parquet 为目录")
+    parser.add_argument('-m', '--metrics', nargs='+', default=['rouge', 'chrf', 'bleu'],
+                        help="指标名，可选 'rouge','chrf','bertscore','bleu','meteor','bleurt'")
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--format', dest='output_format', choices=sorted(WRITERS), default='jsonl')
+    parser.add_argument('--no-resume', dest='resume', action='store_false', help='忽略并覆盖已有输出')
+    parser.add_argument('--n-jobs', type=int, default=1)
+    parser.add_argument('--reference-key', default='reference')
+    parser.add_argument('--candidate-key', default='candidate')
+    parser.add_argument('--id-key', default='id')
+    args = parser.parse_args(argv)
+    count = streamScores(args.metrics, args.input, args.output, chunk_size=args.chunk_size,
+                         output_format=args.output_format, resume=args.resume, n_jobs=args.n_jobs,
+                         reference_key=args.reference_key, candidate_key=args.candidate_key, id_key=args.id_key)
+    print('scored {} rows'.format(count), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+'''
+分词缓存
+
+rouge、chrf、bleu、meteor 等指标需要的分词方式大多相同，同一个句子在一次 getScores 中会被反复分词。
+这里把各种分词方式集中起来，对 (分词方式, 句子) 做 LRU 缓存，每个句子每种分词方式只分一次，结果以 tuple 返回，可被多个指标安全共享。
+
+支持的分词方式：
+    'char': 按字符切分，中文常用。'你好' -> ('你', '好')
+    'char_spaced': 字符之间用空格连接的字符串，供 rouge 使用。'你好' -> '你 好'
+    'space': 按单个空格切分，与 dealData 原有行为一致。'a  b' -> ('a', '', 'b')
+    'whitespace': 按任意空白切分。'a  b' -> ('a', 'b')
+    'jieba': jieba 分词
+    '13a': sacrebleu 的 13a 分词
+
+:demo
+    from tokenization import tokenize, tokenizeAll
+    tokenize('你是一个男孩', 'char')
+    tokenizeAll(['This is a test', 'Time is up'], 'space')
+'''
+import functools
+
+
+def _jieba(text):
+    import jieba
+    return tuple(' '.join(jieba.cut(text)).split())
+
+
+@functools.lru_cache(maxsize=1)
+def _tokenizer13a():
+    from sacrebleu.tokenizers.tokenizer_13a import Tokenizer13a
+    return Tokenizer13a()
+
+
+SCHEMES = {
+    'char': tuple,
+    'char_spaced': ' '.join,
+    'space': lambda text: tuple(text.split(' ')),
+    'whitespace': lambda text: tuple(text.split()),
+    'jieba': _jieba,
+    '13a': lambda text: tuple(_tokenizer13a()(text).split()),
+}
+
+
+def _segment(scheme, text):
+    if scheme not in SCHEMES:
+        raise Exception('no such tokenize scheme like {}'.format(scheme))
+    return SCHEMES[scheme](text)
+
+
+_cached_segment = functools.lru_cache(maxsize=2 ** 16)(_segment)
+
+
+def tokenize(text, scheme='char'):
+    '''
+    对单个句子分词，结果会被缓存
+    :param text: 字符串
+    :param scheme: 分词方式，见模块说明
+    :return: 分词结果 tuple（'char_spaced' 返回字符串）
+    '''
+    return _cached_segment(scheme, text)
+
+
+def tokenizeAll(texts, scheme='char'):
+    '''
+    对字符串列表逐个分词
+    :param texts: 字符串列表
+    :param scheme: 分词方式
+    :return: 分词结果列表
+    '''
+    return [_cached_segment(scheme, text) for text in texts]
+
+
+def setCacheSize(maxsize):
+    '''
+    重新设置缓存大小，会清空已有缓存
+    :param maxsize: 最多缓存的 (分词方式, 句子) 数量，None 表示不限制
+    '''
+    global _cached_segment
+    _cached_segment = functools.lru_cache(maxsize=maxsize)(_segment)
+
+
+def cacheInfo():
+    return _cached_segment.cache_info()
+
+
+def clearCache():
+    _cached_segment.cache_clear()
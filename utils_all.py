@@ -1,9 +1,13 @@
-from rouge import Rouge
-from nltk.translate.chrf_score import chrf_precision_recall_fscore_support
-from evaluate import load
-from nltk.translate.meteor_score import meteor_score
-from nltk.translate.bleu_score import sentence_bleu
-from bleurt import score
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+
+from bleu_batch import sentenceBleuScores
+from chrf_batch import chrfPrecisionRecallFscoreSupport
+from meteor_batch import meteorScores
+from rouge_batch import rougeScores
+from scorer_registry import get_scorer, warmup
+from tokenization import tokenize
 
 
 def getRougeScore(reference_sentences, generated_sentences,
@@ -22,20 +26,17 @@ def getRougeScore(reference_sentences, generated_sentences,
         reference_sentences = "你是一个男孩"
         print(getRougescore(reference_sentences, generated_sentences))
     """
-    scores = []
-    rouge = Rouge()
-
-    for generated_sentence, reference_sentence in zip(generated_sentences, reference_sentences):
-        if lang == 'en':
-            pass
-        elif lang == 'zh':
-            reference_sentence = " ".join(reference_sentence)
-            generated_sentence = " ".join(generated_sentence)
-        else:
-            raise Exception("para:lang type error")
-        rouge_score = rouge.get_scores(generated_sentence, reference_sentence)
-        scores.append(rouge_score[0]["rouge-{}".format(rouge_n)]['p'])
-    return scores
+    if lang == 'en':
+        pass
+    elif lang == 'zh':
+        reference_sentences = [tokenize(reference_sentence, 'char_spaced') for reference_sentence in reference_sentences]
+        generated_sentences = [tokenize(generated_sentence, 'char_spaced') for generated_sentence in generated_sentences]
+    else:
+        raise Exception("para:lang type error")
+    # 整批一次计算，结果与逐对调用 rouge 包的 Rouge().get_scores 相同
+    rouge_type = "rouge-{}".format(rouge_n)
+    rouge_score = rougeScores(list(generated_sentences), list(reference_sentences), rouge_types=[rouge_type])
+    return rouge_score[rouge_type]['p'].tolist()
 
 
 def getChrfScore(reference_sentences, generated_sentences,
@@ -56,25 +57,27 @@ def getChrfScore(reference_sentences, generated_sentences,
         result =get_chrf_precision_recall_fscore_support(reference_sentence,generated_sentence)
         print(result)
     """
-    fscores = []
     for reference_sentence, generated_sentence in zip(reference_sentences, generated_sentences):
         if len(reference_sentence) < n_gram or len(generated_sentence) < n_gram:
             raise Exception('length of reference_sentence or generated_sentences < n_gram')
-        precision, recall, fscore, tp = chrf_precision_recall_fscore_support(
-            reference_sentence, generated_sentence, n=n_gram, epsilon=0., beta=beta
-        )
-        fscores.append(fscore)
-    return fscores
+    # 整批一次计算，结果与逐对调用 nltk 的 chrf_precision_recall_fscore_support 相同
+    precision, recall, fscore, tp = chrfPrecisionRecallFscoreSupport(
+        reference_sentences, generated_sentences, n_grams=[n_gram], epsilon=0., beta=beta
+    )
+    return fscore[:, 0].tolist()
 
 
-def getBertScore(reference_sentences, generated_sentences):
+def getBertScore(reference_sentences, generated_sentences, model_type="bert-base-chinese", device=None):
     """
     tip:使用此函数需要在此函数文件的同级目录下 1.创建模型文件夹"bert-base-chinese",模型文件夹内有三个文件分别是:config.json,pytorch_model.bin,vocab.txt
                                         2.需要evaluate的源码中的metrics文件夹中的脚本文件，可以在git中下载 https://github.com/huggingface/evaluate
 
     :param reference_sentences: list,传入任意数量的字符串，注意数量要和 generated_sentences 中的数量保持一致
     :param generated_sentences: list,传入任意数量的字符串，注意数量要和 reference_sentences 中的数量保持一致
+    :param model_type: 模型名，默认为"bert-base-chinese"
+    :param device: 模型所在设备，默认由bert_score自行决定
     :return: 返回分数列表，列表中分数元素的个数和 generated_sentences 中的元素数量相同
+    模块和模型由 scorer_registry 缓存，同一进程内只在第一次调用时加载
 
     demo：
     generated_sentences = ["this is a  test","hello world", "你好","2", "你好"]
@@ -84,9 +87,9 @@ def getBertScore(reference_sentences, generated_sentences):
     """
     if len(reference_sentences) == 0 or len(generated_sentences) == 0:
         raise Exception("the sentences list is empty")
-    bertscore = load("./metrics/bertscore")
+    bertscore = get_scorer('bertscore', model=model_type, device=device, lang="zh")
     results = bertscore.compute(predictions=generated_sentences, references=reference_sentences, lang="zh",
-                                model_type="bert-base-chinese")
+                                model_type=model_type, device=device)
     scores = results['f1']
     return scores
 
@@ -95,29 +98,22 @@ def dealData(references, candidates, language):    # 分词
     '''
     分词子函数
     接收references, candidates两个字符串列表并将其分词
-    对于每个字符串列表处理：['This is a cat', 'this is a test'] -> [['This', 'is', 'a', 'cat'], ['this', 'is', 'a', 'cat']]
+    对于每个字符串列表处理：['This is a cat', 'this is a test'] -> [('This', 'is', 'a', 'cat'), ('this', 'is', 'a', 'cat')]
     :param references: 参考译文，字符串列表
     :param candidates: 候选译文，字符串列表
     :param language: 语言，可选'en', 'zh'。已弃用，改为通过判断字符串第一个字符是否为英文来判断语言。
     :return: 分词后的references和candidates
     '''
-    references = references[:]
-    candidates = candidates[:]    # 防止不同指标计算时对原始数据作出修改
-    for i in range(len(references)):
-        if references[i][0].encode('utf-8').isalpha():    # 区分中英文。关键字参数language失效。
-            language = 'en'
-        elif not references[i][0].encode('utf-8').isalpha():
-            language = 'zh'
-        if language == 'en':  # 英文直接分词
-            references[i] = references[i].split(' ')
-            candidates[i] = candidates[i].split(' ')
-        elif language == 'zh':
-            references[i] = [ch for ch in references[i]]
-            candidates[i] = [ch for ch in candidates[i]]
+    # 分词结果来自 tokenization 的缓存，不会修改原始数据，同一句子在多个指标间只分词一次
+    tokenized_references, tokenized_candidates = [], []
+    for reference, candidate in zip(references, candidates):
+        if reference[0].encode('utf-8').isalpha():    # 区分中英文。关键字参数language失效。
+            scheme = 'space'  # 英文直接分词
         else:
-            print('Only English or Chinese supported.')
-            exit()
-    return references, candidates
+            scheme = 'char'
+        tokenized_references.append(tokenize(reference, scheme))
+        tokenized_candidates.append(tokenize(candidate, scheme))
+    return tokenized_references, tokenized_candidates
 
 
 def getBleu(references: list, candidates: list, weights=(1,), language='en'):
@@ -135,12 +131,8 @@ def getBleu(references: list, candidates: list, weights=(1,), language='en'):
         print('Bleu:', getBleu(references, candidates))    # 默认weights=(1,)
     '''
     references, candidates = dealData(references, candidates, language)    # 调用deal_data分词
-    # 计算BLEU分数
-    score_list = []
-    for i in range(len(references)):
-        score = sentence_bleu([references[i]], candidates[i], weights=weights)
-        score_list.append(score)
-    return score_list
+    # 整批一次计算BLEU分数，结果与逐对调用 nltk 的 sentence_bleu 相同
+    return sentenceBleuScores([[reference] for reference in references], candidates, weights=weights).tolist()
 
 
 def getMeteor(references: list, candidates: list, language='en', alpha=0.9, beta=3.0, gamma=0.5):    # gamma=0可使两个一样的句子得分为1
@@ -168,12 +160,8 @@ def getMeteor(references: list, candidates: list, language='en', alpha=0.9, beta
 
     '''
     references, candidates = dealData(references, candidates, language)    # 调用deal_data分词
-    # 计算METEOR分数
-    score_list = []
-    for i in range(len(references)):
-        score = meteor_score([references[i]], candidates[i], alpha=alpha, beta=beta, gamma=gamma)
-        score_list.append(score)
-    return score_list
+    # 整批计算METEOR分数，词干和WordNet同义词由 meteor_batch 的共享索引提供，结果与逐对调用 nltk 的 meteor_score 相同
+    return meteorScores([[reference] for reference in references], candidates, alpha=alpha, beta=beta, gamma=gamma)
 
 
 def getBleurt(references, candidates, checkpoint='./BLEURT-20'):
@@ -186,37 +174,101 @@ def getBleurt(references, candidates, checkpoint='./BLEURT-20'):
     :param candidate: 候选译文，字符串
     :param checkpoint: 检查点，默认为'./BLEURT-20'
     :return: 两个句子间的Bleurt分数
+    BleurtScorer由 scorer_registry 缓存，同一checkpoint在同一进程内只加载一次
 
     :demo
         references = ['This is a easy test', 'Today is a good day', 'Time is up']
         candidates = ['This is a test', 'Today is a bad day', 'Time is up']
         print('Bleurt:', getBleurt(references, candidates))
     '''
-    scorer = score.BleurtScorer(checkpoint)
+    scorer = get_scorer('bleurt', checkpoint=checkpoint)
     scores = scorer.score(references=references, candidates=candidates)
     # assert isinstance(scores, list) and len(scores) == 1
     return scores
 
 
-def getScores(metrics:list,reference_sentences,generated_sentences):
+CPU_METRICS = {
+    'rouge': getRougeScore,
+    'chrf': getChrfScore,
+    'bleu': getBleu,
+    'meteor': getMeteor,
+}
+MODEL_METRICS = {
+    'bertscore': getBertScore,
+    'bleurt': getBleurt,
+}
+
+
+def _scoreChunk(metrics, reference_sentences, generated_sentences):
+    # 进程池的任务函数，需要定义在模块顶层才能被pickle
+    # 同一块句子的所有指标在同一个进程中计算，共用该进程的分词缓存
+    return {metric: CPU_METRICS[metric](reference_sentences, generated_sentences) for metric in metrics}
+
+
+def _scoreModelMetrics(metrics, reference_sentences, generated_sentences):
+    # 依赖模型的指标依次在同一个线程中计算，共用 scorer_registry 中已加载的模型
+    return {metric: MODEL_METRICS[metric](reference_sentences, generated_sentences) for metric in metrics}
+
+
+def getScores(metrics:list,reference_sentences,generated_sentences, n_jobs=1, chunk_size=None,
+              cpu_executor=None, model_executor=None):
+    """
+    计算多个指标的分数
+    :param metrics: 指标名列表，可选 'rouge','chrf','bertscore','bleu','meteor','bleurt'
+    :param n_jobs: 并行进程数，默认为1即串行计算；None表示使用全部CPU核
+    :param chunk_size: 并行时每个任务包含的句子对数，默认按进程数自动划分
+    :param cpu_executor: 并行时使用的进程池，默认每次调用新建一个；多次调用时传入同一个，避免反复启动进程
+    :param model_executor: 并行时计算 bertscore/bleurt 的单线程线程池，默认每次调用新建一个
+    :return: 字典，指标名 -> 分数列表
+    需要常驻的服务可以在启动时先调用 warmup(metrics)，把模型加载的开销提前
+
+    并行时 rouge/chrf/bleu/meteor 按句子切块后分发到进程池，bertscore/bleurt 在主进程的一个独立线程中同时计算，
+    最后按 metrics 的顺序合并为和串行计算相同的结果
+    """
     # ALLmetrics = ['rouge','chrf','bertscore',]
-    result = {}
     for metric in metrics:
-        if metric == 'rouge':
-            result['rouge'] = getRougeScore(reference_sentences,generated_sentences)
-        elif metric == 'chrf':
-            result['chrf'] = getChrfScore(reference_sentences,generated_sentences)
-        elif metric == 'bertscore':
-            result['bertscore'] = getBertScore(reference_sentences,generated_sentences)
-        elif metric == 'bleu':
-            result['bleu'] = getBleu(reference_sentences, generated_sentences)
-        elif metric == 'meteor':
-            result['meteor'] = getMeteor(reference_sentences, generated_sentences)
-        elif metric == 'bleurt':
-            result['bleurt'] = getBleurt(reference_sentences, generated_sentences)
-        else:
+        if metric not in CPU_METRICS and metric not in MODEL_METRICS:
             raise Exception('no such metric like {}'.format(metric))
-    return result
+    if n_jobs == 1:
+        result = {}
+        for metric in metrics:
+            if metric in CPU_METRICS:
+                result[metric] = CPU_METRICS[metric](reference_sentences, generated_sentences)
+            else:
+                result[metric] = MODEL_METRICS[metric](reference_sentences, generated_sentences)
+        return result
+
+    n_jobs = n_jobs or os.cpu_count()
+    cpu_metrics = [metric for metric in metrics if metric in CPU_METRICS]
+    model_metrics = [metric for metric in metrics if metric in MODEL_METRICS]
+    if chunk_size is None:
+        chunk_size = max(1, -(-len(reference_sentences) // (n_jobs * 4)))
+    bounds = [(i, i + chunk_size) for i in range(0, len(reference_sentences), chunk_size)]
+
+    with ExitStack() as stack:
+        # 调用方传入的执行器由调用方关闭
+        if cpu_executor is None:
+            cpu_executor = stack.enter_context(ProcessPoolExecutor(max_workers=n_jobs))
+        if model_executor is None:
+            model_executor = stack.enter_context(ThreadPoolExecutor(max_workers=1))
+        # 先提交CPU任务再启动模型线程：进程池在提交时才fork出子进程，
+        # 若此时模型线程正在import torch或加载模型，子进程可能继承被占用的锁而死锁
+        cpu_futures = []
+        if cpu_metrics:
+            cpu_futures = [cpu_executor.submit(_scoreChunk, cpu_metrics,
+                                               reference_sentences[lo:hi], generated_sentences[lo:hi])
+                           for lo, hi in bounds]
+        model_future = None
+        if model_metrics:
+            model_future = model_executor.submit(_scoreModelMetrics, model_metrics,
+                                                 reference_sentences, generated_sentences)
+        scores = {metric: [] for metric in cpu_metrics}
+        for future in cpu_futures:
+            for metric, chunk_scores in future.result().items():
+                scores[metric].extend(chunk_scores)
+        if model_future is not None:
+            scores.update(model_future.result())
+    return {metric: scores[metric] for metric in metrics}
 
 
 if __name__ == '__main__':
@@ -241,6 +293,7 @@ if __name__ == '__main__':
         # metrics = ['rouge', 'chrf', 'bertscore', ]
         # metrics = ['bleurt', 'bleu', 'meteor']
         metrics = ['rouge', 'chrf', 'bertscore', 'bleurt', 'bleu', 'meteor']
+        warmup(metrics)
 
     except Exception as e:
         print(e)